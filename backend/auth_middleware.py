@@ -3,14 +3,21 @@ Auth0 JWT Token Validation Middleware for Flask
 Validates JWT tokens from Auth0 and extracts user information
 """
 
-import json
+import os
+import time
+import hashlib
+import threading
 import jwt
 import requests
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, current_app
-from urllib.request import urlopen
+from jose import jwt as jose_jwt
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 from models import Users
-from app import db
+from database import db, insert_on_conflict
 
 
 class AuthError(Exception):
@@ -52,45 +59,159 @@ def get_token_auth_header():
     return token
 
 
+class JWKSCache:
+    """
+    Caches the IdP signing keys (JWKS) per URL, indexed by `kid`.
+    Keys are refreshed after `ttl` seconds or when a token names an unknown kid
+    (key rotation), at most once per `min_refresh_interval`. If a refresh fails
+    the previously fetched keys keep being used, so an IdP hiccup does not fail auth.
+    """
+
+    def __init__(self, ttl=3600, min_refresh_interval=30, timeout=5):
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._keys = {}  # {jwks_url: {kid: key}}
+        self._fetched_at = {}  # {jwks_url: monotonic time of last fetch attempt}
+        self._lock = threading.Lock()
+
+    def _refresh(self, jwks_url):
+        with self._lock:
+            self._fetched_at[jwks_url] = time.monotonic()
+        try:
+            response = self.session.get(jwks_url, timeout=self.timeout)
+            response.raise_for_status()
+            keys = {key['kid']: key for key in response.json().get('keys', []) if 'kid' in key}
+        except Exception as e:
+            print(f"Error fetching JWKS from {jwks_url}: {str(e)}")
+            return
+        with self._lock:
+            self._keys[jwks_url] = keys
+
+    def get_key(self, jwks_url, kid):
+        """Return the JWK for `kid`, fetching the key set if needed"""
+        with self._lock:
+            keys = self._keys.get(jwks_url)
+            age = time.monotonic() - self._fetched_at.get(jwks_url, float('-inf'))
+
+        if keys is None or age >= self.ttl:
+            self._refresh(jwks_url)
+        elif kid not in keys and age >= self.min_refresh_interval:
+            # Unknown kid: the IdP may have rotated its signing keys
+            self._refresh(jwks_url)
+
+        with self._lock:
+            return self._keys.get(jwks_url, {}).get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._fetched_at.clear()
+
+
+class VerifiedTokenCache:
+    """
+    Small LRU of already verified tokens -> claims. An entry lives at most
+    `max_ttl` seconds and never past the token's own `exp`.
+    """
+
+    def __init__(self, max_size=1024, max_ttl=300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # {key: (expires_at, claims)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(token, audience, issuer):
+        return hashlib.sha256(f'{audience}|{issuer}|{token}'.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key, claims):
+        expires_at = time.time() + self.max_ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, float(claims['exp']))
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+jwks_cache = JWKSCache(
+    ttl=int(os.getenv('AUTH0_JWKS_CACHE_TTL', '3600'))
+)
+verified_token_cache = VerifiedTokenCache(
+    max_size=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '1024')),
+    max_ttl=int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
+)
+
+
 def verify_decode_jwt(token, auth0_domain):
     """Decodes and verifies JWT token from Auth0"""
+    audience = current_app.config.get('AUTH0_AUDIENCE')
+    issuer = f'https://{auth0_domain}/'
+    jwks_url = current_app.config.get('AUTH0_JWKS_URL') or f'https://{auth0_domain}/.well-known/jwks.json'
+
+    cache_key = VerifiedTokenCache.make_key(token, audience, issuer)
+    payload = verified_token_cache.get(cache_key)
+    if payload is not None:
+        return payload
+
     try:
-        # Get Auth0 public keys
-        jsonurl = urlopen(f'https://{auth0_domain}/.well-known/jwks.json')
-        jwks = json.loads(jsonurl.read())
-        
         # Get the key id from token header
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        
-        if 'kid' not in unverified_header:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Authorization malformed.'
-            }, 401)
-
-        for key in jwks['keys']:
-            if key['kid'] == unverified_header['kid']:
-                rsa_key = {
-                    'kty': key['kty'],
-                    'kid': key['kid'],
-                    'use': key['use'],
-                    'n': key['n'],
-                    'e': key['e']
-                }
-                break
-                
-        if rsa_key:
-            from jose import jwt as jose_jwt
-            payload = jose_jwt.decode(
-                token,
-                rsa_key,
-                algorithms=['RS256'],
-                audience=current_app.config.get('AUTH0_AUDIENCE'),
-                issuer=f'https://{auth0_domain}/'
-            )
-            return payload
-            
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
+
+    if 'kid' not in unverified_header:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+
+    # Get Auth0 public key (cached)
+    key = jwks_cache.get_key(jwks_url, unverified_header['kid'])
+    if not key:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to find the appropriate key.'
+        }, 400)
+
+    rsa_key = {
+        'kty': key['kty'],
+        'kid': key['kid'],
+        'use': key.get('use', 'sig'),
+        'n': key['n'],
+        'e': key['e']
+    }
+
+    try:
+        payload = jose_jwt.decode(
+            token,
+            rsa_key,
+            algorithms=['RS256'],
+            audience=audience,
+            issuer=issuer
+        )
     except jose_jwt.ExpiredSignatureError:
         raise AuthError({
             'code': 'token_expired',
@@ -108,45 +229,217 @@ def verify_decode_jwt(token, auth0_domain):
             'description': 'Unable to parse authentication token.'
         }, 400)
 
-    raise AuthError({
-        'code': 'invalid_header',
-        'description': 'Unable to find the appropriate key.'
-    }, 400)
+    verified_token_cache.put(cache_key, payload)
+    return payload
+
+
+class CurrentUser:
+    """Minimal, session-independent view of an authenticated user"""
+    __slots__ = ('id', 'first_name', 'last_name', 'email')
+
+    def __init__(self, id, first_name, last_name, email):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.first_name, user.last_name, user.email)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'firstName': self.first_name,
+            'lastName': self.last_name,
+            'email': self.email,
+        }
+
+
+class IdentityCache:
+    """
+    Maps identity keys (Auth0 sub, email of tokens without one, the dev test user) to CurrentUser,
+    so steady-state authenticated requests do not query the users table.
+    Entries expire after `ttl` seconds (bounding staleness across workers) and
+    are invalidated in-process whenever a user row is updated or deleted.
+    """
+
+    def __init__(self, max_size=4096, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {key: (expires_at, CurrentUser)}
+        self._keys_by_user = {}  # {user_id: {key, ...}}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, identity = entry
+            if time.monotonic() >= expires_at:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return identity
+
+    def put(self, identity, *keys):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key in keys:
+                if not key:
+                    continue
+                self._entries[key] = (expires_at, identity)
+                self._entries.move_to_end(key)
+                self._keys_by_user.setdefault(identity.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, identity = self._entries.pop(key)
+        keys = self._keys_by_user.get(identity.id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[identity.id]
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+
+identity_cache = IdentityCache(
+    ttl=int(os.getenv('AUTH_IDENTITY_CACHE_TTL', '600'))
+)
+
+
+@event.listens_for(Users, 'after_update')
+@event.listens_for(Users, 'after_delete')
+def _invalidate_cached_identity(mapper, connection, target):
+    identity_cache.invalidate_user(target.id)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _invalidate_identities_on_bulk(update_context):
+    # query(Users).update()/delete() bypass per-row events
+    if update_context.mapper.class_ is Users:
+        identity_cache.clear()
+
+
+def provision_user(auth_subject, email, first_name, last_name):
+    """
+    Race-free user provisioning for Auth0 logins.
+    A single INSERT ... ON CONFLICT (email) creates the user or links an existing
+    account with the same email to `auth_subject`, in its own short transaction so
+    the request session is never committed by the auth path.
+    Returns the Users row columns (id, first_name, last_name, email).
+    """
+    users = Users.__table__
+    try:
+        stmt = insert_on_conflict(users, db.engine.dialect.name)
+    except NotImplementedError:
+        raise AuthError({
+            'code': 'unsupported_database',
+            'description': f'User provisioning does not support {db.engine.dialect.name}.'
+        }, 500)
+    stmt = stmt.values(
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        password_hash='auth0_user',  # Auth0 users don't have local passwords
+        auth_subject=auth_subject
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[users.c.email],
+        # Never overwrite a subject that is already linked
+        set_={'auth_subject': func.coalesce(users.c.auth_subject, stmt.excluded.auth_subject)}
+    ).returning(users.c.id, users.c.first_name, users.c.last_name, users.c.email, users.c.auth_subject)
+
+    try:
+        with db.engine.begin() as connection:
+            row = connection.execute(stmt).one()
+    except IntegrityError:
+        # The subject is already linked to a different email (email changed at the IdP)
+        row = None
+
+    if row is None or (auth_subject and row.auth_subject != auth_subject):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(users.c.id, users.c.first_name, users.c.last_name, users.c.email)
+                .where(users.c.auth_subject == auth_subject)
+            ).one_or_none()
+        if row is None:
+            raise AuthError({
+                'code': 'invalid_user_data',
+                'description': 'User is linked to a different Auth0 account.'
+            }, 409)
+    return row
 
 
 def get_or_create_user(auth0_user_data):
     """Get existing user or create new user from Auth0 data"""
     email = auth0_user_data.get('email')
     auth0_sub = auth0_user_data.get('sub')  # Auth0 user ID
+
+    # A token with a subject is only matched by it: the email entry may belong to another
+    # Auth0 account, which provision_user refuses (409)
+    cache_key = f'sub:{auth0_sub}' if auth0_sub else (f'email:{email}' if email else None)
+    identity = cache_key and identity_cache.get(cache_key)
+    if identity:
+        return identity
+
+    # Returning users are found by their stable Auth0 subject (indexed)
+    user = Users.query.filter_by(auth_subject=auth0_sub).first() if auth0_sub else None
+    if user:
+        identity = CurrentUser.from_user(user)
+        identity_cache.put(identity, cache_key)
+        return identity
     
     if not email:
         raise AuthError({
             'code': 'invalid_user_data',
             'description': 'User email not found in token.'
         }, 400)
-    
-    # Try to find user by email
-    user = Users.query.filter_by(email=email).first()
-    
-    if not user:
-        # Create new user from Auth0 data
-        name_parts = auth0_user_data.get('name', '').split(' ', 1)
-        first_name = name_parts[0] if name_parts else 'User'
-        last_name = name_parts[1] if len(name_parts) > 1 else ''
-        
-        user = Users(
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            password_hash='auth0_user'  # Auth0 users don't have local passwords
+
+    # First login (or first login since auth_subject was added): create or link by email
+    name_parts = auth0_user_data.get('name', '').split(' ', 1)
+    first_name = name_parts[0] if name_parts else 'User'
+    last_name = name_parts[1] if len(name_parts) > 1 else ''
+
+    row = provision_user(auth0_sub, email, first_name, last_name)
+
+    identity = CurrentUser(row.id, row.first_name, row.last_name, row.email)
+    identity_cache.put(identity, cache_key)
+    return identity
+
+
+def get_test_user():
+    """Development user for DISABLE_AUTH/TESTING mode (cached like real identities)"""
+    identity = identity_cache.get('test_user')
+    if identity:
+        return identity
+
+    test_user = Users.query.first()
+    if not test_user:
+        test_user = Users(
+            first_name='Test',
+            last_name='User', 
+            email='test@example.com',
+            password_hash='test'
         )
-        
-        db.session.add(user)
+        db.session.add(test_user)
         db.session.commit()
-        
-        print(f"Created new user from Auth0: {email}")
-    
-    return user
+
+    identity = CurrentUser.from_user(test_user)
+    identity_cache.put(identity, 'test_user')
+    return identity
 
 
 def requires_auth(f):
@@ -157,17 +450,7 @@ def requires_auth(f):
             # For development - allow testing without auth
             if current_app.config.get('TESTING') or current_app.config.get('DISABLE_AUTH'):
                 # Use test user for development
-                test_user = Users.query.first()
-                if not test_user:
-                    test_user = Users(
-                        first_name='Test',
-                        last_name='User', 
-                        email='test@example.com',
-                        password_hash='test'
-                    )
-                    db.session.add(test_user)
-                    db.session.commit()
-                request.current_user = test_user
+                request.current_user = get_test_user()
                 return f(*args, **kwargs)
             
             # Production auth flow
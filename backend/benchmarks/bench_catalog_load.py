@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Catalog load benchmark: services/car_catalog_loader.py on a large CSV
+
+Builds a CSV of --rows rows by repeating final_vehicle_data.csv - so most
+rows are duplicates of a ~31k variant catalog, like the real file - and
+loads it into a fresh SQLite file (or an empty --database-url) in its own
+interpreter. Reports rows read per second, variants stored and the peak
+RSS of the loading process.
+
+Run from backend directory: python benchmarks/bench_catalog_load.py [--rows 1000000]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+
+def build_csv(path, rows):
+    with open(backend_dir / 'final_vehicle_data.csv', encoding='utf-8') as f:
+        header, *lines = f.read().splitlines()
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(header + '\n')
+        for i in range(rows):
+            out.write(lines[i % len(lines)] + '\n')
+
+
+def run_streaming(csv_path):
+    from app import app, db
+    from services.car_catalog_loader import car_catalog_loader
+
+    with app.app_context():
+        db.create_all()
+        stats = car_catalog_loader.load(csv_path)
+        return stats['read'], stats['loaded']
+
+
+def measure(csv_path, database_url):
+    """Run the load in a fresh interpreter: {rows, variants, seconds, peak_rss_mb}"""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    result = subprocess.run([sys.executable, __file__, '--worker', '--csv', csv_path],
+                            cwd=backend_dir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows in the generated catalog')
+    parser.add_argument('--database-url', help='empty database to load into (default: a temp SQLite file)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        started = time.perf_counter()
+        rows, variants = run_streaming(args.csv)
+        seconds = time.perf_counter() - started
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps({'rows': rows, 'variants': variants, 'seconds': seconds, 'peak_rss_mb': peak_mb}))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'catalog.csv')
+        build_csv(csv_path, args.rows)
+        print(f"Catalog: {args.rows} rows, {os.path.getsize(csv_path) / 1e6:.0f} MB\n")
+
+        stats = measure(csv_path, args.database_url or f"sqlite:///{os.path.join(tmp, 'catalog.db')}")
+        print(f"{stats['rows']:>9} rows  {stats['seconds']:7.2f} s  {stats['rows'] / stats['seconds']:>9,.0f} rows/s  "
+              f"{stats['variants']} variants  peak RSS {stats['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Model comparison benchmark: GET /api/experiments/<id>/compare at experiment scale
+
+Builds synthetic experiments of --runs successful runs spread over 2..N
+models (every model scores every ad once, so runs / models matched ads
+per pair) and times ModelComparison.compare_all, which is what the
+endpoint runs inside the request. Also prints the resamples() count the
+endpoint checks against COMPARE_MAX_RESAMPLES.
+
+Run from backend directory: python benchmarks/bench_model_comparison.py [--runs 100000] [--iterations 2000 10000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import numpy as np
+from model_comparison import ModelComparison
+
+
+def experiment(runs, models, rng):
+    ads = runs // models
+    names = np.repeat([f'model-{i}' for i in range(models)], ads)
+    ad_ids = np.tile(np.arange(ads), models)
+    values = rng.random(ads * models)
+    return names, ad_ids, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=100000, help='successful runs in the experiment')
+    parser.add_argument('--models', type=int, nargs='+', default=[2, 3, 4], help='models in the experiment')
+    parser.add_argument('--iterations', type=int, nargs='+', default=[2000, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'models':>6} {'pairs':>5} {'ads/pair':>8} {'iterations':>10} {'resamples':>12} {'seconds':>8}")
+    for models in args.models:
+        names, ad_ids, values = experiment(args.runs, models, rng)
+        for iterations in args.iterations:
+            comparison = ModelComparison(iterations=iterations, seed=1)
+            started = time.perf_counter()
+            pairs = comparison.matched_pairs(names, ad_ids, values)
+            comparison.compare_all(names, ad_ids, values, pairs=pairs)
+            seconds = time.perf_counter() - started
+            print(f"{models:>6} {len(pairs):>5} {args.runs // models:>8} {iterations:>10} "
+                  f"{comparison.resamples(pairs):>12,} {seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Signup throughput benchmark: password hashing under concurrent requests
+
+Simulates N request threads each performing the hashing step of
+POST /api/users, comparing inline werkzeug hashing with the bounded
+PasswordHasher pool. Reports signups/s, latency percentiles and how many
+requests were shed with 503.
+
+Run from backend directory: python benchmarks/bench_signup.py [--threads 32] [--signups 200]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from werkzeug.security import generate_password_hash
+from services.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+def run(label, hash_fn, threads, signups):
+    latencies = []
+    shed = 0
+
+    def signup(i):
+        start = time.perf_counter()
+        try:
+            hash_fn(f'password-{i}')
+            return time.perf_counter() - start, False
+        except PasswordHasherBusy:
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for latency, was_shed in executor.map(signup, range(signups)):
+            if was_shed:
+                shed += 1
+            else:
+                latencies.append(latency)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{label:<28} {len(latencies) / elapsed:8.1f} signups/s   "
+          f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms   "
+          f"p95 {p95 * 1000:7.1f} ms   shed(503) {shed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32, help='concurrent request threads')
+    parser.add_argument('--signups', type=int, default=200, help='total signups')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='hasher pool sizes')
+    parser.add_argument('--queue-limit', type=int, default=16, help='hasher queue limit')
+    args = parser.parse_args()
+
+    print(f"{args.signups} signups from {args.threads} concurrent threads\n")
+    run('inline (request thread)', generate_password_hash, args.threads, args.signups)
+    for workers in args.workers:
+        hasher = PasswordHasher(max_workers=workers, max_pending=args.queue_limit)
+        run(f'pool workers={workers} queue={args.queue_limit}', hasher.hash, args.threads, args.signups)
+        hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+SQLite concurrency benchmark: mixed reads/writes under each pragma profile
+
+N threads share one SQLAlchemy engine on a fresh database file and run a
+mix of listing reads (filter + ORDER BY + LIMIT) and short write
+transactions (update one row, insert one row). Each profile from
+database.py gets its own file, so the 'default' run really uses a
+rollback journal. Reports operations/s, read and write latency
+percentiles and how many operations failed with "database is locked".
+
+Run from backend directory: python benchmarks/bench_sqlite.py [--threads 16] [--ops 4000] [--write-ratio 0.2]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from database import SQLITE_PROFILES, configure_sqlite
+
+MAKES = ['Toyota', 'BMW', 'Ford', 'Audi', 'Skoda', 'Opel', 'Kia', 'Fiat']
+
+
+def setup(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE listings (id INTEGER PRIMARY KEY, make TEXT, price INTEGER, views INTEGER)"))
+        conn.execute(text("CREATE INDEX ix_listings_make ON listings (make, price)"))
+        conn.execute(text("INSERT INTO listings (make, price, views) VALUES (:make, :price, 0)"),
+                     [{'make': random.choice(MAKES), 'price': random.randint(5000, 200000)} for _ in range(rows)])
+
+
+def read(engine, rows):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT id, make, price FROM listings WHERE make = :make ORDER BY price LIMIT 20"),
+                     {'make': random.choice(MAKES)}).fetchall()
+
+
+def write(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE listings SET views = views + 1 WHERE id = :id"), {'id': random.randint(1, rows)})
+        conn.execute(text("INSERT INTO listings (make, price, views) VALUES (:make, :price, 0)"),
+                     {'make': random.choice(MAKES), 'price': random.randint(5000, 200000)})
+
+
+def percentile(values, fraction):
+    return values[max(int(len(values) * fraction) - 1, 0)] if values else 0
+
+
+def run(profile, threads, ops, write_ratio, rows):
+    db_dir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'bench.db')}", pool_size=threads, max_overflow=0)
+    configure_sqlite(engine, profile)
+    setup(engine, rows)
+
+    def operation(i):
+        is_write = random.random() < write_ratio
+        start = time.perf_counter()
+        try:
+            (write if is_write else read)(engine, rows)
+            return is_write, time.perf_counter() - start, False
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            return is_write, time.perf_counter() - start, True
+
+    reads, writes, locked = [], [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for is_write, latency, was_locked in executor.map(operation, range(ops)):
+            if was_locked:
+                locked += 1
+            else:
+                (writes if is_write else reads).append(latency)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    shutil.rmtree(db_dir)
+
+    reads.sort()
+    writes.sort()
+    print(f"{profile:<12} {(len(reads) + len(writes)) / elapsed:9.1f} ops/s   "
+          f"read p50 {statistics.median(reads) * 1000 if reads else 0:6.2f} ms  p95 {percentile(reads, 0.95) * 1000:7.2f} ms   "
+          f"write p50 {statistics.median(writes) * 1000 if writes else 0:6.2f} ms  p95 {percentile(writes, 0.95) * 1000:7.2f} ms   "
+          f"locked {locked}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent request threads')
+    parser.add_argument('--ops', type=int, default=4000, help='total operations')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='fraction of operations that write')
+    parser.add_argument('--rows', type=int, default=20000, help='rows seeded before the run')
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES), help='profiles from database.py')
+    args = parser.parse_args()
+
+    print(f"{args.ops} operations ({args.write_ratio:.0%} writes) from {args.threads} concurrent threads\n")
+    for profile in args.profiles:
+        run(profile, args.threads, args.ops, args.write_ratio, args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of the application module
+
+Runs `python -X importtime -c "import app"` in fresh interpreters (what
+every gunicorn worker and pytest session pays before serving/testing),
+reports the median total, the slowest imports of the median run and what
+the libraries loaded lazily (pandas, numpy, boto3) would add on top.
+
+Run from backend directory: python benchmarks/bench_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+# Imported only by init_database(), the comparison endpoint and S3 storage
+DEFERRED_MODULES = ('pandas', 'numpy', 'boto3')
+
+
+def import_times(statement: str) -> dict:
+    """{module: (self_us, cumulative_us)} of one fresh interpreter running `statement`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=backend_dir, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return times
+
+
+def total_ms(times: dict, module: str) -> float:
+    return times[module][1] / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    args = parser.parse_args()
+
+    runs = sorted((import_times('import app') for _ in range(args.runs)), key=lambda t: total_ms(t, 'app'))
+    median = runs[len(runs) // 2]
+    print(f"import app: median {total_ms(median, 'app'):7.1f} ms   "
+          f"min {total_ms(runs[0], 'app'):7.1f} ms   max {total_ms(runs[-1], 'app'):7.1f} ms   ({args.runs} runs)\n")
+
+    print("Slowest imports (cumulative, median run):")
+    slowest = sorted(median.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[1:args.top + 1]:
+        print(f"  {cumulative_us / 1000:7.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+
+    loaded = [name for name in DEFERRED_MODULES if name in median]
+    print(f"\nDeferred modules loaded at startup: {', '.join(loaded) or 'none'}")
+    for name in DEFERRED_MODULES:
+        costs = [total_ms(import_times(f'import {name}'), name) for _ in range(args.runs)]
+        print(f"  import {name:<8} {statistics.median(costs):7.1f} ms when first used")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Database URL, engine pool and SQLite connection tuning
+
+DATABASE_URL selects the database (SQLite by default, PostgreSQL in
+multi-worker deployments) and DB_POOL_* size its connection pool.
+
+SQLite's defaults (rollback journal, synchronous=FULL, small page cache)
+serialize readers behind writers and turn short write bursts into
+"database is locked" errors. The 'production' profile switches the file
+to WAL - readers never block the writer and vice versa - waits up to
+busy_timeout for the write lock instead of failing, and trades the fsync
+on every commit for one per checkpoint (synchronous=NORMAL: a power loss
+can drop the last transactions, never corrupt the file).
+
+Pragmas are connection-scoped (journal_mode=WAL is also persisted in the
+file), so they are applied from a 'connect' listener to every pooled
+connection.
+
+Usage:
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url())
+    configure_sqlite(db.engine, 'production')
+"""
+
+import os
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+
+# Bound to each application by create_app(); models and services import it from here,
+# so `python app.py` (module __main__) and `import app` share one instance
+db = SQLAlchemy()
+
+
+DEFAULT_DATABASE_URL = 'sqlite:///vehicles.db'
+
+
+def database_url() -> str:
+    """DATABASE_URL (the bundled SQLite file by default); Heroku-style postgres:// is accepted"""
+    url = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str) -> dict:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for `url`, from the environment.
+
+    Every process (gunicorn worker, CLI script) has its own pool, so the
+    server must allow workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    Server connections are checked before use (pre-ping) and recycled
+    before proxies/firewalls drop them as idle.
+    """
+    if url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///') or ':memory:' in url):
+        # One shared in-memory connection, Flask-SQLAlchemy picks the pool
+        return {}
+
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    }
+    if not url.startswith('sqlite'):
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+        options['pool_pre_ping'] = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    return options
+
+
+def insert_on_conflict(table, dialect_name: str):
+    """INSERT into `table` with the dialect's ON CONFLICT clauses (PostgreSQL and SQLite)"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'INSERT ... ON CONFLICT is not supported on {dialect_name}')
+    return insert(table)
+
+
+def insert_ignore(table, dialect_name: str):
+    """INSERT ... ON CONFLICT DO NOTHING into `table`: rows hitting a unique key are skipped"""
+    return insert_on_conflict(table, dialect_name).on_conflict_do_nothing()
+
+
+def _production_pragmas() -> dict:
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        # Read the file through the page cache instead of read() syscalls
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        # Negative values are KiB rather than pages
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(64 * 1024))),
+        'temp_store': 'MEMORY'
+    }
+
+
+# Read when an engine is configured, after app.py has loaded .env
+SQLITE_PROFILES = {
+    # What sqlite3.connect() gives you
+    'default': lambda: {},
+    'production': _production_pragmas
+}
+
+
+def sqlite_pragmas(profile: str) -> dict:
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile} (expected one of {', '.join(SQLITE_PROFILES)})")
+    return SQLITE_PROFILES[profile]()
+
+
+def configure_sqlite(engine, profile: str = 'production'):
+    """Apply the profile's pragmas to every new connection of a SQLite engine (no-op for other databases)"""
+    pragmas = sqlite_pragmas(profile)
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
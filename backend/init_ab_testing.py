@@ -6,20 +6,18 @@ Creates database tables and verifies schema.
 Run from backend directory: python init_ab_testing.py
 """
 
-from app import db, create_app
+from app import app, db, init_database as bootstrap_database
 from models import Experiment, ExperimentRun, QualityEvaluation
 import sys
 
 def init_database():
     """Initialize A/B testing tables."""
-    app = create_app() if hasattr(sys.modules['app'], 'create_app') else None
-    
-    with app.app_context() if app else db.app.app_context():
+    with app.app_context():
         print("🗄️  Creating A/B Testing tables...")
         
         try:
-            # Create tables
-            db.create_all()
+            # Create tables and load the vehicle catalog, as on first app start
+            bootstrap_database(app)
             print("✅ Tables created successfully!")
             
             # Verify tables exist
@@ -48,9 +46,7 @@ def init_database():
 
 def create_sample_experiment():
     """Create a sample experiment for testing."""
-    app = create_app() if hasattr(sys.modules['app'], 'create_app') else None
-    
-    with app.app_context() if app else db.app.app_context():
+    with app.app_context():
         # Check if sample already exists
         existing = Experiment.query.filter_by(name='Sample A/B Test').first()
         if existing:
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Load or refresh the vehicle catalog (cars, car_models, car_makes) from a CSV
+
+Usage:
+    python load_car_catalog.py                              # final_vehicle_data.csv (CATALOG_CSV)
+    python load_car_catalog.py catalog.csv [--batch-size 50000]
+    python load_car_catalog.py new_catalog.csv --refresh [--prune]
+
+Without --refresh the file is loaded into an empty catalog: streamed in
+batches inside one transaction, each variant stored once (duplicate rows
+are collapsed), the `cars` indexes rebuilt afterwards. A catalog that
+already has cars is left untouched, so the command is safe to re-run;
+`python app.py` does the same on first start.
+
+--refresh applies a new catalog version to a filled database: rows are
+compared by content hash and only new variants are inserted, listings keep
+their cars. --prune also deletes variants that are no longer in the file
+and that no listing uses.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app import app, db
+from services.car_catalog_loader import car_catalog_loader
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help="catalog CSV, defaults to CATALOG_CSV")
+    parser.add_argument('--batch-size', type=int, default=car_catalog_loader.batch_size,
+                        help='rows per executemany call')
+    parser.add_argument('--refresh', action='store_true', help='add the new variants of a filled catalog')
+    parser.add_argument('--prune', action='store_true',
+                        help='with --refresh, delete unused variants missing from the file')
+    args = parser.parse_args()
+    if args.prune and not args.refresh:
+        parser.error('--prune requires --refresh')
+
+    path = args.path or app.config['CATALOG_CSV']
+    car_catalog_loader.batch_size = args.batch_size
+
+    def progress(read):
+        if read % (car_catalog_loader.batch_size * 10) == 0:
+            print(f"  … {read} rows")
+
+    with app.app_context():
+        db.create_all()
+        try:
+            if args.refresh:
+                stats = car_catalog_loader.refresh(path, prune=args.prune, progress=progress)
+            else:
+                stats = car_catalog_loader.load(path, progress=progress)
+        except FileNotFoundError:
+            print(f"❌ File not found: {path}")
+            sys.exit(1)
+
+    if stats['status'] == 'skipped':
+        print("ℹ️  Table 'cars' already has data, nothing loaded (use --refresh to apply a new catalog)")
+        return
+    rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"✅ Read {stats['read']} rows in {stats['seconds']:.2f} s ({rate:,.0f} rows/s), "
+          f"rejected {stats['rejected']}")
+    if stats['status'] == 'refreshed':
+        print(f"   {stats['added']} variants added, {stats['unchanged']} unchanged, "
+              f"{stats['duplicates']} duplicate rows collapsed, {stats['pruned']} variants pruned")
+    else:
+        print(f"   {stats['loaded']} variants stored, {stats['duplicates']} duplicate rows collapsed")
+
+if __name__ == "__main__":
+    main()
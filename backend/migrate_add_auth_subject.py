@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Migration script to add users.auth_subject (Auth0 `sub`) with a unique index
+
+Usage:
+    python migrate_add_auth_subject.py [auth0_users_export.json]
+
+The optional argument is an Auth0 bulk user export (NDJSON or a JSON array with
+`user_id` and `email` fields), used to backfill subjects for existing users.
+Users that are not in the export are linked by email on their next login.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+from models import Users
+
+def load_export(path):
+    """Read {email: user_id} from an Auth0 users export"""
+    content = Path(path).read_text(encoding='utf-8').strip()
+    if content.startswith('['):
+        records = json.loads(content)
+    else:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return {r['email'].lower(): r['user_id'] for r in records if r.get('email') and r.get('user_id')}
+
+def migrate_database(export_path=None):
+    """Add the auth_subject column and index, optionally backfill from an export"""
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('users')]
+            if 'auth_subject' not in columns:
+                # SQLite cannot add a UNIQUE column, so the uniqueness lives in the index
+                db.session.execute(text("ALTER TABLE users ADD COLUMN auth_subject VARCHAR(255)"))
+                print("✅ Added users.auth_subject column")
+            else:
+                print("ℹ️  users.auth_subject already exists, skipping...")
+
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_auth_subject ON users (auth_subject)"
+            ))
+            db.session.commit()
+            print("✅ Unique index ix_users_auth_subject ready")
+
+            if export_path:
+                subjects = load_export(export_path)
+                linked = 0
+                for user in Users.query.filter(Users.auth_subject.is_(None)).all():
+                    subject = subjects.get(user.email.lower())
+                    if subject:
+                        user.auth_subject = subject
+                        linked += 1
+                db.session.commit()
+                print(f"✅ Backfilled auth_subject for {linked} users")
+
+            missing = Users.query.filter(Users.auth_subject.is_(None), Users.password_hash == 'auth0_user').count()
+            if missing:
+                print(f"ℹ️  {missing} Auth0 users without a subject will be linked by email on next login")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database(sys.argv[1] if len(sys.argv) > 1 else None)
+    print("🎉 Migration completed successfully!")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the completion cache to an existing database
+Creates the completion_cache table and the experiments.cache_hits column
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+from models import CachedCompletion
+
+def migrate_database():
+    """Create completion_cache table and add experiments.cache_hits"""
+    with app.app_context():
+        try:
+            # Create the completion_cache table
+            db.create_all()
+            print("✅ completion_cache table ready")
+
+            columns = [c['name'] for c in inspect(db.engine).get_columns('experiments')]
+            if 'cache_hits' not in columns:
+                db.session.execute(text("ALTER TABLE experiments ADD COLUMN cache_hits INTEGER DEFAULT 0"))
+                db.session.commit()
+                print("✅ Added experiments.cache_hits column")
+            else:
+                print("ℹ️  experiments.cache_hits already exists, skipping...")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the file_deletions outbox table
+
+Usage:
+    python migrate_add_file_deletions.py
+
+Files of photos deleted before this migration (e.g. through item deletion) are
+not in the outbox; run `python sweep_photos.py --orphans` to remove them.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect
+from app import app, db
+from models import FileDeletion
+
+def migrate_database():
+    """Create the file_deletions table"""
+    with app.app_context():
+        try:
+            if 'file_deletions' not in inspect(db.engine).get_table_names():
+                FileDeletion.__table__.create(db.engine)
+                print("✅ Created file_deletions table")
+            else:
+                print("ℹ️  file_deletions already exists, skipping...")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the image_tasks queue and photos.processing_status
+
+Usage:
+    python migrate_add_image_tasks.py
+
+Existing photos are marked 'ready'; their renditions come from
+migrate_add_photo_renditions.py, which runs before this script (see its
+docstring for the full migration order).
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+from models import ImageTask
+
+def migrate_database():
+    """Create the image_tasks table and the photo processing status column"""
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            if 'image_tasks' not in inspector.get_table_names():
+                ImageTask.__table__.create(db.engine)
+                print("✅ Created image_tasks table")
+            else:
+                print("ℹ️  image_tasks already exists, skipping...")
+
+            columns = [c['name'] for c in inspector.get_columns('photos')]
+            if 'processing_status' not in columns:
+                db.session.execute(text(
+                    "ALTER TABLE photos ADD COLUMN processing_status VARCHAR(20) NOT NULL DEFAULT 'ready'"
+                ))
+                db.session.commit()
+                print("✅ Added photos.processing_status column")
+            else:
+                print("ℹ️  photos.processing_status already exists, skipping...")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
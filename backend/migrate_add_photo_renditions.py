@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Migration script to add photos.renditions and generate thumbnails for existing photos
+
+Usage:
+    python migrate_add_photo_renditions.py
+
+Renditions are generated for local photos whose original file is still on disk.
+
+Migration order for databases created before the photo pipeline changes:
+    1. migrate_add_photo_renditions.py
+    2. migrate_add_image_tasks.py
+    3. migrate_content_addressed_photos.py
+    4. migrate_add_file_deletions.py
+    5. migrate_unique_main_photo.py
+The backfill below only reads photos columns that exist at step 1, so it
+also works when run before the later scripts.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+from models import Photo
+from services.image_pipeline import image_pipeline
+from services.storage_service import storage_service
+
+def migrate_database():
+    """Add the renditions column and backfill it for local photos"""
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('photos')]
+            if 'renditions' not in columns:
+                db.session.execute(text("ALTER TABLE photos ADD COLUMN renditions JSON"))
+                db.session.commit()
+                print("✅ Added photos.renditions column")
+            else:
+                print("ℹ️  photos.renditions already exists, skipping...")
+
+            generated = 0
+            # Explicit columns, not the Photo entity: columns added by later
+            # migrations (e.g. processing_status) may not exist yet
+            photos = db.session.execute(
+                db.select(Photo.id, Photo.stored_filename)
+                .where(Photo.renditions.is_(None), Photo.storage_type == 'local')
+            ).all()
+            for photo_id, stored_filename in photos:
+                original = os.path.join(storage_service.upload_folder, stored_filename)
+                if not os.path.exists(original):
+                    print(f"⚠️  Original missing for photo {photo_id}, skipping...")
+                    continue
+                with open(original, 'rb') as source:
+                    renditions = image_pipeline.generate(source, stored_filename, 'local')
+                db.session.execute(
+                    db.update(Photo).where(Photo.id == photo_id).values(renditions=renditions)
+                )
+                generated += 1
+            db.session.commit()
+            print(f"✅ Generated renditions for {generated} photos")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
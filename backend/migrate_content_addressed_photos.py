@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration script for content-addressed photo storage
+
+Usage:
+    python migrate_content_addressed_photos.py
+
+Adds the photos.stored_filename index used for reference counting and
+image_tasks.last_uploaded_at. Files stored under the old timestamp names keep
+working; each of them simply has a single reference.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+
+def migrate_database():
+    """Add the stored_filename index and the last upload timestamp"""
+    with app.app_context():
+        try:
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_photos_stored_filename ON photos (stored_filename)"
+            ))
+            print("✅ Index ix_photos_stored_filename ready")
+
+            columns = [c['name'] for c in inspect(db.engine).get_columns('image_tasks')]
+            if 'last_uploaded_at' not in columns:
+                db.session.execute(text("ALTER TABLE image_tasks ADD COLUMN last_uploaded_at TIMESTAMP"))
+                db.session.execute(text("UPDATE image_tasks SET last_uploaded_at = created_at"))
+                print("✅ Added image_tasks.last_uploaded_at column")
+            else:
+                print("ℹ️  image_tasks.last_uploaded_at already exists, skipping...")
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
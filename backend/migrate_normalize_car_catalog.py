@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Migration script splitting the vehicle catalog into makes, models and unique variants
+
+Usage:
+    python migrate_normalize_car_catalog.py
+
+Creates car_makes and car_models, adds cars.model_id and cars.variant_key,
+and collapses duplicate cars rows (the CSV load stored every repeated row):
+listings pointing at a duplicate are moved to the oldest identical row and
+the duplicates are deleted. Finally the unique variant_key index is created
+and ix_cars_model_id_year replaces ix_cars_make_model_year on databases
+that still have that index.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from app import app, db
+from models import Car, CarMake, CarModel, resolve_catalog_models
+
+BATCH_SIZE = 5000
+
+def migrate_database():
+    """Add the catalog tables and columns, link and deduplicate cars"""
+    with app.app_context():
+        try:
+            CarMake.__table__.create(db.engine, checkfirst=True)
+            CarModel.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tables car_makes and car_models ready")
+
+            columns = [c['name'] for c in inspect(db.engine).get_columns('cars')]
+            if 'model_id' not in columns:
+                db.session.execute(text("ALTER TABLE cars ADD COLUMN model_id INTEGER REFERENCES car_models (id)"))
+                print("✅ Added cars.model_id column")
+            if 'variant_key' not in columns:
+                # Filled below; SQLite cannot add a NOT NULL column without a default
+                key_type = Car.__table__.c.variant_key.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f"ALTER TABLE cars ADD COLUMN variant_key {key_type}"))
+                print("✅ Added cars.variant_key column")
+
+            conn = db.session.connection()
+            cars = Car.__table__
+            survivors = {}   # variant_key -> id of the row that is kept
+            duplicates = []  # {'duplicate': id, 'survivor': id}
+            catalog_models = {}
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    db.select(cars.c.id, *[cars.c[column] for column in Car.VARIANT_COLUMNS])
+                    .where(cars.c.id > last_id).order_by(cars.c.id).limit(BATCH_SIZE)
+                ).mappings().all()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+
+                resolve_catalog_models(conn, [(row['make'].strip(), row['model'].strip()) for row in rows],
+                                       catalog_models)
+                updates = []
+                for row in rows:
+                    key = Car.variant_key_for(row)
+                    if key in survivors:
+                        duplicates.append({'duplicate': row['id'], 'survivor': survivors[key]})
+                        continue
+                    survivors[key] = row['id']
+                    updates.append({'car_id': row['id'], 'key': key,
+                                    'model_id': catalog_models[(row['make'].strip(), row['model'].strip())]})
+                if updates:
+                    conn.execute(text("UPDATE cars SET variant_key = :key, model_id = :model_id WHERE id = :car_id"),
+                                 updates)
+            print(f"✅ Linked {len(survivors)} variants to {len(catalog_models)} models")
+
+            if duplicates:
+                conn.execute(text("UPDATE items SET car_id = :survivor WHERE car_id = :duplicate"), duplicates)
+                conn.execute(text("DELETE FROM cars WHERE id = :duplicate"), duplicates)
+            print(f"✅ Removed {len(duplicates)} duplicate cars rows")
+
+            db.session.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_cars_variant_key ON cars (variant_key)"))
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_cars_model_id_year ON cars (model_id, year)"))
+            # Replaced by ix_cars_model_id_year: lookups go through car_models now
+            db.session.execute(text("DROP INDEX IF EXISTS ix_cars_make_model_year"))
+            db.session.commit()
+            print("✅ Indexes uq_cars_variant_key and ix_cars_model_id_year ready")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Migration script enforcing at most one main photo per item
+
+Usage:
+    python migrate_unique_main_photo.py
+
+Items that currently have several main photos keep the one shown first
+(lowest display_order, then id); the partial unique index uq_photos_item_main
+is then created.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import text
+from app import app, db
+
+def migrate_database():
+    """Demote duplicate main photos and create the partial unique index"""
+    with app.app_context():
+        try:
+            result = db.session.execute(text("""
+                UPDATE photos SET is_main = false
+                WHERE is_main AND id <> (
+                    SELECT p.id FROM photos p
+                    WHERE p.item_id = photos.item_id AND p.is_main
+                    ORDER BY p.display_order, p.id
+                    LIMIT 1
+                )
+            """))
+            print(f"✅ Demoted {result.rowcount} duplicate main photos")
+
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_photos_item_main ON photos (item_id) WHERE is_main"
+            ))
+            db.session.commit()
+            print("✅ Unique index uq_photos_item_main ready")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    migrate_database()
+    print("🎉 Migration completed successfully!")
@@ -0,0 +1,156 @@
+"""
+A/B Testing Model Comparison Module
+
+Statistical comparison of models over matched test ads:
+- Paired bootstrap confidence interval of the mean score difference
+- Paired sign-flip permutation test
+- Effect sizes (mean difference, Cohen's d_z)
+
+Resampling is vectorized with NumPy and done in batches, so memory stays
+bounded by `max_batch_elements` regardless of the number of iterations.
+Time is not: the bootstrap draws iterations x matched ads values per pair
+(see resamples() and benchmarks/bench_model_comparison.py).
+"""
+
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+METRICS = ('overall_score', 'semantic_score', 'domain_relevance_score', 'grammar_score', 'generation_time')
+
+
+class ModelComparison:
+    """
+    Compares every pair of models in an experiment on a single metric.
+    """
+
+    def __init__(self, iterations: int = 2000, alpha: float = 0.05,
+                 seed: Optional[int] = None, max_batch_elements: int = 8_000_000):
+        self.iterations = iterations
+        self.alpha = alpha
+        self.rng = np.random.default_rng(seed)
+        self.max_batch_elements = max_batch_elements
+
+    def _batches(self, n: int):
+        """Yield batch sizes so that batch * n stays under max_batch_elements"""
+        batch = max(1, min(self.iterations, self.max_batch_elements // max(n, 1)))
+        remaining = self.iterations
+        while remaining > 0:
+            size = min(batch, remaining)
+            yield size
+            remaining -= size
+
+    @staticmethod
+    def per_ad_means(model_names: Sequence[str], ad_ids: Sequence[int],
+                     values: Sequence[float]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Average repeated runs per (model, ad_id).
+        Returns: {model_name: (sorted ad_ids, mean values)}
+        """
+        models = np.asarray(model_names, dtype=object)
+        ads = np.asarray(ad_ids, dtype=np.int64)
+        vals = np.asarray(values, dtype=np.float64)
+
+        result = {}
+        for model in np.unique(models):
+            mask = models == model
+            unique_ads, inverse = np.unique(ads[mask], return_inverse=True)
+            sums = np.bincount(inverse, weights=vals[mask])
+            counts = np.bincount(inverse)
+            result[str(model)] = (unique_ads, sums / counts)
+        return result
+
+    @staticmethod
+    def match(a: Tuple[np.ndarray, np.ndarray], b: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the values of both models on the ad_ids they share"""
+        _, idx_a, idx_b = np.intersect1d(a[0], b[0], assume_unique=True, return_indices=True)
+        return a[1][idx_a], b[1][idx_b]
+
+    def bootstrap_ci(self, diffs: np.ndarray) -> Tuple[float, float]:
+        """Percentile bootstrap confidence interval of the mean paired difference"""
+        n = diffs.size
+        values = diffs.astype(np.float32)
+        means = np.empty(self.iterations)
+        offset = 0
+        for size in self._batches(n):
+            # float32 uniforms scaled to indices are ~2x cheaper than rng.integers
+            idx = (self.rng.random((size, n), dtype=np.float32) * n).astype(np.int32)
+            np.minimum(idx, n - 1, out=idx)
+            means[offset:offset + size] = values[idx].sum(axis=1, dtype=np.float64) / n
+            offset += size
+        low, high = np.quantile(means, [self.alpha / 2, 1 - self.alpha / 2])
+        return float(low), float(high)
+
+    def permutation_p_value(self, diffs: np.ndarray) -> float:
+        """Two-sided paired permutation test (random sign flips of the differences)"""
+        n = diffs.size
+        values = diffs.astype(np.float32)
+        total = float(diffs.sum())
+        observed = abs(total / n)
+        # float32 products are exact to ~1e-7 relative, don't miss ties with the observed mean
+        tolerance = 1e-6 * float(np.abs(diffs).mean())
+        extreme = 0
+        for size in self._batches(n):
+            # One random bit per (iteration, ad): flipped values contribute -d instead of +d,
+            # so each permuted sum is total - 2 * (flips @ d), a single matrix-vector product
+            raw = np.frombuffer(self.rng.bytes((size * n + 7) // 8), dtype=np.uint8)
+            flips = np.unpackbits(raw)[:size * n].reshape(size, n).astype(np.float32)
+            perm_means = (total - 2.0 * (flips @ values)) / n
+            extreme += int(np.count_nonzero(np.abs(perm_means) >= observed - tolerance))
+        return (extreme + 1) / (self.iterations + 1)
+
+    def compare_pair(self, scores_a: np.ndarray, scores_b: np.ndarray) -> Dict:
+        """Full comparison of two models on paired scores"""
+        diffs = scores_a - scores_b
+        n = int(diffs.size)
+        if n == 0:
+            return {'matched_ads': 0}
+
+        mean_diff = float(diffs.mean())
+        std_diff = float(diffs.std(ddof=1)) if n > 1 else 0.0
+        result = {
+            'matched_ads': n,
+            'mean_a': round(float(scores_a.mean()), 4),
+            'mean_b': round(float(scores_b.mean()), 4),
+            'mean_difference': round(mean_diff, 4),
+            'cohens_dz': round(mean_diff / std_diff, 4) if std_diff > 1e-12 else None,
+            'win_rate_a': round(float(np.mean(diffs > 0)), 4),
+        }
+        if n > 1:
+            low, high = self.bootstrap_ci(diffs)
+            p_value = self.permutation_p_value(diffs)
+            result.update({
+                'ci_low': round(low, 4),
+                'ci_high': round(high, 4),
+                'p_value': round(p_value, 5),
+                'significant': p_value < self.alpha
+            })
+        return result
+
+    def matched_pairs(self, model_names: Sequence[str], ad_ids: Sequence[int], values: Sequence[float],
+                      models: Optional[List[str]] = None) -> List[Tuple[str, str, np.ndarray, np.ndarray]]:
+        """(model_a, model_b, scores_a, scores_b) for every pair of models, on the ad_ids they share"""
+        per_model = self.per_ad_means(model_names, ad_ids, values)
+        models = [m for m in (models or sorted(per_model)) if m in per_model]
+        return [(model_a, model_b, *self.match(per_model[model_a], per_model[model_b]))
+                for model_a, model_b in combinations(models, 2)]
+
+    def resamples(self, pairs: List[Tuple[str, str, np.ndarray, np.ndarray]]) -> int:
+        """Bootstrap draws needed to compare `pairs`: the cost of compare_all, about 10 ns each"""
+        return self.iterations * sum(int(scores_a.size) for _, _, scores_a, _ in pairs)
+
+    def compare_all(self, model_names: Sequence[str], ad_ids: Sequence[int],
+                    values: Sequence[float], models: Optional[List[str]] = None,
+                    pairs: Optional[List[Tuple[str, str, np.ndarray, np.ndarray]]] = None) -> List[Dict]:
+        """Compare every pair of models over their matched ad_ids (`pairs` from matched_pairs if already built)"""
+        if pairs is None:
+            pairs = self.matched_pairs(model_names, ad_ids, values, models)
+
+        comparisons = []
+        for model_a, model_b, scores_a, scores_b in pairs:
+            comparison = self.compare_pair(scores_a, scores_b)
+            comparison.update({'model_a': model_a, 'model_b': model_b})
+            comparisons.append(comparison)
+        return comparisons
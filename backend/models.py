@@ -1,8 +1,9 @@
+import hashlib
 from datetime import datetime
-from typing import List
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import JSON
-from app import db
+from typing import Dict, List, Optional
+from sqlalchemy import JSON, event
+from database import db, insert_ignore
+from services.password_hasher import password_hasher
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -89,15 +90,17 @@ class Users(db.Model):
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
+    auth_subject = db.Column(db.String(255), unique=True, index=True)  # Auth0 `sub`, NULL for local accounts
 
 
     items = db.relationship('Items', backref='user', lazy=True, cascade="all, delete")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # Runs on the bounded hashing pool, may raise PasswordHasherBusy
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def to_json(self):
         return {
@@ -107,10 +110,61 @@ class Users(db.Model):
             'email': self.email,
         }
 
+# Make/model pairs per lookup query (two bound parameters each)
+CATALOG_LOOKUP_CHUNK = 500
+
+
+def _variant_key_part(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # 2.0 and 2 are one displacement
+    return str(value)
+
+
+class CarMake(db.Model):
+    """Vehicle catalog: one row per make"""
+    __tablename__ = 'car_makes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+    models = db.relationship('CarModel', backref='make', lazy=True)
+
+
+class CarModel(db.Model):
+    """Vehicle catalog: one row per model of a make"""
+    __tablename__ = 'car_models'
+
+    id = db.Column(db.Integer, primary_key=True)
+    make_id = db.Column(db.Integer, db.ForeignKey('car_makes.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('make_id', 'name', name='uq_car_models_make_name'),
+    )
+
+
 class Car(db.Model):
+    """
+    Vehicle catalog variant: a model in one year/fuel/engine/body configuration.
+
+    Each configuration is stored once (variant_key is unique) and listings
+    point at it through items.car_id. make/model are kept on the row next to
+    model_id so listing search filters without joining the catalog tables;
+    the make/model pickers read car_makes/car_models instead of scanning cars.
+    """
     __tablename__ = 'cars'
 
+    # Columns that identify a variant, hashed into variant_key
+    VARIANT_COLUMNS = ('make', 'model', 'year', 'fuel_type', 'engine_displacement',
+                       'car_size_class', 'doors', 'transmission', 'drive_type')
+
     id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, db.ForeignKey('car_models.id'))
+    variant_key = db.Column(db.LargeBinary(16), nullable=False)  # blake2b-128 of VARIANT_COLUMNS
     make = db.Column(db.String(50), nullable=False)  # Marka
     model = db.Column(db.String(50), nullable=False)  # Model
     year = db.Column(db.Integer, nullable=False)  # Rok produkcji
@@ -121,8 +175,21 @@ class Car(db.Model):
     transmission = db.Column(db.String(20))  # Skrzynia biegów
     drive_type = db.Column(db.String(20))  # Napęd
 
+    __table_args__ = (
+        db.Index('uq_cars_variant_key', 'variant_key', unique=True),
+        # Variants of a model, e.g. the catalog lookup when adding a listing
+        db.Index('ix_cars_model_id_year', 'model_id', 'year'),
+    )
+
     # Relacja do Items
     items = db.relationship('Items', backref='car', lazy=True, cascade="all, delete")
+    catalog_model = db.relationship('CarModel', lazy=True)
+
+    @classmethod
+    def variant_key_for(cls, values: Dict) -> bytes:
+        """Unique key of a variant from its column values (None and '' are the same)"""
+        key = '\x1f'.join(map(_variant_key_part, map(values.get, cls.VARIANT_COLUMNS)))
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
 
     def to_json(self):
         return {
@@ -139,6 +206,51 @@ class Car(db.Model):
         }
 
 
+def resolve_catalog_models(connection, pairs, cache: Optional[Dict] = None) -> Dict:
+    """
+    {(make, model): car_models.id} for make/model name pairs, adding missing
+    car_makes/car_models rows.
+
+    Inserts use ON CONFLICT DO NOTHING, so concurrent writers adding the same
+    make or model both end up with the one row. Pairs already in `cache` are
+    not looked up again and new ones are added to it.
+    """
+    cache = {} if cache is None else cache
+    missing = sorted({pair for pair in pairs if pair not in cache})
+    makes, models = CarMake.__table__, CarModel.__table__
+    dialect = connection.dialect.name
+
+    for start in range(0, len(missing), CATALOG_LOOKUP_CHUNK):
+        chunk = missing[start:start + CATALOG_LOOKUP_CHUNK]
+        names = sorted({make for make, _ in chunk})
+        connection.execute(insert_ignore(makes, dialect), [{'name': name} for name in names])
+        make_ids = dict(connection.execute(db.select(makes.c.name, makes.c.id).where(makes.c.name.in_(names))).all())
+
+        keys = [(make_ids[make], model) for make, model in chunk]
+        connection.execute(insert_ignore(models, dialect), [{'make_id': make_id, 'name': model} for make_id, model in keys])
+        rows = connection.execute(
+            db.select(makes.c.name, models.c.name, models.c.id)
+            .join(makes, makes.c.id == models.c.make_id)
+            .where(db.tuple_(models.c.make_id, models.c.name).in_(keys))
+        )
+        cache.update({(make, model): model_id for make, model, model_id in rows})
+
+    return {pair: cache[pair] for pair in pairs}
+
+
+@event.listens_for(Car, 'before_insert')
+@event.listens_for(Car, 'before_update')
+def _link_car_to_catalog(mapper, connection, car):
+    # Cars created anywhere (listing form, seeds, tests) join the catalog tables
+    state = db.inspect(car)
+    if state.persistent and not any(state.attrs[column].history.has_changes() for column in Car.VARIANT_COLUMNS):
+        return
+    car.variant_key = Car.variant_key_for({column: getattr(car, column) for column in Car.VARIANT_COLUMNS})
+    if car.make and car.model:
+        pair = (car.make.strip(), car.model.strip())
+        car.model_id = resolve_catalog_models(connection, [pair])[pair]
+
+
 class Items(db.Model):
     __tablename__ = 'items'
 
@@ -187,17 +299,24 @@ class Items(db.Model):
 
 class Photo(db.Model):
     __tablename__ = 'photos'
+    __table_args__ = (
+        # At most one main photo per item
+        db.Index('uq_photos_item_main', 'item_id', unique=True,
+                 sqlite_where=db.text('is_main'), postgresql_where=db.text('is_main')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)  # Original filename
-    stored_filename = db.Column(db.String(255), nullable=False)  # Unique filename on disk/S3
+    stored_filename = db.Column(db.String(255), nullable=False, index=True)  # sha256 + extension, shared by duplicates
     file_path = db.Column(db.String(500), nullable=False)  # Full path or URL
     file_size = db.Column(db.Integer)  # Size in bytes
     mime_type = db.Column(db.String(100))  # image/jpeg, image/png, etc.
     is_main = db.Column(db.Boolean, default=False, nullable=False)  # Main photo flag
     display_order = db.Column(db.Integer, default=0, nullable=False)  # Order in gallery
     storage_type = db.Column(db.String(20), default='local', nullable=False)  # 'local' or 'aws_s3'
+    renditions = db.Column(JSON)  # {"thumb": {"width", "height", "webp", "jpeg"}, "card": ..., "full": ...}
+    processing_status = db.Column(db.String(20), default='ready', nullable=False)  # 'pending', 'ready', 'failed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_json(self):
@@ -211,10 +330,65 @@ class Photo(db.Model):
             'isMain': self.is_main,
             'displayOrder': self.display_order,
             'storageType': self.storage_type,
+            'renditions': self.renditions or {},
+            'processingStatus': self.processing_status,
             'createdAt': self.created_at.strftime("%Y-%m-%d %H:%M:%S")
         }
 
 
+class FileDeletion(db.Model):
+    """Outbox of stored files whose photo rows were deleted, processed by services/file_sweeper.py"""
+    __tablename__ = 'file_deletions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    stored_filename = db.Column(db.String(255), nullable=False)
+    storage_type = db.Column(db.String(20), default='local', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+@event.listens_for(Photo, 'after_delete')
+def _queue_file_deletion(mapper, connection, photo):
+    # Written in the deleting transaction (also for Items cascades), so files are
+    # only released when the delete commits and never removed while still referenced
+    connection.execute(FileDeletion.__table__.insert().values(
+        stored_filename=photo.stored_filename,
+        storage_type=photo.storage_type,
+        attempts=0,
+        created_at=datetime.utcnow()
+    ))
+
+
+class ImageTask(db.Model):
+    """Persistent queue of uploaded originals waiting for rendition generation, one row per stored file"""
+    __tablename__ = 'image_tasks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    stored_filename = db.Column(db.String(255), nullable=False, index=True)  # Original, as in photos.stored_filename
+    storage_type = db.Column(db.String(20), default='local', nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    renditions = db.Column(JSON)  # Result, copied onto every Photo row with this stored_filename
+    error = db.Column(db.Text)
+    locked_at = db.Column(db.DateTime)  # Claim time, stale claims are retried
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)  # Latest upload of this content (dedup hits too)
+    finished_at = db.Column(db.DateTime)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'storedFilename': self.stored_filename,
+            'storageType': self.storage_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'createdAt': self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            'finishedAt': self.finished_at.strftime("%Y-%m-%d %H:%M:%S") if self.finished_at else None
+        }
+
+
 # ============================================================================
 # A/B TESTING MODELS (Bachelor's Thesis - LLM Comparison Framework)
 # ============================================================================
@@ -232,6 +406,7 @@ class Experiment(db.Model):
     total_runs = db.Column(db.Integer, default=0)
     completed_runs = db.Column(db.Integer, default=0)
     failed_runs = db.Column(db.Integer, default=0)
+    cache_hits = db.Column(db.Integer, default=0)  # Runs served from the completion cache
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
@@ -253,6 +428,7 @@ class Experiment(db.Model):
             'totalRuns': self.total_runs,
             'completedRuns': self.completed_runs,
             'failedRuns': self.failed_runs,
+            'cacheHits': self.cache_hits or 0,
             'createdAt': self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
             'startedAt': self.started_at.strftime("%Y-%m-%d %H:%M:%S") if self.started_at else None,
             'completedAt': self.completed_at.strftime("%Y-%m-%d %H:%M:%S") if self.completed_at else None,
@@ -303,6 +479,33 @@ class ExperimentRun(db.Model):
         }
 
 
+class CachedCompletion(db.Model):
+    __tablename__ = 'completion_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)  # sha256(model + params + prompt)
+    model_name = db.Column(db.String(100), nullable=False)
+    parameters = db.Column(JSON)  # Generation parameters that were part of the key
+    prompt = db.Column(db.Text, nullable=False)  # Gapped text sent to the model
+    response = db.Column(JSON, nullable=False)  # {filled_text, gaps, generation_time}
+    size_bytes = db.Column(db.Integer, default=0, nullable=False)  # Used for size-bounded eviction
+    hit_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'cacheKey': self.cache_key,
+            'modelName': self.model_name,
+            'parameters': self.parameters,
+            'sizeBytes': self.size_bytes,
+            'hitCount': self.hit_count,
+            'createdAt': self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            'lastUsedAt': self.last_used_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_used_at else None
+        }
+
+
 class QualityEvaluation(db.Model):
     __tablename__ = 'quality_evaluations'
 
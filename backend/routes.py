@@ -1,9 +1,15 @@
-from flask import Flask, jsonify, request, send_file
-from werkzeug.security import generate_password_hash
-from app import app, db
+from flask import Blueprint, current_app, jsonify, request, send_file, send_from_directory, Response, url_for
+from database import db, insert_ignore
 from models import *
 from auth_middleware import requires_auth, requires_auth_optional
-from services.storage_service import storage_service
+from services.storage_service import storage_service, FILE_TOO_LARGE, CONTENT_ADDRESSED_FILE
+from services.image_pipeline import image_pipeline
+from services.image_worker import image_worker
+from services.model_catalog import model_catalog
+from services.gap_fill_client import gap_fill_client
+from services.completion_cache import completion_cache
+from services.progress_stream import progress_broker, ExperimentProgress
+from services.password_hasher import password_hasher, PasswordHasherBusy
 from metrics import GapFillMetrics
 import requests
 import time
@@ -11,17 +17,85 @@ import csv
 from io import StringIO
 from datetime import datetime
 import os
+import json
+import base64
+import mimetypes
+import queue
+from sqlalchemy import case, func, update
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+
+# Every endpoint of the application, registered by create_app()
+api = Blueprint('api', __name__)
 
 
 #ENDPOINT UŻYTKOWNIKÓW
 
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+# Public field name -> column, same names as Users.to_json
+USER_FIELDS = {
+    'id': Users.id,
+    'firstName': Users.first_name,
+    'lastName': Users.last_name,
+    'email': Users.email,
+}
+
 #GET zwraca wszystich użytkowników POST tworzy nowego użytkownika
-@app.route('/api/users', methods=['GET', 'POST'])
+@api.route('/api/users', methods=['GET', 'POST'])
 def users():
     if request.method == 'GET':
-        users = Users.query.all()
-        result = [user.to_json() for user in users]
-        return jsonify(result), 200
+        # Cursor pagination: ?limit=&cursor=&email=<prefix>&fields=id,email
+        limit = request.args.get('limit', USERS_PAGE_SIZE, type=int)
+        if not 1 <= limit <= USERS_MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {USERS_MAX_PAGE_SIZE}'}), 400
+
+        fields = request.args.get('fields')
+        fields = fields.split(',') if fields else list(USER_FIELDS)
+        unknown = [f for f in fields if f not in USER_FIELDS]
+        if unknown:
+            return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+
+        email_prefix = request.args.get('email')
+        # Searching walks the email index in order, otherwise the primary key
+        sort_column = Users.email if email_prefix else Users.id
+
+        columns = [USER_FIELDS[f] for f in fields]
+        if sort_column not in columns:
+            columns.append(sort_column)
+        query = db.session.query(*columns)
+
+        if email_prefix:
+            # Range instead of LIKE so the unique index on email is used (case-sensitive prefix)
+            query = query.filter(Users.email >= email_prefix, Users.email < email_prefix + '\U0010ffff')
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                last_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            except (ValueError, UnicodeDecodeError):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            # Must be a key of the sort column (int id / str email), not a list, dict or bool
+            if type(last_key) is not sort_column.type.python_type:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(sort_column > last_key)
+
+        rows = query.order_by(sort_column).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        result = [{f: row[i] for i, f in enumerate(fields)} for row in rows]
+        response = jsonify(result)
+        if has_more:
+            last_key = rows[-1][columns.index(sort_column)]
+            next_cursor = base64.urlsafe_b64encode(json.dumps(last_key).encode('utf-8')).decode('ascii')
+            args = request.args.to_dict()
+            args['cursor'] = next_cursor
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{url_for(".users", _external=True, **args)}>; rel="next"'
+        return response, 200
 
     if request.method == 'POST':
         try:
@@ -37,7 +111,7 @@ def users():
             email = data.get('email')
             password = data.get('password')
 
-            password_hash = generate_password_hash(password)
+            password_hash = password_hasher.hash(password)
 
             new_user = Users(first_name=first_name, last_name=last_name, email=email, password_hash=password_hash)
 
@@ -46,12 +120,15 @@ def users():
 
             return jsonify(new_user.to_json()), 201
 
+        except PasswordHasherBusy:
+            db.session.rollback()
+            return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
         
 #Zwraca konkretnego użytkownika
-@app.route('/api/users/<int:user_id>', methods=['GET'])
+@api.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = Users.query.get(user_id)
     if not user:
@@ -59,7 +136,7 @@ def get_user(user_id):
     return jsonify(user.to_json()), 200
 
 #Edycja użytkownika
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@api.route('/api/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     user = Users.query.get(user_id)
     if not user:
@@ -73,13 +150,17 @@ def update_user(user_id):
     if 'email' in data:
         user.email = data['email']
     if 'password' in data:
-        user.set_password(data['password'])
+        try:
+            user.set_password(data['password'])
+        except PasswordHasherBusy:
+            db.session.rollback()
+            return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
 
     db.session.commit()
     return jsonify(user.to_json()), 200
 
 #Usuwanie użytkownika
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@api.route('/api/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = Users.query.get(user_id)
     if not user:
@@ -93,7 +174,7 @@ def delete_user(user_id):
 #ENDPOINT OGŁOSZEŃ
 
 #Tworzenie nowego ogłoszenia
-@app.route('/api/items', methods=['POST'])
+@api.route('/api/items', methods=['POST'])
 @requires_auth
 def create_item():
     try:
@@ -107,8 +188,9 @@ def create_item():
 
         # Remove user_id from required fields since we get it from auth
         user_id = user.id
-        make = data.get('make')
-        model = data.get('model')
+        # Stripped like the catalog names, so ' Toyota' finds the Toyota variant
+        make = (data.get('make') or '').strip()
+        model = (data.get('model') or '').strip()
         year = data.get('year')
         price = data.get('price')
         car_mileage = data.get('car_mileage')
@@ -116,23 +198,25 @@ def create_item():
         description = data.get('description')
 
         # Sprawdzamy, czy samochód już istnieje w bazie (np. marka + model + rok)
-        existing_car = Car.query.filter_by(make=make, model=model, year=year).first()
+        existing_car = (Car.query
+                        .join(CarModel, CarModel.id == Car.model_id)
+                        .join(CarMake, CarMake.id == CarModel.make_id)
+                        .filter(CarMake.name == make, CarModel.name == model, Car.year == year)
+                        .first())
 
         if not existing_car:
-            # Tworzymy nowy samochód
-            new_car = Car()
-            new_car.make = make
-            new_car.model = model
-            new_car.year = year
-            new_car.fuel_type = data.get('fuel_type')
-            new_car.engine_displacement = data.get('engine_displacement')
-            new_car.car_size_class = data.get('car_size_class')
-            new_car.doors = data.get('doors')
-            new_car.transmission = data.get('transmission')
-            new_car.drive_type = data.get('drive_type')
-            db.session.add(new_car)
-            db.session.commit()
-            car_id = new_car.id
+            # Tworzymy nowy samochód. ON CONFLICT DO NOTHING: a concurrent listing of the
+            # same new variant may insert it first (uq_cars_variant_key), both then use that row
+            new_car = {column: data.get(column) for column in Car.VARIANT_COLUMNS}
+            new_car.update(make=make, model=model, year=year)
+            new_car['variant_key'] = Car.variant_key_for(new_car)
+            connection = db.session.connection()
+            if make and model:
+                new_car['model_id'] = resolve_catalog_models(connection, [(make, model)])[(make, model)]
+            connection.execute(insert_ignore(Car.__table__, connection.dialect.name), [new_car])
+            car_id = db.session.execute(
+                db.select(Car.id).where(Car.variant_key == new_car['variant_key'])
+            ).scalar_one()
         else:
             car_id = existing_car.id        # Tworzymy ogłoszenie
         attributes = {
@@ -158,7 +242,7 @@ def create_item():
         return jsonify({'error': str(e)}), 500
 
 #Zwraca wszystkie ogłoszenie
-@app.route('/api/items', methods=['GET'])
+@api.route('/api/items', methods=['GET'])
 def get_all_items():
     items = db.session.query(Items, Car).join(Car, Items.car_id == Car.id).all()
 
@@ -185,7 +269,7 @@ def get_all_items():
 
 
 #Zwraca konkretne ogłoszenie
-@app.route('/api/items/<int:item_id>', methods=['GET'])
+@api.route('/api/items/<int:item_id>', methods=['GET'])
 def get_item(item_id):
     item = Items.query.get(item_id)
     if not item:
@@ -193,7 +277,7 @@ def get_item(item_id):
     return jsonify(item.to_json()), 200
 
 #Edycja ogłoszenia
-@app.route('/api/items/<int:item_id>', methods=['PUT'])
+@api.route('/api/items/<int:item_id>', methods=['PUT'])
 @requires_auth
 def update_item(item_id):
     data = request.json
@@ -223,7 +307,7 @@ def update_item(item_id):
 
 
 #Usuwanie ogłoszenia
-@app.route('/api/items/<int:item_id>', methods=['DELETE'])
+@api.route('/api/items/<int:item_id>', methods=['DELETE'])
 @requires_auth
 def delete_item(item_id):
     user = request.current_user  # Get authenticated user
@@ -242,7 +326,7 @@ def delete_item(item_id):
 
 
 #Zwraca ogłoszenia według ustawionych filtrów
-@app.route('/api/items/filter', methods=['GET'])
+@api.route('/api/items/filter', methods=['GET'])
 def filter_items():
     make = request.args.get('make')
     model = request.args.get('model')
@@ -292,23 +376,68 @@ def filter_items():
 
 
 # Pobranie unikalnych marek samochodów
-@app.route('/api/cars/makes', methods=['GET'])
+@api.route('/api/cars/makes', methods=['GET'])
 def get_makes():
-    makes = db.session.query(Car.make).distinct().all()
+    # car_makes holds each make once: no DISTINCT over the whole catalog
+    makes = db.session.query(CarMake.name).order_by(CarMake.name).all()
     return jsonify([make[0] for make in makes]), 200
 
 # Pobranie modeli na podstawie marki
-@app.route('/api/cars/models', methods=['GET'])
+@api.route('/api/cars/models', methods=['GET'])
 def get_models():
     make = request.args.get('make')
     if not make:
         return jsonify({'error': 'Make is required'}), 400
 
-    models = db.session.query(Car.model).filter(Car.make == make).distinct().order_by(Car.model).all()
+    models = (db.session.query(CarModel.name)
+              .join(CarMake, CarMake.id == CarModel.make_id)
+              .filter(CarMake.name == make)
+              .order_by(CarModel.name)
+              .all())
     return jsonify([model[0] for model in models]), 200
 
+@api.app_errorhandler(413)
+def request_entity_too_large(e):
+    """Request body larger than MAX_CONTENT_LENGTH"""
+    return jsonify({'error': FILE_TOO_LARGE}), 413
+
+
+MAX_GALLERY_FILES = int(os.getenv('MAX_GALLERY_FILES', '20'))
+PRESIGNED_UPLOAD_EXPIRES = int(os.getenv('PRESIGNED_UPLOAD_EXPIRES', '900'))
+# Content-addressed originals and renditions never change
+IMMUTABLE_CACHE_SECONDS = 365 * 24 * 3600
+# Files with legacy timestamp names
+PHOTO_CACHE_SECONDS = 24 * 3600
+
+
+@api.route('/uploads/photos/<path:filename>', methods=['GET', 'HEAD'])
+def serve_photo(filename):
+    """Serve a locally stored photo with long-lived caching, ETag/304 and Range support"""
+    immutable = CONTENT_ADDRESSED_FILE.match(filename) is not None
+    max_age = IMMUTABLE_CACHE_SECONDS if immutable else PHOTO_CACHE_SECONDS
+
+    if current_app.config['PHOTO_SENDFILE_MODE'] == 'x-accel':
+        # nginx streams the file (and handles ETag/Range) without holding a Python worker
+        path = safe_join(storage_service.upload_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return jsonify({'error': 'Photo not found'}), 404
+        response = Response(status=200)
+        response.headers['X-Accel-Redirect'] = current_app.config['PHOTO_ACCEL_PREFIX'] + filename
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        # conditional=True answers If-None-Match/If-Modified-Since with 304 and Range with 206;
+        # with USE_X_SENDFILE the body is handed to the front server instead
+        response = send_from_directory(storage_service.upload_folder, filename, conditional=True, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
 # Photo upload endpoint
-@app.route('/api/photos/upload', methods=['POST'])
+@api.route('/api/photos/upload', methods=['POST'])
 @requires_auth
 def upload_photo():
     """Upload a single photo file"""
@@ -327,7 +456,18 @@ def upload_photo():
         success, file_info, error_message = storage_service.upload_file(file)
         
         if not success:
-            return jsonify({'error': error_message}), 400
+            return jsonify({'error': error_message}), 413 if error_message == FILE_TOO_LARGE else 400
+
+        try:
+            file.stream.seek(0)
+            image_pipeline.validate(file.stream)
+        except Exception as e:
+            storage_service.delete_file(file_info['file_path'], file_info['storage_type'])
+            return jsonify({'error': f'Invalid image: {str(e)}'}), 400
+
+        # Resized WebP/JPEG copies are generated by the background image worker
+        image_worker.enqueue(file_info['stored_filename'], file_info['storage_type'])
+        file_info['processing_status'] = 'pending'
 
         # Return file info for frontend to store temporarily
         return jsonify({
@@ -335,12 +475,23 @@ def upload_photo():
             'file': file_info
         }), 200
 
+    except RequestEntityTooLarge:
+        return jsonify({'error': FILE_TOO_LARGE}), 413
     except Exception as e:
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 
+def _photo_processing_state(task):
+    """(renditions, processing_status) for a new photo of an already queued stored file"""
+    if task.status == 'done':
+        return task.renditions, 'ready'
+    if task.status == 'failed':
+        return None, 'failed'
+    return None, 'pending'
+
+
 # Batch photo upload for item
-@app.route('/api/items/<int:item_id>/photos', methods=['POST'])
+@api.route('/api/items/<int:item_id>/photos', methods=['POST'])
 @requires_auth
 def upload_item_photos(item_id):
     """Upload multiple photos for an item"""
@@ -363,35 +514,145 @@ def upload_item_photos(item_id):
         photos_data = data['photos']
         saved_photos = []
 
-        for idx, photo_data in enumerate(photos_data):
+        # Only files stored by the upload endpoints: a content-addressed name (never a path)
+        # that exists in its backend. Paths, sizes and renditions are derived server-side
+        stats = []
+        for photo_data in photos_data:
+            stored_filename = photo_data.get('stored_filename') or ''
+            if not CONTENT_ADDRESSED_FILE.match(stored_filename):
+                return jsonify({'error': f'Invalid stored_filename: {stored_filename}'}), 400
+            try:
+                stat = storage_service.stat_object(stored_filename, photo_data.get('storage_type', 'local'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if stat is None:
+                return jsonify({'error': f'Photo file not found: {stored_filename}'}), 404
+            stats.append(stat)
+
+        # Renditions may already be done if the worker was faster than the form
+        stored_filenames = [photo_data['stored_filename'] for photo_data in photos_data]
+        tasks = {task.stored_filename: task for task in
+                 ImageTask.query.filter(ImageTask.stored_filename.in_(stored_filenames)).all()}
+
+        # Only one main photo (uq_photos_item_main): an existing main is kept, otherwise the first
+        # one marked is_main (or the first photo). Decided before any add, queries would autoflush
+        has_main = Photo.query.filter_by(item_id=item_id, is_main=True).first() is not None
+        marked = [idx for idx, photo_data in enumerate(photos_data) if photo_data.get('is_main')]
+        main_index = None if has_main else (marked or [0])[0]
+
+        for idx, (photo_data, stat) in enumerate(zip(photos_data, stats)):
+            stored_filename = photo_data['stored_filename']
+            storage_type = photo_data.get('storage_type', 'local')
+            task = tasks.get(stored_filename)
+            if task is None:
+                # Uploaded before background processing existed
+                task = image_worker.enqueue(stored_filename, storage_type, commit=False)
+            renditions, processing_status = _photo_processing_state(task)
+
             # Create photo record in database
             photo = Photo(
                 item_id=item_id,
-                filename=photo_data['filename'],
-                stored_filename=photo_data['stored_filename'],
-                file_path=photo_data['file_path'],
-                file_size=photo_data.get('file_size'),
-                mime_type=photo_data.get('mime_type'),
-                is_main=photo_data.get('is_main', False),
+                filename=secure_filename(photo_data.get('filename') or '') or stored_filename,
+                stored_filename=stored_filename,
+                file_path=storage_service.public_path(stored_filename, storage_type),
+                file_size=stat['size'],
+                mime_type=stat['content_type'],
+                is_main=idx == main_index,
                 display_order=idx,
-                storage_type=photo_data.get('storage_type', 'local')
+                storage_type=storage_type,
+                renditions=renditions,
+                processing_status=processing_status
             )
             
             db.session.add(photo)
             saved_photos.append(photo)
 
-        # Ensure only one main photo
-        main_photos = [p for p in saved_photos if p.is_main]
-        if len(main_photos) > 1:
-            # Keep only the first one as main
-            for i, photo in enumerate(main_photos):
-                if i > 0:
-                    photo.is_main = False
-        elif len(main_photos) == 0 and saved_photos:
-            # Set first photo as main if none specified
+        db.session.commit()
+        image_worker.notify()
+
+        return jsonify({
+            'success': True,
+            'message': f'Uploaded {len(saved_photos)} photos',
+            'photos': [photo.to_json() for photo in saved_photos]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Photo upload failed: {str(e)}'}), 500
+
+
+# Multipart gallery upload: store every file and attach it to the item in one request
+@api.route('/api/items/<int:item_id>/photos/upload', methods=['POST'])
+@requires_auth
+def upload_item_gallery(item_id):
+    """Upload several photo files for an item (form field 'files', optional 'main_index')"""
+    try:
+        user = request.current_user
+
+        item = Items.query.get(item_id)
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+
+        if item.user_id != user.id:
+            return jsonify({'error': 'You are not authorized to upload photos for this item'}), 403
+
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > MAX_GALLERY_FILES:
+            return jsonify({'error': f'At most {MAX_GALLERY_FILES} files per request'}), 400
+        main_index = request.form.get('main_index', 0, type=int)
+
+        # Files are written/streamed to storage concurrently
+        results = storage_service.upload_files(files)
+
+        errors = []
+        for file, (success, file_info, error_message) in zip(files, results):
+            if not success:
+                errors.append({'filename': file.filename, 'error': error_message})
+                continue
+            try:
+                file.stream.seek(0)
+                image_pipeline.validate(file.stream)
+            except Exception as e:
+                errors.append({'filename': file.filename, 'error': f'Invalid image: {str(e)}'})
+
+        if errors:
+            # All or nothing: drop the files this request added
+            for success, file_info, _ in results:
+                if success and not file_info['deduplicated']:
+                    storage_service.delete_file(file_info['file_path'], file_info['storage_type'])
+            status = 413 if any(e['error'] == FILE_TOO_LARGE for e in errors) else 400
+            return jsonify({'error': 'Photo upload failed', 'files': errors}), status
+
+        # Queue renditions and create every photo row in one transaction
+        display_order = Photo.query.filter_by(item_id=item_id).count()
+        has_main = Photo.query.filter_by(item_id=item_id, is_main=True).first() is not None
+        saved_photos = []
+        for idx, (_, file_info, _) in enumerate(results):
+            task = image_worker.enqueue(file_info['stored_filename'], file_info['storage_type'], commit=False)
+            renditions, processing_status = _photo_processing_state(task)
+            photo = Photo(
+                item_id=item_id,
+                filename=file_info['filename'],
+                stored_filename=file_info['stored_filename'],
+                file_path=file_info['file_path'],
+                file_size=file_info['file_size'],
+                mime_type=file_info['mime_type'],
+                is_main=not has_main and idx == main_index,
+                display_order=display_order + idx,
+                storage_type=file_info['storage_type'],
+                renditions=renditions,
+                processing_status=processing_status
+            )
+            db.session.add(photo)
+            saved_photos.append(photo)
+
+        if not has_main and not any(photo.is_main for photo in saved_photos):
             saved_photos[0].is_main = True
 
         db.session.commit()
+        image_worker.notify()
 
         return jsonify({
             'success': True,
@@ -399,13 +660,121 @@ def upload_item_photos(item_id):
             'photos': [photo.to_json() for photo in saved_photos]
         }), 201
 
+    except RequestEntityTooLarge:
+        return jsonify({'error': FILE_TOO_LARGE}), 413
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Photo upload failed: {str(e)}'}), 500
 
 
+# Direct-to-S3 uploads: the browser PUTs the bytes to the bucket, the app only signs and verifies
+@api.route('/api/photos/presign', methods=['POST'])
+@requires_auth
+def presign_photo_upload():
+    """Presigned S3 PUT for one photo, named by the SHA-256 the client computed"""
+    try:
+        if storage_service.storage_type != 'aws_s3':
+            return jsonify({'error': 'Direct uploads require S3 storage'}), 400
+
+        data = request.json or {}
+        filename = secure_filename(data.get('filename') or '')
+        content_type = data.get('contentType') or ''
+        checksum = (data.get('sha256') or '').lower()
+        size = data.get('size')
+
+        if not storage_service.is_allowed_file(filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+        if not content_type.startswith('image/'):
+            return jsonify({'error': 'contentType must be an image type'}), 400
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({'error': 'size must be a positive integer'}), 400
+        if storage_service.max_file_size and size > storage_service.max_file_size:
+            return jsonify({'error': FILE_TOO_LARGE}), 413
+
+        stored_filename = storage_service.content_filename(checksum, filename)
+        if not CONTENT_ADDRESSED_FILE.match(stored_filename):
+            return jsonify({'error': 'sha256 must be a hex SHA-256 digest'}), 400
+
+        file_info = {
+            'filename': filename,
+            'stored_filename': stored_filename,
+            'file_path': storage_service.public_path(stored_filename),
+            'file_size': size,
+            'mime_type': content_type,
+            'storage_type': 'aws_s3'
+        }
+
+        # Same content already in the bucket: nothing to upload
+        if storage_service.stat_object(stored_filename) is not None:
+            return jsonify({'uploadRequired': False, 'file': file_info}), 200
+
+        upload = storage_service.presign_upload(stored_filename, content_type, size, checksum,
+                                                PRESIGNED_UPLOAD_EXPIRES)
+        return jsonify({'uploadRequired': True, 'upload': upload, 'file': file_info}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Presign failed: {str(e)}'}), 500
+
+
+@api.route('/api/items/<int:item_id>/photos/complete', methods=['POST'])
+@requires_auth
+def complete_photo_upload(item_id):
+    """Verify a directly uploaded object and attach it to the item"""
+    try:
+        user = request.current_user
+
+        item = Items.query.get(item_id)
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+
+        if item.user_id != user.id:
+            return jsonify({'error': 'You are not authorized to upload photos for this item'}), 403
+
+        data = request.json or {}
+        stored_filename = data.get('storedFilename') or ''
+        if not CONTENT_ADDRESSED_FILE.match(stored_filename):
+            return jsonify({'error': 'Invalid storedFilename'}), 400
+
+        # The bytes never reached the app: check what actually landed in the bucket
+        stat = storage_service.stat_object(stored_filename, 'aws_s3')
+        if stat is None:
+            return jsonify({'error': 'Upload not found'}), 404
+        if storage_service.max_file_size and stat['size'] > storage_service.max_file_size:
+            storage_service.delete_file(storage_service.public_path(stored_filename, 'aws_s3'), 'aws_s3')
+            return jsonify({'error': FILE_TOO_LARGE}), 413
+        if not (stat['content_type'] or '').startswith('image/'):
+            return jsonify({'error': 'Uploaded object is not an image'}), 400
+
+        # S3 rejected bodies not matching the signed SHA-256; the image worker checks it again on download
+        task = image_worker.enqueue(stored_filename, 'aws_s3', commit=False)
+        renditions, processing_status = _photo_processing_state(task)
+        has_main = Photo.query.filter_by(item_id=item_id, is_main=True).first() is not None
+        photo = Photo(
+            item_id=item_id,
+            filename=secure_filename(data.get('filename') or '') or stored_filename,
+            stored_filename=stored_filename,
+            file_path=storage_service.public_path(stored_filename, 'aws_s3'),
+            file_size=stat['size'],
+            mime_type=stat['content_type'],
+            is_main=not has_main,
+            display_order=Photo.query.filter_by(item_id=item_id).count(),
+            storage_type='aws_s3',
+            renditions=renditions,
+            processing_status=processing_status
+        )
+        db.session.add(photo)
+        db.session.commit()
+        image_worker.notify()
+
+        return jsonify({'success': True, 'photo': photo.to_json()}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Upload completion failed: {str(e)}'}), 500
+
+
 # Get photos for an item
-@app.route('/api/items/<int:item_id>/photos', methods=['GET'])
+@api.route('/api/items/<int:item_id>/photos', methods=['GET'])
 def get_item_photos(item_id):
     """Get all photos for an item"""
     item = Items.query.get(item_id)
@@ -420,7 +789,7 @@ def get_item_photos(item_id):
 
 
 # Delete a photo
-@app.route('/api/photos/<int:photo_id>', methods=['DELETE'])
+@api.route('/api/photos/<int:photo_id>', methods=['DELETE'])
 @requires_auth
 def delete_photo(photo_id):
     """Delete a photo"""
@@ -436,10 +805,7 @@ def delete_photo(photo_id):
         if not item or item.user_id != user.id:
             return jsonify({'error': 'You are not authorized to delete this photo'}), 403
 
-        # Delete file from storage
-        storage_service.delete_file(photo.file_path, photo.storage_type)
-        
-        # Delete from database
+        # Files are released by the file sweeper once the outbox row commits
         db.session.delete(photo)
         db.session.commit()
 
@@ -451,7 +817,7 @@ def delete_photo(photo_id):
 
 
 # Update photo order and main photo
-@app.route('/api/items/<int:item_id>/photos/reorder', methods=['PUT'])
+@api.route('/api/items/<int:item_id>/photos/reorder', methods=['PUT'])
 @requires_auth
 def reorder_photos(item_id):
     """Reorder photos and set main photo"""
@@ -470,12 +836,34 @@ def reorder_photos(item_id):
         if not data or 'photos' not in data:
             return jsonify({'error': 'No photo data provided'}), 400
 
-        # Update photo order and main photo
-        for photo_data in data['photos']:
-            photo = Photo.query.get(photo_data['id'])
-            if photo and photo.item_id == item_id:
-                photo.display_order = photo_data.get('display_order', 0)
-                photo.is_main = photo_data.get('is_main', False)
+        try:
+            orders = {int(p['id']): int(p.get('display_order', 0)) for p in data['photos']}
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each photo needs an integer id and display_order'}), 400
+        main_ids = [int(p['id']) for p in data['photos'] if p.get('is_main')]
+        if len(main_ids) > 1:
+            return jsonify({'error': 'Only one photo can be the main photo'}), 400
+        main_id = main_ids[0] if main_ids else None
+
+        # One UPDATE for the whole gallery, restricted to this item; ids of other items match nothing
+        values = {}
+        if orders:
+            values['display_order'] = case(orders, value=Photo.id, else_=Photo.display_order)
+        if main_id is not None:
+            # Clear the old main first: unique indexes are checked row by row, so the
+            # new main is set by a second statement
+            values['is_main'] = case((Photo.id == main_id, Photo.is_main), else_=False)
+        if values:
+            db.session.execute(update(Photo).where(Photo.item_id == item_id).values(values)
+                               .execution_options(synchronize_session=False))
+        if main_id is not None:
+            result = db.session.execute(
+                update(Photo).where(Photo.item_id == item_id, Photo.id == main_id).values(is_main=True)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                return jsonify({'error': 'Main photo does not belong to this item'}), 400
 
         db.session.commit()
 
@@ -490,7 +878,7 @@ def reorder_photos(item_id):
 # A/B TESTING ENDPOINTS (Bachelor's Thesis - LLM Comparison Framework)
 # ============================================================================
 
-@app.route('/api/experiments', methods=['GET', 'POST'])
+@api.route('/api/experiments', methods=['GET', 'POST'])
 def experiments():
     """List all experiments or create a new one."""
     try:
@@ -537,7 +925,7 @@ def experiments():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<int:experiment_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/api/experiments/<int:experiment_id>', methods=['GET', 'PUT', 'DELETE'])
 def experiment_detail(experiment_id):
     """Get, update, or delete a specific experiment."""
     try:
@@ -565,6 +953,8 @@ def experiment_detail(experiment_id):
                 experiment.notes = data['notes']
             
             db.session.commit()
+            if 'status' in data:
+                progress_broker.publish_status(experiment_id, experiment.status)
             return jsonify(experiment.to_json()), 200
         
         elif request.method == 'DELETE':
@@ -578,7 +968,7 @@ def experiment_detail(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<int:experiment_id>/runs', methods=['GET', 'POST'])
+@api.route('/api/experiments/<int:experiment_id>/runs', methods=['GET', 'POST'])
 def experiment_runs(experiment_id):
     """Get all runs for an experiment or add a new run."""
     try:
@@ -637,6 +1027,7 @@ def experiment_runs(experiment_id):
                 experiment.failed_runs += 1
             
             db.session.commit()
+            progress_broker.publish_run(experiment_id, _run_progress(run))
             
             return jsonify(run.to_json()), 201
     
@@ -645,7 +1036,199 @@ def experiment_runs(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<int:experiment_id>/results', methods=['GET'])
+def _run_progress(run):
+    """Fields of an ExperimentRun needed by the progress stream"""
+    return {
+        'id': run.id,
+        'model_name': run.model_name,
+        'status': run.status,
+        'overall_score': run.overall_score,
+        'semantic_score': run.semantic_score,
+        'domain_relevance_score': run.domain_relevance_score,
+        'grammar_score': run.grammar_score,
+        'generation_time': run.generation_time
+    }
+
+
+def _load_experiment_progress(experiment):
+    """Seed stream state with one aggregate query (per model and status)"""
+    progress = ExperimentProgress(experiment.id, experiment.status)
+    rows = db.session.query(
+        ExperimentRun.model_name,
+        ExperimentRun.status,
+        func.count(ExperimentRun.id),
+        func.max(ExperimentRun.id),
+        *[func.coalesce(func.sum(getattr(ExperimentRun, score)), 0) for score in ExperimentProgress.SCORES]
+    ).filter(ExperimentRun.experiment_id == experiment.id) \
+        .group_by(ExperimentRun.model_name, ExperimentRun.status).all()
+
+    for model_name, status, count, last_run_id, *sums in rows:
+        progress.last_run_id = max(progress.last_run_id, last_run_id)
+        model = progress._model(model_name)
+        model['runs'] += count
+        progress.total_runs += count
+        if status == 'success':
+            model['successful_runs'] += count
+            progress.completed_runs += count
+            for score, total in zip(ExperimentProgress.SCORES, sums):
+                model['sums'][score] += total
+        else:
+            progress.failed_runs += count
+    return progress
+
+
+@api.route('/api/experiments/<int:experiment_id>/stream', methods=['GET'])
+def stream_experiment_progress(experiment_id):
+    """Server-Sent Events stream of run counters and per-model averages."""
+    experiment = Experiment.query.get(experiment_id)
+
+    if not experiment:
+        return jsonify({'error': 'Experiment not found'}), 404
+
+    keep_alive = current_app.config.get('SSE_KEEP_ALIVE_SECONDS', 15)
+    subscriber = progress_broker.subscribe(experiment_id, lambda: _load_experiment_progress(experiment))
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=keep_alive)
+                except queue.Empty:
+                    yield progress_broker.format_event(None)
+                    continue
+                yield progress_broker.format_event(event)
+        finally:
+            progress_broker.unsubscribe(experiment_id, subscriber)
+
+    # Not wrapped in stream_with_context: the request (and its DB session) ends here,
+    # so an idle viewer does not hold a database connection
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+    })
+
+
+def _score_gap_fills(text_with_gaps, gaps):
+    """Score MCP gap results with GapFillMetrics, returns run-level averages"""
+    fills = []
+    for idx, gap in enumerate(gaps or [], start=1):
+        if isinstance(gap, dict):
+            word = gap.get('choice') or gap.get('word') or gap.get('filled') or ''
+            fills.append({'index': gap.get('index', idx), 'word': word, 'context': text_with_gaps})
+        else:
+            fills.append({'index': idx, 'word': str(gap), 'context': text_with_gaps})
+    return GapFillMetrics.evaluate_multiple_fills([f for f in fills if f['word']])
+
+
+@api.route('/api/experiments/<int:experiment_id>/run', methods=['POST'])
+def run_experiment(experiment_id):
+    """Run every experiment model over the given gapped texts and store the runs."""
+    try:
+        experiment = Experiment.query.get(experiment_id)
+
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        data = request.json
+        if not data or 'items' not in data:
+            return jsonify({'error': 'Missing required field: items'}), 400
+
+        parameters = experiment.parameters or {}
+        use_cache = completion_cache.is_enabled_for(parameters)
+
+        experiment.status = 'running'
+        experiment.started_at = experiment.started_at or datetime.utcnow()
+        db.session.commit()
+        progress_broker.publish_status(experiment_id, experiment.status)
+
+        results = []
+        cache_hits = 0
+        for idx, item in enumerate(data['items'], start=1):
+            text_with_gaps = item.get('text_with_gaps') or item.get('text') or ''
+            item_id = item.get('id', idx)
+            # Free-form ids (the frontend sends item-<timestamp>) get an id derived from the text,
+            # so /compare pairs the same text across runs and never pairs unrelated ones
+            ad_id = int(item_id) if str(item_id).isdigit() else completion_cache.text_id(text_with_gaps)
+
+            for model_name in experiment.models:
+                cached = completion_cache.get(model_name, parameters, text_with_gaps) if use_cache else None
+                if cached is not None:
+                    success, output, error_message = True, cached, None
+                    cache_hits += 1
+                else:
+                    success, output, error_message = gap_fill_client.fill_gaps(model_name, text_with_gaps, parameters)
+                    if success and use_cache:
+                        completion_cache.put(model_name, parameters, text_with_gaps, output)
+
+                run = ExperimentRun(
+                    experiment_id=experiment_id,
+                    model_name=model_name,
+                    ad_id=ad_id,
+                    original_text=text_with_gaps,
+                    status='success' if success else 'error',
+                    error_message=error_message
+                )
+                if success:
+                    scores = _score_gap_fills(text_with_gaps, output.get('gaps'))
+                    run.filled_text = output.get('filled_text')
+                    run.gap_fills = output.get('gaps')
+                    run.semantic_score = scores['average_semantic']
+                    run.domain_relevance_score = scores['average_domain_relevance']
+                    run.grammar_score = scores['average_grammar']
+                    run.overall_score = scores['average_overall']
+                    run.generation_time = output.get('generation_time')
+                    experiment.completed_runs = (experiment.completed_runs or 0) + 1
+                else:
+                    experiment.failed_runs = (experiment.failed_runs or 0) + 1
+                experiment.total_runs = (experiment.total_runs or 0) + 1
+
+                db.session.add(run)
+                db.session.commit()
+                progress_broker.publish_run(experiment_id, _run_progress(run))
+
+                result = run.to_json()
+                result.update({
+                    'item_id': item_id,
+                    'model_name': run.model_name,
+                    'original_text': run.original_text,
+                    'filled_text': run.filled_text,
+                    'overall_score': run.overall_score,
+                    'generation_time': run.generation_time,
+                    'cached': cached is not None
+                })
+                results.append(result)
+
+        experiment.cache_hits = (experiment.cache_hits or 0) + cache_hits
+        experiment.status = 'completed'
+        experiment.completed_at = datetime.utcnow()
+        db.session.commit()
+        progress_broker.publish_status(experiment_id, experiment.status)
+
+        return jsonify({
+            'experimentId': experiment_id,
+            'totalRuns': len(results),
+            'cacheHits': cache_hits,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/completion-cache', methods=['GET'])
+def completion_cache_stats():
+    """Get completion cache size and hit statistics."""
+    return jsonify(completion_cache.stats()), 200
+
+
+@api.route('/api/storage/metrics', methods=['GET'])
+def storage_metrics():
+    """Get per-backend latency and throughput of storage operations."""
+    return jsonify(storage_service.metrics()), 200
+
+
+@api.route('/api/experiments/<int:experiment_id>/results', methods=['GET'])
 def experiment_results(experiment_id):
     """Get aggregated results and statistics for an experiment."""
     try:
@@ -688,6 +1271,7 @@ def experiment_results(experiment_id):
             'experimentName': experiment.name,
             'status': experiment.status,
             'totalRuns': experiment.total_runs,
+            'cacheHits': experiment.cache_hits or 0,
             'modelStats': model_stats
         }), 200
     
@@ -695,7 +1279,77 @@ def experiment_results(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<int:experiment_id>/export', methods=['GET'])
+# The comparison runs inside the request: 2000 iterations give stable 95% percentile intervals,
+# the caps keep one request to a few seconds (benchmarks/bench_model_comparison.py)
+COMPARE_DEFAULT_ITERATIONS = 2000
+COMPARE_MAX_PAIRS = int(os.getenv('COMPARE_MAX_PAIRS', '10'))
+COMPARE_MAX_RESAMPLES = int(os.getenv('COMPARE_MAX_RESAMPLES', str(300_000_000)))
+
+
+@api.route('/api/experiments/<int:experiment_id>/compare', methods=['GET'])
+def compare_experiment_models(experiment_id):
+    """Pairwise statistical comparison of models over matched ad_ids."""
+    # NumPy is only loaded by this endpoint, not at worker startup
+    from model_comparison import ModelComparison, METRICS
+
+    try:
+        experiment = Experiment.query.get(experiment_id)
+
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        metric = request.args.get('metric', 'overall_score')
+        if metric not in METRICS:
+            return jsonify({'error': f'Invalid metric, expected one of: {", ".join(METRICS)}'}), 400
+
+        iterations = request.args.get('iterations', COMPARE_DEFAULT_ITERATIONS, type=int)
+        alpha = request.args.get('alpha', 0.05, type=float)
+        seed = request.args.get('seed', None, type=int)
+        selected = request.args.get('models')
+        if not 100 <= iterations <= 100000:
+            return jsonify({'error': 'iterations must be between 100 and 100000'}), 400
+        if not 0 < alpha < 1:
+            return jsonify({'error': 'alpha must be between 0 and 1'}), 400
+        models = [m for m in selected.split(',') if m] if selected else experiment.models
+
+        # Fetch only the three columns needed, not full ExperimentRun objects
+        column = getattr(ExperimentRun, metric)
+        rows = db.session.query(ExperimentRun.model_name, ExperimentRun.ad_id, column).filter(
+            ExperimentRun.experiment_id == experiment_id,
+            ExperimentRun.status == 'success',
+            column.isnot(None)
+        ).all()
+
+        comparisons = []
+        if rows:
+            model_names, ad_ids, values = zip(*rows)
+            comparison = ModelComparison(iterations=iterations, alpha=alpha, seed=seed)
+            pairs = comparison.matched_pairs(model_names, ad_ids, values, models=models)
+
+            if len(pairs) > COMPARE_MAX_PAIRS:
+                return jsonify({'error': f'{len(pairs)} model pairs, select at most {COMPARE_MAX_PAIRS} '
+                                         f'with ?models=a,b,...'}), 400
+            resamples = comparison.resamples(pairs)
+            if resamples > COMPARE_MAX_RESAMPLES:
+                allowed = iterations * COMPARE_MAX_RESAMPLES // resamples
+                return jsonify({'error': f'Too much resampling for one request, use at most {allowed} '
+                                         f'iterations or fewer models'}), 400
+
+            comparisons = comparison.compare_all(model_names, ad_ids, values, pairs=pairs)
+
+        return jsonify({
+            'experimentId': experiment_id,
+            'metric': metric,
+            'iterations': iterations,
+            'alpha': alpha,
+            'comparisons': comparisons
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/experiments/<int:experiment_id>/export', methods=['GET'])
 def export_experiment_results(experiment_id):
     """Export experiment results as CSV."""
     import csv
@@ -747,7 +1401,7 @@ def export_experiment_results(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<int:experiment_id>/evaluations', methods=['GET', 'POST'])
+@api.route('/api/experiments/<int:experiment_id>/evaluations', methods=['GET', 'POST'])
 def experiment_evaluations(experiment_id):
     """Get or create quality evaluations for an experiment."""
     try:
@@ -798,34 +1452,7 @@ def experiment_evaluations(experiment_id):
 
 
 # Available LLM models endpoint
-@app.route('/api/models', methods=['GET'])
+@api.route('/api/models', methods=['GET'])
 def get_available_models():
-    """Get list of available models from Bielik service"""
-    try:
-        BIELIK_API_URL = os.environ.get('BIELIK_APP_URL', 'http://localhost:8000')
-        
-        # Try to get from Bielik service
-        response = requests.get(f'{BIELIK_API_URL}/models', timeout=5)
-        
-        if response.status_code == 200:
-            models = response.json()
-            return jsonify([{'name': m.get('name', m) if isinstance(m, dict) else m} for m in models]), 200
-        
-        # Fallback if service not available
-        fallback_models = [
-            'bielik-1.5b-gguf',
-            'bielik-11b-gguf',
-            'llama-3.1-8b'
-        ]
-        return jsonify([{'name': m} for m in fallback_models]), 200
-    
-    except:
-        # Fallback if service not available
-        fallback_models = [
-            'bielik-1.5b-gguf',
-            'bielik-11b-gguf',
-            'llama-3.1-8b'
-        ]
-        return jsonify([{'name': m} for m in fallback_models]), 200
-
-
+    """Get list of available models from Bielik service (cached, see services/model_catalog.py)"""
+    return jsonify(model_catalog.get_models()), 200
@@ -10,7 +10,7 @@ from datetime import datetime
 
 # Import Flask app and models
 try:
-    from app import app, db
+    from app import app, db, init_database
     from models import Users, Car, Items
     print("✅ Successfully imported app and models")
 except ImportError as e:
@@ -20,12 +20,12 @@ except ImportError as e:
 def seed_database():
     """Seed the database with sample data"""
     
+    # Create tables and load the vehicle catalog, as on first app start
+    init_database(app)
+
     with app.app_context():
         print("Starting database seeding...")
         
-        # Create tables if they don't exist
-        db.create_all()
-        
         # Check if we already have sample data
         existing_items = Items.query.count()
         if existing_items > 0:
@@ -0,0 +1,209 @@
+import csv
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+from database import db, insert_ignore
+from models import Car, CarMake, CarModel, Items, resolve_catalog_models
+
+
+class CarCatalogLoader:
+    """
+    Streams the vehicle catalog CSV (final_vehicle_data.csv) into the `cars` table.
+
+    Rows are read with the csv module and inserted with executemany in batches
+    of `batch_size`, so memory stays flat however large the file is. The whole
+    load runs in one transaction: a failed or interrupted load leaves `cars`
+    empty and the next run starts over. Indexes on `cars` are dropped for the
+    load and rebuilt once at the end, which is much cheaper than maintaining
+    them row by row.
+
+    The CSV repeats identical rows; each variant is stored once. Repeats
+    within a batch are dropped before the insert and the rest collapse on
+    the unique variant_key index (ON CONFLICT DO NOTHING), so no set of every
+    key seen is held in memory. make/model names are resolved to
+    car_makes/car_models ids on the way in.
+
+    Loading is idempotent: a table that already has cars is left alone.
+    Later catalog versions are applied with refresh(), which only inserts
+    the variants that are new.
+    """
+
+    # CSV header -> cars column and type
+    COLUMNS = {
+        'Make': ('make', str),
+        'Model': ('model', str),
+        'Year': ('year', int),
+        'Fuel Type1': ('fuel_type', str),
+        'Engine displacement': ('engine_displacement', float),
+        'Typ nadwozia': ('car_size_class', str),
+    }
+    REQUIRED = ('make', 'model', 'year')
+
+    def __init__(self, batch_size: int = 10000):
+        self.batch_size = batch_size
+
+    @classmethod
+    def parse_row(cls, row: Dict[str, str]) -> Optional[Dict]:
+        """A CSV row as cars values (blank -> NULL), None when it can't be a car"""
+        record = {}
+        for header, (column, convert) in cls.COLUMNS.items():
+            value = (row.get(header) or '').strip()
+            try:
+                # '1984.0' -> 1984: years may come from a spreadsheet export
+                record[column] = (int(float(value)) if convert is int else convert(value)) if value else None
+            except ValueError:
+                return None
+        if any(record[column] is None for column in cls.REQUIRED):
+            return None
+        return record
+
+    def read_batches(self, path: str, stats: Dict) -> Iterator[List[Dict]]:
+        """Parsed rows of the CSV, `batch_size` at a time"""
+        with open(path, newline='', encoding='utf-8') as f:
+            batch = []
+            for row in csv.DictReader(f):
+                record = self.parse_row(row)
+                if record is None:
+                    stats['rejected'] += 1
+                    continue
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def _insert_variants(self, conn, path: str, stats: Dict, progress=None, seen=None):
+        """Insert the file's variants that are not stored yet, recording every key in `seen` if given"""
+        insert = insert_ignore(Car.__table__, conn.dialect.name)
+        insert_seen = insert_ignore(seen, conn.dialect.name) if seen is not None else None
+        catalog_models = {}
+        for batch in self.read_batches(path, stats):
+            # Repeats are usually adjacent in the file: most never reach the database
+            variants = {}
+            for record in batch:
+                variants.setdefault(Car.variant_key_for(record), record)
+            resolve_catalog_models(conn, [(record['make'], record['model']) for record in variants.values()],
+                                   catalog_models)
+            for key, record in variants.items():
+                record['model_id'] = catalog_models[(record['make'], record['model'])]
+                record['variant_key'] = key
+            conn.execute(insert, list(variants.values()))
+            if insert_seen is not None:
+                conn.execute(insert_seen, [{'variant_key': key} for key in variants])
+            stats['read'] += len(batch)
+            if progress:
+                progress(stats['read'])
+
+    def load(self, path: str, progress=None) -> Dict:
+        """
+        Load the catalog CSV unless `cars` already has rows (call inside an app context).
+
+        `progress(read)` is called after every batch. Raises FileNotFoundError
+        when the file is missing.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        stats = {'status': 'loaded', 'read': 0, 'loaded': 0, 'duplicates': 0, 'rejected': 0, 'seconds': 0.0}
+        started = time.perf_counter()
+        table = Car.__table__
+
+        # The session's own connection: on PostgreSQL a second one would wait
+        # for the session's locks before it could drop the indexes
+        conn = db.session.connection()
+        try:
+            if conn.execute(db.select(db.func.count()).select_from(table)).scalar():
+                stats['status'] = 'skipped'
+                return stats
+
+            # The unique variant_key index stays: it is what collapses duplicates
+            indexes = [index for index in table.indexes if not index.unique]
+            for index in indexes:
+                index.drop(conn, checkfirst=True)
+
+            self._insert_variants(conn, path, stats, progress)
+
+            for index in indexes:
+                index.create(conn)
+            stats['loaded'] = conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+            stats['duplicates'] = stats['read'] - stats['loaded']
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats['seconds'] = time.perf_counter() - started
+        return stats
+
+    def refresh(self, path: str, prune: bool = False, progress=None) -> Dict:
+        """
+        Bring `cars` up to date with a new catalog CSV (call inside an app context).
+
+        Every row is reduced to its content hash (variant_key) and only keys
+        that are not stored yet are inserted; existing variants, and the
+        listings pointing at them, are not touched. A row whose values
+        changed hashes to a new key and is added as a new variant. Counts are
+        per variant: `added` + `unchanged` are the file's unique keys, repeated
+        rows are reported as `duplicates` like load() does. With `prune`,
+        variants missing from the file are deleted unless a listing still
+        uses them, then makes/models left without variants.
+
+        Runs in one transaction like load(). Raises FileNotFoundError when the
+        file is missing.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        stats = {'status': 'refreshed', 'read': 0, 'added': 0, 'unchanged': 0, 'duplicates': 0, 'pruned': 0,
+                 'rejected': 0, 'seconds': 0.0}
+        started = time.perf_counter()
+        cars = Car.__table__
+        count_cars = db.select(db.func.count()).select_from(cars)
+
+        conn = db.session.connection()
+        try:
+            before = conn.execute(count_cars).scalar()
+
+            # Keys present in the file, kept in the database rather than in memory
+            seen = db.Table('catalog_refresh_keys', db.MetaData(),
+                            db.Column('variant_key', cars.c.variant_key.type, primary_key=True),
+                            prefixes=['TEMPORARY'])
+            seen.create(conn)
+
+            self._insert_variants(conn, path, stats, progress, seen)
+            unique = conn.execute(db.select(db.func.count()).select_from(seen)).scalar()
+            stats['added'] = conn.execute(count_cars).scalar() - before
+            stats['unchanged'] = unique - stats['added']
+            stats['duplicates'] = stats['read'] - unique
+
+            if prune:
+                stats['pruned'] = self._prune(conn, seen)
+            seen.drop(conn)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats['seconds'] = time.perf_counter() - started
+        return stats
+
+    @staticmethod
+    def _prune(conn, seen) -> int:
+        """Delete unreferenced variants whose key is not in `seen` and the catalog rows they leave empty"""
+        cars, items = Car.__table__, Items.__table__
+        makes, models = CarMake.__table__, CarModel.__table__
+        result = conn.execute(cars.delete().where(
+            ~db.exists().where(seen.c.variant_key == cars.c.variant_key),
+            ~db.exists().where(items.c.car_id == cars.c.id)
+        ))
+        conn.execute(models.delete().where(~db.exists().where(cars.c.model_id == models.c.id)))
+        conn.execute(makes.delete().where(~db.exists().where(models.c.make_id == makes.c.id)))
+        return result.rowcount
+
+
+# Global car catalog loader instance
+# Can be configured via environment variables
+car_catalog_loader = CarCatalogLoader(
+    batch_size=int(os.environ.get('CATALOG_BATCH_SIZE', '10000'))
+)
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from database import db, insert_on_conflict
+from models import CachedCompletion
+
+
+# Only parameters that change the generated text are part of the cache key
+KEY_PARAMETERS = ('temperature', 'max_tokens', 'grammar_enabled')
+
+# Text ids live in [2**30, 2**31): they fit an INTEGER column and stay clear of Items ids
+TEXT_ID_BASE = 2 ** 30
+
+
+class CompletionCache:
+    """
+    Content-addressed cache of LLM gap-filling results, stored in the
+    `completion_cache` table. Entries are keyed by sha256(model + params + prompt)
+    and evicted least-recently-used first once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = 50 * 1024 * 1024, evict_batch: int = 100):
+        self.max_bytes = max_bytes
+        self.evict_batch = evict_batch
+
+    @staticmethod
+    def key_parameters(parameters: Optional[dict]) -> dict:
+        parameters = parameters or {}
+        return {name: parameters.get(name) for name in KEY_PARAMETERS}
+
+    @classmethod
+    def make_key(cls, model: str, parameters: Optional[dict], prompt: str) -> str:
+        """Hash of the canonical JSON of model, relevant parameters and prompt"""
+        payload = json.dumps({
+            'model': model,
+            'parameters': cls.key_parameters(parameters),
+            'prompt': prompt
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def text_id(prompt: str) -> int:
+        """Stable integer id of a prompt, the same for every model and run"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return TEXT_ID_BASE + int(digest[:8], 16) % TEXT_ID_BASE
+
+    @staticmethod
+    def is_enabled_for(parameters: Optional[dict]) -> bool:
+        """Cache deterministic runs (temperature 0) or when explicitly requested"""
+        parameters = parameters or {}
+        if 'cache_enabled' in parameters:
+            return bool(parameters['cache_enabled'])
+        try:
+            return float(parameters.get('temperature', 0.3)) == 0.0
+        except (TypeError, ValueError):
+            return False
+
+    def get(self, model: str, parameters: Optional[dict], prompt: str) -> Optional[dict]:
+        """Return the cached response and bump its hit counter, or None"""
+        entry = CachedCompletion.query.filter_by(cache_key=self.make_key(model, parameters, prompt)).first()
+        if not entry:
+            return None
+        entry.hit_count += 1
+        entry.last_used_at = datetime.utcnow()
+        return entry.response
+
+    def put(self, model: str, parameters: Optional[dict], prompt: str, response: dict):
+        """Store a response (caller commits), evicting old entries if over budget"""
+        size_bytes = len(prompt.encode('utf-8')) + len(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+        now = datetime.utcnow()
+
+        # One upsert: concurrent runs of the same prompt both write instead of one failing on cache_key
+        table = CachedCompletion.__table__
+        stmt = insert_on_conflict(table, db.session.get_bind().dialect.name).values(
+            cache_key=self.make_key(model, parameters, prompt),
+            model_name=model,
+            parameters=self.key_parameters(parameters),
+            prompt=prompt,
+            response=response,
+            size_bytes=size_bytes,
+            hit_count=0,
+            created_at=now,
+            last_used_at=now
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.cache_key],
+            set_={'response': stmt.excluded.response, 'size_bytes': stmt.excluded.size_bytes,
+                  'last_used_at': stmt.excluded.last_used_at}
+        ))
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries, `evict_batch` at a time, until the total size fits in max_bytes"""
+        total = db.session.query(func.coalesce(func.sum(CachedCompletion.size_bytes), 0)).scalar()
+        excess = total - self.max_bytes
+        evicted = 0
+        while excess > 0:
+            rows = db.session.query(CachedCompletion.id, CachedCompletion.size_bytes) \
+                .order_by(CachedCompletion.last_used_at.asc(), CachedCompletion.id.asc()) \
+                .limit(self.evict_batch).all()
+            if not rows:
+                break
+            victims = []
+            for entry_id, size_bytes in rows:
+                if excess <= 0:
+                    break
+                victims.append(entry_id)
+                excess -= size_bytes or 0
+            CachedCompletion.query.filter(CachedCompletion.id.in_(victims)).delete(synchronize_session=False)
+            evicted += len(victims)
+        return evicted
+
+    def stats(self) -> dict:
+        entries, size_bytes, hits = db.session.query(
+            func.count(CachedCompletion.id),
+            func.coalesce(func.sum(CachedCompletion.size_bytes), 0),
+            func.coalesce(func.sum(CachedCompletion.hit_count), 0)
+        ).one()
+        return {
+            'entries': entries,
+            'sizeBytes': size_bytes,
+            'maxBytes': self.max_bytes,
+            'totalHits': hits
+        }
+
+
+# Global completion cache instance
+# Can be configured via environment variables
+completion_cache = CompletionCache(
+    max_bytes=int(os.getenv('COMPLETION_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+)
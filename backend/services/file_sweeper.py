@@ -0,0 +1,190 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from flask import current_app
+from database import db
+from models import FileDeletion, ImageTask, Photo
+from services.image_pipeline import FORMATS, RENDITIONS, ImagePipeline
+from services.storage_service import storage_service as default_storage
+
+
+class FileSweeper:
+    """
+    Removes stored photo files once no photo references them.
+
+    Deleting a Photo (directly or through an Items cascade) only writes a row to
+    the `file_deletions` outbox inside the same transaction. The sweeper takes
+    the outbox in batches, re-checks references - files are content-addressed
+    and shared - and deletes the original plus its renditions in bulk (one
+    DeleteObjects call per 1000 S3 keys, unlink locally). Files re-uploaded
+    within `grace` may still be attached by an open form and are deferred.
+
+    scan_orphans() reconciles the uploads folder/bucket against the photos
+    table and removes files nothing points to (uploads that were never
+    attached, leftovers from before the outbox existed, stale .part files).
+    """
+
+    def __init__(self, storage=None, batch_size: int = 500, interval: float = 60.0,
+                 grace: timedelta = timedelta(hours=1), max_attempts: int = 5):
+        self.storage = storage or default_storage
+        self.batch_size = batch_size
+        self.interval = interval
+        self.grace = grace
+        self.max_attempts = max_attempts
+        self.app = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def stored_files(stored_filename: str) -> List[str]:
+        """The original and every rendition generated from it"""
+        return [stored_filename] + [
+            ImagePipeline.rendition_filename(stored_filename, name, key)
+            for name, _ in RENDITIONS for key, _, _ in FORMATS
+        ]
+
+    @staticmethod
+    def original_stem(filename: str) -> str:
+        """Stem of the original a stored file belongs to ('<sha>_thumb.webp' -> '<sha>')"""
+        stem = os.path.splitext(filename)[0]
+        for name, _ in RENDITIONS:
+            if stem.endswith(f'_{name}'):
+                return stem[:-len(name) - 1]
+        return stem
+
+    def _recent_uploads(self, stored_filenames) -> set:
+        rows = (db.session.query(ImageTask.stored_filename, ImageTask.storage_type)
+                .filter(ImageTask.stored_filename.in_(stored_filenames),
+                        ImageTask.last_uploaded_at >= datetime.utcnow() - self.grace)
+                .all())
+        return {tuple(row) for row in rows}
+
+    def sweep(self) -> dict:
+        """Process one outbox batch, returns counts of released/shared/deferred/failed files"""
+        stats = {'released': 0, 'shared': 0, 'deferred': 0, 'failed': 0}
+        rows = FileDeletion.query.order_by(FileDeletion.created_at, FileDeletion.id).limit(self.batch_size).all()
+        if not rows:
+            return stats
+
+        names = {row.stored_filename for row in rows}
+        referenced = {tuple(row) for row in db.session.query(Photo.stored_filename, Photo.storage_type)
+                      .filter(Photo.stored_filename.in_(names)).distinct()}
+        recent = self._recent_uploads(names)
+        now = datetime.utcnow()
+
+        to_release = {}
+        for row in rows:
+            key = (row.stored_filename, row.storage_type)
+            if key in referenced:
+                # Still shared; deleting the remaining photo queues it again
+                db.session.delete(row)
+                stats['shared'] += 1
+            elif key in recent:
+                row.created_at = now
+                stats['deferred'] += 1
+            else:
+                to_release.setdefault(row.storage_type, []).append(row)
+
+        for storage_type, release_rows in to_release.items():
+            released_names = sorted({row.stored_filename for row in release_rows})
+            files = [path for name in released_names for path in self.stored_files(name)]
+            errors = self.storage.delete_many(files, storage_type)
+            failed = {name: next(errors[path] for path in self.stored_files(name) if path in errors)
+                      for name in released_names if any(path in errors for path in self.stored_files(name))}
+
+            for row in release_rows:
+                if row.stored_filename not in failed:
+                    db.session.delete(row)
+                    stats['released'] += 1
+                    continue
+                row.attempts += 1
+                row.error = failed[row.stored_filename]
+                row.created_at = now
+                stats['failed'] += 1
+                if row.attempts >= self.max_attempts:
+                    # Left to scan_orphans
+                    print(f"Giving up deleting {row.stored_filename}: {row.error}")
+                    db.session.delete(row)
+
+            # Re-uploading the same content later must generate renditions again
+            released = [name for name in released_names if name not in failed]
+            if released:
+                ImageTask.query.filter(ImageTask.stored_filename.in_(released),
+                                       ImageTask.storage_type == storage_type).delete(synchronize_session=False)
+
+        db.session.commit()
+        return stats
+
+    def sweep_all(self) -> dict:
+        """Sweep until the outbox holds only deferred rows"""
+        totals = {'released': 0, 'shared': 0, 'deferred': 0, 'failed': 0}
+        while True:
+            stats = self.sweep()
+            for key, value in stats.items():
+                totals[key] += value
+            if stats['released'] + stats['shared'] == 0:
+                return totals
+
+    def scan_orphans(self, storage_type: Optional[str] = None, min_age: timedelta = timedelta(hours=24),
+                     dry_run: bool = False) -> List[str]:
+        """Delete (or with dry_run only list) stored files no photo, upload or outbox row refers to"""
+        storage_type = storage_type or self.storage.storage_type
+        known = set()
+        for query in (db.session.query(Photo.stored_filename).filter(Photo.storage_type == storage_type),
+                      db.session.query(ImageTask.stored_filename).filter(
+                          ImageTask.storage_type == storage_type,
+                          ImageTask.last_uploaded_at >= datetime.utcnow() - self.grace),
+                      db.session.query(FileDeletion.stored_filename).filter(
+                          FileDeletion.storage_type == storage_type)):
+            known.update(self.original_stem(name) for (name,) in query.yield_per(1000))
+
+        cutoff = datetime.utcnow() - min_age
+        orphans = [name for name, modified in self.storage.list_files(storage_type)
+                   if modified < cutoff and self.original_stem(name) not in known]
+
+        if orphans and not dry_run:
+            errors = self.storage.delete_many(orphans, storage_type)
+            for name, error in errors.items():
+                print(f"Error deleting orphan {name}: {error}")
+        return orphans
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.sweep_all()
+            except Exception as e:
+                print(f"File sweep failed: {str(e)}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def start(self, app=None):
+        """Start the background sweep thread (idempotent)"""
+        if self._thread is not None:
+            return
+        self.app = app or current_app._get_current_object()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='file-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+# Global file sweeper instance
+# Can be configured via environment variables
+file_sweeper = FileSweeper(
+    batch_size=int(os.getenv('FILE_SWEEP_BATCH_SIZE', '500')),
+    interval=float(os.getenv('FILE_SWEEP_INTERVAL', '60')),
+    grace=timedelta(seconds=int(os.getenv('PHOTO_UPLOAD_GRACE_SECONDS', '3600')))
+)
@@ -0,0 +1,78 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Tuple, Optional
+
+
+class GapFillClient:
+    """Client for the MCP gap-filling service (POST /api/v1/enhance-description)"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0, pool_size: int = 4):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def build_request(model: str, text_with_gaps: str, parameters: dict, item_id: str = 'experiment') -> dict:
+        """Build the MCP request body, same shape as the frontend's buildMCPRequest"""
+        parameters = parameters or {}
+        return {
+            'domain': 'cars',
+            'model': model,
+            'items': [
+                {
+                    'id': item_id,
+                    'text_with_gaps': text_with_gaps,
+                    'attributes': {}
+                }
+            ],
+            'options': {
+                'language': 'pl',
+                'temperature': parameters.get('temperature', 0.3),
+                'max_new_tokens': parameters.get('max_tokens', 200),
+                'grammar_enabled': parameters.get('grammar_enabled', False),
+                'top_n_per_gap': 1
+            }
+        }
+
+    def fill_gaps(self, model: str, text_with_gaps: str, parameters: dict) -> Tuple[bool, Optional[dict], Optional[str]]:
+        """
+        Fill gaps in a single text
+        Returns: (success, result, error_message) where result is {filled_text, gaps, generation_time}
+        """
+        body = self.build_request(model, text_with_gaps, parameters)
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f'{self.base_url}/api/v1/enhance-description', json=body, timeout=self.timeout)
+            if response.status_code != 200:
+                return False, None, f"MCP Error {response.status_code}: {response.text}"
+
+            data = response.json()
+            items = data.get('items') or []
+            if not items:
+                return False, None, "Invalid MCP response structure"
+
+            item = items[0]
+            if item.get('status') not in ('ok', 'warning'):
+                return False, None, item.get('error') or "Gap filling failed"
+
+            return True, {
+                'filled_text': item.get('filled_text'),
+                'gaps': item.get('gaps') or [],
+                'generation_time': round(time.perf_counter() - start, 3)
+            }, None
+
+        except Exception as e:
+            return False, None, f"Gap filling failed: {str(e)}"
+
+
+# Global gap-filling client instance
+# Can be configured via environment variables
+gap_fill_client = GapFillClient(
+    base_url=os.getenv('MCP_SERVICE_URL', 'http://localhost:8001'),
+    timeout=float(os.getenv('MCP_REQUEST_TIMEOUT', '120'))
+)
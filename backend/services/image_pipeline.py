@@ -0,0 +1,100 @@
+import os
+from io import BytesIO
+from typing import BinaryIO, Optional
+from PIL import Image, ImageOps
+from services.storage_service import storage_service as default_storage
+
+
+# (name, longest edge in px), largest first so each size is derived from the previous one
+RENDITIONS = (('full', 1920), ('card', 800), ('thumb', 320))
+
+# (key, Pillow format, mime type)
+FORMATS = (('webp', 'WEBP', 'image/webp'), ('jpeg', 'JPEG', 'image/jpeg'))
+
+
+class ImagePipeline:
+    """
+    Generates resized WebP/JPEG renditions of uploaded photos.
+
+    The original is decoded once (JPEG decoding is downscaled in the DCT via
+    `draft`), rotated according to its EXIF orientation and then shrunk step by
+    step from the largest rendition to the smallest. Renditions are saved
+    without EXIF/ICC metadata, so GPS coordinates and camera serials are not
+    republished, and images are never upscaled.
+    """
+
+    def __init__(self, storage=None, webp_quality: int = 80, jpeg_quality: int = 82):
+        self.storage = storage or default_storage
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+
+    @staticmethod
+    def rendition_filename(stored_filename: str, name: str, extension: str) -> str:
+        stem = os.path.splitext(stored_filename)[0]
+        return f"{stem}_{name}.{extension}"
+
+    @staticmethod
+    def validate(source: BinaryIO):
+        """Cheap structural check (no pixel decoding), raises if `source` is not an image"""
+        with Image.open(source) as image:
+            image.verify()
+        source.seek(0)
+
+    def _load(self, source: BinaryIO) -> Image.Image:
+        image = Image.open(source)
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the full rendition is smaller
+        largest = RENDITIONS[0][1]
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        return image
+
+    def _encode(self, image: Image.Image, pil_format: str) -> bytes:
+        buffer = BytesIO()
+        if pil_format == 'JPEG':
+            if image.mode == 'RGBA':
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, 'WEBP', quality=self.webp_quality, method=4)
+        return buffer.getvalue()
+
+    def generate(self, source: BinaryIO, stored_filename: str, storage_type: Optional[str] = None) -> dict:
+        """
+        Build and store every rendition of `source`
+        Returns: {name: {'width', 'height', 'webp': path, 'jpeg': path}}
+        """
+        image = self._load(source)
+        renditions = {}
+
+        for name, edge in RENDITIONS:
+            if max(image.size) > edge:
+                image.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=3.0)
+
+            rendition = {'width': image.width, 'height': image.height}
+            for key, pil_format, mime_type in FORMATS:
+                filename = self.rendition_filename(stored_filename, name, key)
+                rendition[key] = self.storage.store_bytes(
+                    self._encode(image, pil_format), filename, mime_type, storage_type
+                )
+            renditions[name] = rendition
+
+        return renditions
+
+    def delete(self, renditions: Optional[dict], storage_type: Optional[str] = None):
+        """Remove stored renditions of a photo"""
+        for rendition in (renditions or {}).values():
+            for key, _, _ in FORMATS:
+                if rendition.get(key):
+                    self.storage.delete_file(rendition[key], storage_type)
+
+
+# Global image pipeline instance
+# Can be configured via environment variables
+image_pipeline = ImagePipeline(
+    webp_quality=int(os.getenv('PHOTO_WEBP_QUALITY', '80')),
+    jpeg_quality=int(os.getenv('PHOTO_JPEG_QUALITY', '82'))
+)
@@ -0,0 +1,214 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from flask import current_app
+from database import db
+from models import ImageTask, Photo
+from services.image_pipeline import image_pipeline as default_pipeline
+from services.storage_service import storage_service as default_storage, CONTENT_ADDRESSED_FILE
+
+
+class ChecksumMismatch(Exception):
+    """Stored bytes do not hash to their content-addressed name, not retried"""
+    pass
+
+
+class ImageWorker:
+    """
+    Generates photo renditions off the request thread.
+
+    Uploads only store the original and insert a row into `image_tasks`, so
+    request latency is the disk write. A poller thread claims pending tasks
+    (an atomic UPDATE ... WHERE status='pending', safe across processes),
+    runs the image pipeline on a small thread pool - Pillow releases the GIL
+    while resizing and encoding - and copies the result onto every `Photo`
+    with the same stored_filename. Tasks survive restarts: stale claims are
+    retried after `lease_seconds`, failures up to `max_attempts` times.
+    """
+
+    def __init__(self, pipeline=None, storage=None, max_workers: int = 2, poll_interval: float = 2.0,
+                 lease_seconds: int = 300, max_attempts: int = 3):
+        self.pipeline = pipeline or default_pipeline
+        self.storage = storage or default_storage
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.app = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._in_flight = threading.BoundedSemaphore(max_workers)
+
+    def notify(self):
+        """Wake the poller, e.g. after committing tasks queued with commit=False"""
+        self._wakeup.set()
+
+    def enqueue(self, stored_filename: str, storage_type: str, commit: bool = True) -> ImageTask:
+        """Queue rendition generation for a stored original (once per content-addressed file)"""
+        task = (ImageTask.query
+                .filter_by(stored_filename=stored_filename, storage_type=storage_type)
+                .order_by(ImageTask.id.desc())
+                .first())
+        if task is None:
+            task = ImageTask(stored_filename=stored_filename, storage_type=storage_type)
+            db.session.add(task)
+        else:
+            task.last_uploaded_at = datetime.utcnow()
+            if task.status == 'failed':
+                task.status, task.attempts, task.error, task.finished_at = 'pending', 0, None, None
+        if not commit:
+            db.session.flush()
+            return task
+        db.session.commit()
+        if task.status == 'pending':
+            self.notify()
+        return task
+
+    def _claim(self, task_id: int) -> bool:
+        claimed = ImageTask.query.filter_by(id=task_id, status='pending').update({
+            'status': 'running',
+            'attempts': ImageTask.attempts + 1,
+            'locked_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _process(self, task_id: int):
+        task = db.session.get(ImageTask, task_id)
+        try:
+            with self.storage.open_file(task.stored_filename, task.storage_type) as source:
+                self._verify_checksum(task.stored_filename, source)
+                renditions = self.pipeline.generate(source, task.stored_filename, task.storage_type)
+        except Exception as e:
+            db.session.rollback()
+            task = db.session.get(ImageTask, task_id)
+            task.error = str(e)
+            task.locked_at = None
+            if isinstance(e, ChecksumMismatch):
+                # Never let wrong bytes be served or deduplicated under this name
+                self.storage.delete_file(self.storage.public_path(task.stored_filename, task.storage_type),
+                                         task.storage_type)
+            if isinstance(e, ChecksumMismatch) or task.attempts >= self.max_attempts:
+                task.status = 'failed'
+                task.finished_at = datetime.utcnow()
+                Photo.query.filter_by(stored_filename=task.stored_filename).update(
+                    {'processing_status': 'failed'}, synchronize_session=False)
+            else:
+                task.status = 'pending'
+            db.session.commit()
+            print(f"Image task {task_id} failed (attempt {task.attempts}): {str(e)}")
+            return
+
+        task.status = 'done'
+        task.renditions = renditions
+        task.error = None
+        task.finished_at = datetime.utcnow()
+        Photo.query.filter_by(stored_filename=task.stored_filename).update(
+            {'renditions': renditions, 'processing_status': 'ready'}, synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def _verify_checksum(stored_filename: str, source):
+        """Direct-to-S3 uploads never pass through the app, so their name is checked here"""
+        if not CONTENT_ADDRESSED_FILE.match(stored_filename):
+            return
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(chunk)
+        source.seek(0)
+        if digest.hexdigest() != os.path.splitext(stored_filename)[0]:
+            raise ChecksumMismatch(f'Content of {stored_filename} does not match its SHA-256')
+
+    def reconcile(self):
+        """Retry stale claims and fill photos created after their task finished"""
+        stale_before = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        ImageTask.query.filter(ImageTask.status == 'running', ImageTask.locked_at < stale_before).update(
+            {'status': 'pending', 'locked_at': None}, synchronize_session=False)
+
+        finished = (db.session.query(Photo, ImageTask)
+                    .join(ImageTask, ImageTask.stored_filename == Photo.stored_filename)
+                    .filter(Photo.processing_status == 'pending', ImageTask.status.in_(('done', 'failed')))
+                    .all())
+        for photo, task in finished:
+            photo.renditions = task.renditions
+            photo.processing_status = 'ready' if task.status == 'done' else 'failed'
+        db.session.commit()
+
+    def _pending_ids(self, limit: int):
+        rows = (db.session.query(ImageTask.id)
+                .filter(ImageTask.status == 'pending')
+                .order_by(ImageTask.id)
+                .limit(limit)
+                .all())
+        return [row.id for row in rows]
+
+    def run_pending(self, limit: int = 100) -> int:
+        """Process pending tasks on the calling thread, returns how many were claimed"""
+        self.reconcile()
+        processed = 0
+        for task_id in self._pending_ids(limit):
+            if self._claim(task_id):
+                self._process(task_id)
+                processed += 1
+        return processed
+
+    def _run_in_context(self, task_id: int):
+        try:
+            with self.app.app_context():
+                self._process(task_id)
+        finally:
+            self._in_flight.release()
+            self._wakeup.set()
+
+    def _poll(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.reconcile()
+                    free = 0
+                    while self._in_flight.acquire(blocking=False):
+                        free += 1
+                    task_ids = self._pending_ids(free) if free else []
+                    claimed = [task_id for task_id in task_ids if self._claim(task_id)]
+                for _ in range(free - len(claimed)):
+                    self._in_flight.release()
+                for task_id in claimed:
+                    self._executor.submit(self._run_in_context, task_id)
+            except Exception as e:
+                print(f"Image worker poll failed: {str(e)}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self, app=None):
+        """Start the poller thread (idempotent)"""
+        if self._thread is not None:
+            return
+        self.app = app or current_app._get_current_object()
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-worker')
+        self._thread = threading.Thread(target=self._poll, name='image-worker-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._thread = None
+        self._executor = None
+
+
+# Global image worker instance
+# Can be configured via environment variables
+image_worker = ImageWorker(
+    max_workers=int(os.getenv('IMAGE_WORKER_THREADS', '2')),
+    poll_interval=float(os.getenv('IMAGE_WORKER_POLL_INTERVAL', '2')),
+    max_attempts=int(os.getenv('IMAGE_WORKER_MAX_ATTEMPTS', '3'))
+)
@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import List, Optional
+
+
+FALLBACK_MODELS = [
+    'bielik-1.5b-gguf',
+    'bielik-11b-gguf',
+    'llama-3.1-8b'
+]
+
+
+class CircuitBreaker:
+    """
+    Minimal circuit breaker for an upstream HTTP dependency.
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are skipped for `reset_timeout` seconds; then a single trial call is allowed.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let the next call through as a trial
+                self.opened_at = None
+                self.failures = self.failure_threshold - 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ModelCatalog:
+    """
+    Cached lookup of the models exposed by the Bielik service.
+
+    The list is kept for `ttl` seconds. Once it is stale it is still served
+    immediately while a background thread refreshes it (stale-while-revalidate).
+    Only a cold cache makes the caller wait for the upstream, and while the
+    circuit breaker is open the last known list (or the fallback) is returned
+    without touching the network.
+    """
+
+    def __init__(self, base_url: str, ttl: float = 60.0, timeout: float = 5.0,
+                 pool_size: int = 4, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Shared keep-alive session, reused by every request thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._models: Optional[List[dict]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self) -> Optional[List[dict]]:
+        """Fetch the model list from upstream, updating the breaker state"""
+        if self.breaker.is_open:
+            return None
+        try:
+            response = self.session.get(f'{self.base_url}/models', timeout=self.timeout)
+            if response.status_code != 200:
+                raise requests.HTTPError(f'Unexpected status {response.status_code}')
+
+            data = response.json()
+            # Bielik may return a bare list or a {"models": [...]} wrapper
+            if isinstance(data, dict):
+                data = data.get('models', [])
+            models = [{'name': m.get('name', m) if isinstance(m, dict) else m} for m in data]
+
+            self.breaker.record_success()
+            with self._lock:
+                self._models = models
+                self._fetched_at = time.monotonic()
+            return models
+        except Exception as e:
+            self.breaker.record_failure()
+            print(f"Error fetching models from {self.base_url}: {str(e)}")
+            return None
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._fetch()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='model-catalog-refresh', daemon=True).start()
+
+    def get_models(self) -> List[dict]:
+        """Return the model list, refreshing it according to the TTL"""
+        with self._lock:
+            models = self._models
+            age = time.monotonic() - self._fetched_at
+
+        if models is None:
+            models = self._fetch()
+        elif age >= self.ttl:
+            self._refresh_in_background()
+
+        if models is None:
+            return [{'name': m} for m in FALLBACK_MODELS]
+        return models
+
+    def invalidate(self):
+        """Drop the cached list so the next call goes to the upstream"""
+        with self._lock:
+            self._models = None
+            self._fetched_at = 0.0
+
+
+# Global model catalog instance
+# Can be configured via environment variables
+model_catalog = ModelCatalog(
+    base_url=os.getenv('BIELIK_APP_URL', 'http://localhost:8000'),
+    ttl=float(os.getenv('MODELS_CACHE_TTL', '60')),
+    timeout=float(os.getenv('MODELS_REQUEST_TIMEOUT', '5'))
+)
@@ -0,0 +1,73 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify jobs are already queued"""
+    pass
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug password hashing/verification on a bounded thread pool.
+
+    hashlib's scrypt/pbkdf2 release the GIL, so `max_workers` hashes really run
+    in parallel while request threads just wait for the result. At most
+    `max_workers + max_pending` jobs are admitted; beyond that PasswordHasherBusy
+    is raised immediately so the caller can shed load (HTTP 503) instead of
+    letting a signup burst pin every request worker.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, wait_timeout: float = 30.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so forked workers (gunicorn --preload) get their own threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='password-hash')
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Password hashing queue is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy('Password hashing timed out')
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# Global password hasher instance
+# Can be configured via environment variables
+password_hasher = PasswordHasher(
+    max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', '16')),
+    wait_timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '30'))
+)
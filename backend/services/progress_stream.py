@@ -0,0 +1,155 @@
+import json
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class ExperimentProgress:
+    """Running counters and per-model averages for one experiment"""
+
+    SCORES = ('overall_score', 'semantic_score', 'domain_relevance_score', 'grammar_score', 'generation_time')
+
+    def __init__(self, experiment_id: int, status: str = 'pending'):
+        self.experiment_id = experiment_id
+        self.status = status
+        self.total_runs = 0
+        self.completed_runs = 0
+        self.failed_runs = 0
+        # Highest ExperimentRun.id already counted: runs seeded from the database are not folded in twice
+        self.last_run_id = 0
+        # {model_name: {'runs': n, 'successful_runs': n, 'sums': {score: total}}}
+        self.models: Dict[str, dict] = {}
+
+    def _model(self, model_name: str) -> dict:
+        if model_name not in self.models:
+            self.models[model_name] = {
+                'runs': 0,
+                'successful_runs': 0,
+                'sums': {score: 0.0 for score in self.SCORES}
+            }
+        return self.models[model_name]
+
+    def add_run(self, run: dict):
+        """Fold a single run (ExperimentRun.to_json-like dict with snake_case keys) into the totals"""
+        if run.get('id') is not None:
+            self.last_run_id = max(self.last_run_id, run['id'])
+        model = self._model(run['model_name'])
+        model['runs'] += 1
+        self.total_runs += 1
+        if run.get('status', 'success') == 'success':
+            self.completed_runs += 1
+            model['successful_runs'] += 1
+            for score in self.SCORES:
+                model['sums'][score] += run.get(score) or 0
+        else:
+            self.failed_runs += 1
+
+    def snapshot(self) -> dict:
+        model_stats = {}
+        for model_name, model in self.models.items():
+            successful = model['successful_runs']
+            model_stats[model_name] = {
+                'total_runs': model['runs'],
+                'successful_runs': successful,
+                'failed_runs': model['runs'] - successful,
+                'avg_semantic_score': round(model['sums']['semantic_score'] / successful, 3) if successful else 0,
+                'avg_domain_relevance': round(model['sums']['domain_relevance_score'] / successful, 3) if successful else 0,
+                'avg_grammar_score': round(model['sums']['grammar_score'] / successful, 3) if successful else 0,
+                'avg_overall_score': round(model['sums']['overall_score'] / successful, 3) if successful else 0,
+                'avg_generation_time': round(model['sums']['generation_time'] / successful, 2) if successful else 0,
+            }
+        return {
+            'experimentId': self.experiment_id,
+            'status': self.status,
+            'totalRuns': self.total_runs,
+            'completedRuns': self.completed_runs,
+            'failedRuns': self.failed_runs,
+            'modelStats': model_stats
+        }
+
+
+class ProgressBroker:
+    """
+    In-process pub/sub for experiment progress.
+
+    State is only kept for experiments that have at least one subscriber. It is
+    seeded once from the database when the first viewer connects and then updated
+    incrementally as runs are ingested, so N viewers cost one update fan-out
+    instead of N polling loops. Each event carries the full snapshot, so a slow
+    subscriber whose queue is full just skips to the newest state.
+
+    Note: the broker lives in one process; with several workers, viewers only
+    receive runs ingested by the worker they are connected to.
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._progress: Dict[int, ExperimentProgress] = {}
+        self._subscribers: Dict[int, List[queue.Queue]] = {}
+
+    def subscribe(self, experiment_id: int, load_state: Callable[[], ExperimentProgress]) -> queue.Queue:
+        """Register a viewer; `load_state` is called only if no state is cached yet"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if experiment_id not in self._progress:
+                self._progress[experiment_id] = load_state()
+            self._subscribers.setdefault(experiment_id, []).append(subscriber)
+            subscriber.put_nowait(self._progress[experiment_id].snapshot())
+        return subscriber
+
+    def unsubscribe(self, experiment_id: int, subscriber: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(experiment_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(experiment_id, None)
+                self._progress.pop(experiment_id, None)
+
+    def subscriber_count(self, experiment_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(experiment_id, []))
+
+    def _fan_out(self, experiment_id: int, event: dict):
+        for subscriber in self._subscribers.get(experiment_id, []):
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Drop the oldest snapshot, the new one supersedes it
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(event)
+
+    def publish_run(self, experiment_id: int, run: dict):
+        """Fold a newly ingested run into the state and notify viewers"""
+        with self._lock:
+            progress = self._progress.get(experiment_id)
+            if progress is None:
+                return
+            if run.get('id') is not None and run['id'] <= progress.last_run_id:
+                # Committed before the state was seeded, so already counted
+                return
+            progress.add_run(run)
+            self._fan_out(experiment_id, progress.snapshot())
+
+    def publish_status(self, experiment_id: int, status: str):
+        with self._lock:
+            progress = self._progress.get(experiment_id)
+            if progress is None:
+                return
+            progress.status = status
+            self._fan_out(experiment_id, progress.snapshot())
+
+    @staticmethod
+    def format_event(data: Optional[dict], event: str = 'progress') -> str:
+        """Serialize an event in text/event-stream format (None -> keep-alive comment)"""
+        if data is None:
+            return ': keep-alive\n\n'
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Global progress broker instance
+progress_broker = ProgressBroker()
@@ -0,0 +1,465 @@
+import os
+import time
+import base64
+import uuid
+import shutil
+import mimetypes
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from werkzeug.security import safe_join
+
+
+# Stored content never changes under its (content-addressed) name
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class _Sample:
+    __slots__ = ('bytes',)
+
+    def __init__(self, nbytes: int = 0):
+        self.bytes = nbytes
+
+
+class BackendMetrics:
+    """Thread-safe per-operation call, error, byte and latency counters of one backend"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    @contextmanager
+    def track(self, operation: str, nbytes: int = 0):
+        """Time the block; the yielded sample's `bytes` can be set once the size is known"""
+        sample = _Sample(nbytes)
+        started = time.perf_counter()
+        try:
+            yield sample
+        except BaseException:
+            self.record(operation, time.perf_counter() - started, 0, error=True)
+            raise
+        self.record(operation, time.perf_counter() - started, sample.bytes)
+
+    def record(self, operation: str, seconds: float, nbytes: int = 0, error: bool = False):
+        with self._lock:
+            stats = self._operations.setdefault(
+                operation, {'calls': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['bytes'] += nbytes
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            operations = {name: dict(stats) for name, stats in self._operations.items()}
+        return {
+            name: {
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'bytes': stats['bytes'],
+                'avgMs': round(stats['seconds'] * 1000 / stats['calls'], 3),
+                'maxMs': round(stats['max_seconds'] * 1000, 3),
+                'mbPerSecond': round(stats['bytes'] / stats['seconds'] / 1e6, 3) if stats['seconds'] else None
+            }
+            for name, stats in operations.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+class StorageBackend:
+    """
+    Where photo files live. StorageService keeps one backend per storage_type
+    (the value stored on Photo rows) and only calls this interface; every
+    public method is timed into `metrics`. Subclasses implement the
+    underscore methods.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.metrics = BackendMetrics()
+
+    def exists(self, stored_filename: str) -> bool:
+        return self.stat(stored_filename) is not None
+
+    def stat(self, stored_filename: str) -> Optional[dict]:
+        """{'size', 'content_type'} of a stored file or None when it does not exist"""
+        with self.metrics.track('stat'):
+            return self._stat(stored_filename)
+
+    def stage(self, stream: BinaryIO, content_type: str) -> str:
+        """
+        Store `stream` (read once, in order) under a new temporary name, returned.
+        The file becomes visible under its real name through promote(); drop it
+        with delete_many(). Leftovers are removed by the orphan sweep.
+        """
+        staged_filename = f".{uuid.uuid4().hex}.part"
+        with self.metrics.track('write') as sample:
+            self._write(staged_filename, stream, content_type)
+            sample.bytes = stream.tell()
+        return staged_filename
+
+    def promote(self, staged_filename: str, stored_filename: str, content_type: str):
+        """Move a staged file to `stored_filename`"""
+        with self.metrics.track('promote'):
+            self._promote(staged_filename, stored_filename, content_type)
+
+    def write_bytes(self, stored_filename: str, data: bytes, content_type: str):
+        with self.metrics.track('write', len(data)):
+            self._write_bytes(stored_filename, data, content_type)
+
+    def open(self, stored_filename: str) -> BinaryIO:
+        with self.metrics.track('read') as sample:
+            stream = self._open(stored_filename)
+            sample.bytes = _stream_size(stream)
+            return stream
+
+    def delete_many(self, stored_filenames: List[str]) -> Dict[str, str]:
+        """Returns {stored_filename: error} for files that could not be deleted"""
+        with self.metrics.track('delete'):
+            return self._delete_many(stored_filenames)
+
+    def list(self) -> Iterator[Tuple[str, datetime]]:
+        """Yield (stored_filename, last_modified UTC) of every stored file"""
+        with self.metrics.track('list'):
+            files = list(self._list())
+        return iter(files)
+
+    def public_path(self, stored_filename: str) -> str:
+        """file_path (as stored on Photo) of a stored file"""
+        raise NotImplementedError
+
+    def presign_upload(self, stored_filename: str, content_type: str, size: int, sha256: str,
+                       expires_in: int) -> dict:
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    def _stat(self, stored_filename):
+        raise NotImplementedError
+
+    def _write(self, stored_filename, stream, content_type):
+        raise NotImplementedError
+
+    def _write_bytes(self, stored_filename, data, content_type):
+        self._write(stored_filename, BytesIO(data), content_type)
+
+    def _promote(self, staged_filename, stored_filename, content_type):
+        raise NotImplementedError
+
+    def _open(self, stored_filename):
+        raise NotImplementedError
+
+    def _delete_many(self, stored_filenames):
+        raise NotImplementedError
+
+    def _list(self):
+        raise NotImplementedError
+
+
+def _stream_size(stream) -> int:
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError):
+        return len(stream.getbuffer()) if isinstance(stream, BytesIO) else 0
+
+
+class LocalBackend(StorageBackend):
+    """Files in a directory served by GET /uploads/photos/<filename>"""
+
+    name = 'local'
+    # Copies are done in small chunks
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, root: Optional[str] = None):
+        super().__init__()
+        self.root = root or os.path.join(os.getcwd(), 'uploads', 'photos')
+        Path(self.root).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, stored_filename: str) -> str:
+        # Names come from the database and clients, never resolve them outside root
+        path = safe_join(self.root, stored_filename)
+        if path is None:
+            raise ValueError(f"Invalid stored filename: {stored_filename}")
+        return path
+
+    def _stat(self, stored_filename):
+        try:
+            size = os.stat(self._path(stored_filename)).st_size
+        except FileNotFoundError:
+            return None
+        return {'size': size, 'content_type': mimetypes.guess_type(stored_filename)[0]}
+
+    def _write(self, stored_filename, stream, content_type):
+        # Only complete files ever appear under their final name
+        partial_path = os.path.join(self.root, f".{uuid.uuid4().hex}.part")
+        try:
+            with open(partial_path, 'wb') as out:
+                shutil.copyfileobj(stream, out, self.CHUNK_SIZE)
+            os.replace(partial_path, self._path(stored_filename))
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+    def _promote(self, staged_filename, stored_filename, content_type):
+        os.replace(self._path(staged_filename), self._path(stored_filename))
+
+    def _open(self, stored_filename):
+        return open(self._path(stored_filename), 'rb')
+
+    def _delete_many(self, stored_filenames):
+        errors = {}
+        for filename in stored_filenames:
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                errors[filename] = str(e)
+        return errors
+
+    def _list(self):
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    yield entry.name, datetime.utcfromtimestamp(entry.stat().st_mtime)
+
+    def public_path(self, stored_filename):
+        return f"/uploads/photos/{stored_filename}"
+
+
+class S3Backend(StorageBackend):
+    """
+    Objects under photos/ in an S3 (or S3-compatible, via endpoint_url) bucket.
+
+    One client is shared by every thread - boto3 clients are thread-safe once
+    created - and built on first use, so forked workers do not inherit its
+    connections. Its urllib3 pool is sized for concurrent uploads
+    (max_pool_connections) and throttling/5xx errors are retried with
+    backoff. upload_fileobj switches to parallel multipart parts above
+    multipart_threshold and aborts the multipart upload on failure.
+
+    boto3 is imported when the backend is created, so local-only
+    deployments never load it.
+    """
+
+    name = 'aws_s3'
+    KEY_PREFIX = 'photos/'
+    # DeleteObjects accepts at most 1000 keys per request
+    DELETE_BATCH = 1000
+
+    def __init__(self, bucket_name: str, client=None, region_name: str = 'us-east-1',
+                 endpoint_url: Optional[str] = None, public_url: Optional[str] = None,
+                 max_pool_connections: int = 32, max_attempts: int = 5, retry_mode: str = 'standard',
+                 multipart_threshold: int = 8 * 1024 * 1024, multipart_chunksize: int = 8 * 1024 * 1024,
+                 max_concurrency: int = 4):
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.public_url = (public_url or f"https://{bucket_name}.s3.amazonaws.com").rstrip('/')
+        self.client_config = Config(
+            region_name=region_name,
+            max_pool_connections=max_pool_connections,
+            retries={'max_attempts': max_attempts, 'mode': retry_mode},
+            # SigV4 signs the headers of presigned uploads (checksum, length), SigV2 does not
+            signature_version='s3v4',
+            connect_timeout=5,
+            read_timeout=60,
+            tcp_keepalive=True
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency
+        )
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'S3Backend':
+        return cls(
+            bucket_name=os.getenv('AWS_S3_BUCKET'),
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+            public_url=os.getenv('S3_PUBLIC_URL') or None,
+            max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32')),
+            max_attempts=int(os.getenv('S3_MAX_ATTEMPTS', '5')),
+            multipart_threshold=int(os.getenv('S3_MULTIPART_THRESHOLD', str(8 * 1024 * 1024))),
+            multipart_chunksize=int(os.getenv('S3_MULTIPART_CHUNKSIZE', str(8 * 1024 * 1024))),
+            max_concurrency=int(os.getenv('S3_PART_CONCURRENCY', '4'))
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            with self._client_lock:
+                if self._client is None:
+                    # Sessions are not thread-safe, clients are
+                    self._client = boto3.session.Session().client(
+                        's3',
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                        endpoint_url=self.endpoint_url,
+                        config=self.client_config
+                    )
+        return self._client
+
+    def key(self, stored_filename: str) -> str:
+        return f"{self.KEY_PREFIX}{stored_filename}"
+
+    def _stat(self, stored_filename):
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=self.key(stored_filename))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'size': response['ContentLength'], 'content_type': response.get('ContentType')}
+
+    def _extra_args(self, content_type):
+        return {
+            'ContentType': content_type,
+            'ACL': 'public-read',  # Make files publicly readable
+            'CacheControl': IMMUTABLE_CACHE_CONTROL
+        }
+
+    def _write(self, stored_filename, stream, content_type):
+        self.client.upload_fileobj(stream, self.bucket_name, self.key(stored_filename),
+                                   ExtraArgs=self._extra_args(content_type), Config=self.transfer_config)
+
+    def _write_bytes(self, stored_filename, data, content_type):
+        # Generated renditions are small: a single PUT
+        self.client.put_object(Bucket=self.bucket_name, Key=self.key(stored_filename), Body=data,
+                               **self._extra_args(content_type))
+
+    def _promote(self, staged_filename, stored_filename, content_type):
+        # Server-side copy (multipart above multipart_threshold), the bytes are not uploaded again
+        self.client.copy({'Bucket': self.bucket_name, 'Key': self.key(staged_filename)},
+                         self.bucket_name, self.key(stored_filename),
+                         ExtraArgs={**self._extra_args(content_type), 'MetadataDirective': 'REPLACE'},
+                         Config=self.transfer_config)
+        self.client.delete_object(Bucket=self.bucket_name, Key=self.key(staged_filename))
+
+    def _open(self, stored_filename):
+        response = self.client.get_object(Bucket=self.bucket_name, Key=self.key(stored_filename))
+        return BytesIO(response['Body'].read())
+
+    def _delete_many(self, stored_filenames):
+        errors = {}
+        for start in range(0, len(stored_filenames), self.DELETE_BATCH):
+            batch = stored_filenames[start:start + self.DELETE_BATCH]
+            try:
+                response = self.client.delete_objects(Bucket=self.bucket_name, Delete={
+                    'Objects': [{'Key': self.key(filename)} for filename in batch],
+                    'Quiet': True
+                })
+            except Exception as e:
+                errors.update({filename: str(e) for filename in batch})
+                continue
+            for error in response.get('Errors', []):
+                errors[error['Key'][len(self.KEY_PREFIX):]] = error.get('Message') or error.get('Code')
+        return errors
+
+    def _list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.KEY_PREFIX):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.KEY_PREFIX):], obj['LastModified'].replace(tzinfo=None)
+
+    def public_path(self, stored_filename):
+        return f"{self.public_url}/{self.key(stored_filename)}"
+
+    def presign_upload(self, stored_filename, content_type, size, sha256, expires_in):
+        """
+        Presigned PUT for uploading a file straight from the browser
+        Returns: {'method', 'url', 'headers'} - the request must carry exactly these headers
+
+        The SHA-256 and length are signed headers, so S3 rejects any other
+        body (BadDigest): the URL cannot be reused to replace the shared,
+        immutably cached object under its content-addressed key.
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': self.key(stored_filename),
+            'ContentType': content_type,
+            'ContentLength': size,
+            'ChecksumSHA256': checksum,
+            'ACL': 'public-read',
+            'CacheControl': IMMUTABLE_CACHE_CONTROL
+        }
+        with self.metrics.track('presign'):
+            url = self.client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires_in,
+                                                     HttpMethod='PUT')
+        # Content-Length is set by the browser from the body
+        return {'method': 'PUT', 'url': url, 'headers': {
+            'Content-Type': content_type,
+            'x-amz-checksum-sha256': checksum,
+            'x-amz-acl': 'public-read',
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL
+        }}
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local dict of files, for tests and throwaway environments"""
+
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, stored_filename):
+        with self._lock:
+            entry = self._files.get(stored_filename)
+        if entry is None:
+            return None
+        data, content_type, _ = entry
+        return {'size': len(data), 'content_type': content_type}
+
+    def _write(self, stored_filename, stream, content_type):
+        self._write_bytes(stored_filename, stream.read(), content_type)
+
+    def _write_bytes(self, stored_filename, data, content_type):
+        with self._lock:
+            self._files[stored_filename] = (bytes(data), content_type, datetime.utcnow())
+
+    def _promote(self, staged_filename, stored_filename, content_type):
+        with self._lock:
+            self._files[stored_filename] = self._files.pop(staged_filename)
+
+    def _open(self, stored_filename):
+        with self._lock:
+            entry = self._files.get(stored_filename)
+        if entry is None:
+            raise FileNotFoundError(stored_filename)
+        return BytesIO(entry[0])
+
+    def _delete_many(self, stored_filenames):
+        with self._lock:
+            for filename in stored_filenames:
+                self._files.pop(filename, None)
+        return {}
+
+    def _list(self):
+        with self._lock:
+            return [(name, modified) for name, (_, _, modified) in self._files.items()]
+
+    def public_path(self, stored_filename):
+        return f"memory://photos/{stored_filename}"
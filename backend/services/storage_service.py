@@ -1,34 +1,131 @@
 import os
-import uuid
-import boto3
-from pathlib import Path
+import hashlib
+import re
+import threading
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import BinaryIO, Iterator, List, Tuple, Optional
+from services.storage_backends import LocalBackend, MemoryBackend, S3Backend, StorageBackend
+
+
+FILE_TOO_LARGE = "File too large"
+
+# <sha256>.<ext> originals and their <sha256>_<rendition>.<ext> renditions
+CONTENT_ADDRESSED_FILE = re.compile(r'^[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$')
+
+
+class FileTooLarge(Exception):
+    """Raised while streaming once a file exceeds max_file_size"""
+    pass
+
+
+class _HashingReader:
+    """
+    Read-once view of an upload stream for StorageBackend.stage: hashes the
+    bytes and enforces max_size as the backend reads them
+    """
+
+    def __init__(self, stream: BinaryIO, max_size: Optional[int] = None):
+        self.stream = stream
+        self.max_size = max_size
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise FileTooLarge()
+        self.digest.update(chunk)
+        return chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        # Rewinding would hash bytes twice (boto3 then buffers parts itself)
+        return False
+
+    def tell(self) -> int:
+        return self.size
 
 
 class StorageService:
-    def __init__(self, storage_type: str = 'local'):
+    """
+    Photo storage facade used by the routes and workers.
+
+    Uploads are hashed while streaming (enforcing max_file_size) and stored
+    under their SHA-256; the bytes themselves go to a StorageBackend - local
+    directory, S3-compatible bucket or in-memory - chosen per storage_type, so
+    photos keep working after STORAGE_TYPE changes. Backends are created on
+    first use and report per-operation metrics().
+    """
+
+    BACKENDS = {
+        'local': LocalBackend,
+        'aws_s3': S3Backend.from_env,
+        'memory': MemoryBackend
+    }
+
+    def __init__(self, storage_type: str = 'local', max_file_size: Optional[int] = None,
+                 upload_workers: int = 4, backends: Optional[List[StorageBackend]] = None):
         self.storage_type = storage_type
-        if storage_type == 'local':
-            self.upload_folder = os.path.join(os.getcwd(), 'uploads', 'photos')
-            Path(self.upload_folder).mkdir(parents=True, exist_ok=True)
-        elif storage_type == 'aws_s3':
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                region_name=os.getenv('AWS_REGION', 'us-east-1')
-            )
-            self.bucket_name = os.getenv('AWS_S3_BUCKET')
-
-    def generate_unique_filename(self, original_filename: str) -> str:
-        """Generate a unique filename to prevent conflicts"""
-        file_extension = os.path.splitext(original_filename)[1]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        return f"{timestamp}_{unique_id}{file_extension}"
+        self.max_file_size = max_file_size
+        self.upload_workers = upload_workers
+        self._backends = {}
+        self._backend_lock = threading.Lock()
+        self._executors = {}
+        self._executor_lock = threading.Lock()
+        for backend in backends or []:
+            self.register_backend(backend)
+
+    def register_backend(self, backend: StorageBackend):
+        """Use `backend` for its storage_type (backend.name) from now on"""
+        self._backends[backend.name] = backend
+
+    def backend(self, storage_type: str = None) -> StorageBackend:
+        storage_type = storage_type or self.storage_type
+        backend = self._backends.get(storage_type)
+        if backend is None:
+            factory = self.BACKENDS.get(storage_type)
+            if factory is None:
+                raise ValueError(f"Unsupported storage type: {storage_type}")
+            with self._backend_lock:
+                backend = self._backends.get(storage_type)
+                if backend is None:
+                    backend = self._backends[storage_type] = factory()
+        return backend
+
+    @property
+    def upload_folder(self) -> str:
+        """Directory of the local backend (also used to serve /uploads/photos)"""
+        return self.backend('local').root
+
+    @upload_folder.setter
+    def upload_folder(self, folder: str):
+        self.backend('local').root = folder
+
+    def metrics(self) -> dict:
+        """Latency/throughput per operation of every backend used so far"""
+        return {name: backend.metrics.snapshot() for name, backend in list(self._backends.items())}
+
+    def _get_executor(self, name: str, max_workers: int) -> ThreadPoolExecutor:
+        # Created lazily so forked workers (gunicorn --preload) get their own threads
+        executor = self._executors.get(name)
+        if executor is None:
+            with self._executor_lock:
+                executor = self._executors.get(name)
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'storage-{name}')
+                    self._executors[name] = executor
+        return executor
+
+    def content_filename(self, digest: str, original_filename: str) -> str:
+        """Content-addressed name (SHA-256 of the bytes), identical uploads share one file"""
+        file_extension = os.path.splitext(original_filename)[1].lower()
+        return f"{digest}{file_extension}"
 
     def is_allowed_file(self, filename: str) -> bool:
         """Check if file type is allowed"""
@@ -40,6 +137,10 @@ class StorageService:
         """
         Upload a file to the configured storage
         Returns: (success, file_info, error_message)
+
+        The request stream is read once: it is hashed while being staged
+        under a temporary name, which is then renamed to the SHA-256 name, or
+        dropped when that content is already stored (file_info['deduplicated']).
         """
         if not file or not file.filename or file.filename == '':
             return False, None, "No file provided"
@@ -47,117 +148,118 @@ class StorageService:
         if not self.is_allowed_file(file.filename):
             return False, None, "File type not allowed"
 
+        # Reject early when the client declared the part size
+        if self.max_file_size and file.content_length and file.content_length > self.max_file_size:
+            return False, None, FILE_TOO_LARGE
+
         try:
             original_filename = secure_filename(file.filename)
-            stored_filename = self.generate_unique_filename(original_filename)
-            
-            if self.storage_type == 'local':
-                return self._upload_local(file, original_filename, stored_filename)
-            elif self.storage_type == 'aws_s3':
-                return self._upload_s3(file, original_filename, stored_filename)
-            else:
-                return False, None, f"Unsupported storage type: {self.storage_type}"
+            backend = self.backend()
 
+            content_type = file.mimetype or 'application/octet-stream'
+
+            reader = _HashingReader(file.stream, self.max_file_size)
+            staged_filename = backend.stage(reader, content_type)
+            try:
+                stored_filename = self.content_filename(reader.digest.hexdigest(), original_filename)
+                deduplicated = backend.exists(stored_filename)
+                if deduplicated:
+                    backend.delete_many([staged_filename])
+                else:
+                    backend.promote(staged_filename, stored_filename, content_type)
+            except Exception:
+                backend.delete_many([staged_filename])
+                raise
+
+        except FileTooLarge:
+            return False, None, FILE_TOO_LARGE
         except Exception as e:
             return False, None, f"Upload failed: {str(e)}"
 
-    def _upload_local(self, file: FileStorage, original_filename: str, stored_filename: str) -> Tuple[bool, dict, None]:
-        """Upload file to local storage"""
-        file_path = os.path.join(self.upload_folder, stored_filename)
-        file.save(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
         file_info = {
             'filename': original_filename,
             'stored_filename': stored_filename,
-            'file_path': f"/uploads/photos/{stored_filename}",  # URL path for frontend
-            'file_size': file_size,
+            'file_path': backend.public_path(stored_filename),  # URL path for frontend
+            'file_size': reader.size,
+            'checksum': reader.digest.hexdigest(),
+            'deduplicated': deduplicated,
             'mime_type': file.mimetype,
-            'storage_type': 'local'
+            'storage_type': backend.name
         }
-        
+
         return True, file_info, None
 
-    def _upload_s3(self, file: FileStorage, original_filename: str, stored_filename: str) -> Tuple[bool, dict, None]:
-        """Upload file to AWS S3"""
-        try:
-            # Upload to S3
-            s3_key = f"photos/{stored_filename}"
-            self.s3_client.upload_fileobj(
-                file,
-                self.bucket_name or '',
-                s3_key,
-                ExtraArgs={
-                    'ContentType': file.mimetype or 'application/octet-stream',
-                    'ACL': 'public-read'  # Make files publicly readable
-                }
-            )
-            
-            # Generate S3 URL
-            s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-            
-            # Get file size (approximate, since we don't have it directly)
-            file.seek(0, 2)  # Seek to end
-            file_size = file.tell()
-            file.seek(0)  # Reset position
-            
-            file_info = {
-                'filename': original_filename,
-                'stored_filename': stored_filename,
-                'file_path': s3_url,
-                'file_size': file_size,
-                'mime_type': file.mimetype,
-                'storage_type': 'aws_s3'
-            }
-            
-            return True, file_info, None
+    def upload_files(self, files: List[FileStorage]) -> List[Tuple[bool, Optional[dict], Optional[str]]]:
+        """Upload several files concurrently, results are in the order of `files`"""
+        if len(files) <= 1:
+            return [self.upload_file(file) for file in files]
+        executor = self._get_executor('files', self.upload_workers)
+        return list(executor.map(self.upload_file, files))
 
-        except Exception as e:
-            return False, None, f"S3 upload failed: {str(e)}"
+    def presign_upload(self, stored_filename: str, content_type: str, size: int, sha256: str,
+                       expires_in: int = 900) -> dict:
+        """
+        Presigned PUT for uploading a file straight from the browser (S3 storage only)
+        Returns: {'method', 'url', 'headers'} - S3 only accepts a body of `size` bytes hashing to `sha256`
+        """
+        return self.backend().presign_upload(stored_filename, content_type, size, sha256, expires_in)
+
+    def stat_object(self, stored_filename: str, storage_type: str = None) -> Optional[dict]:
+        """{'size', 'content_type'} of a stored file or None when it does not exist"""
+        return self.backend(storage_type).stat(stored_filename)
+
+    def public_path(self, stored_filename: str, storage_type: str = None) -> str:
+        """file_path (as stored on Photo) of a stored file"""
+        return self.backend(storage_type).public_path(stored_filename)
+
+    def store_bytes(self, data: bytes, stored_filename: str, mime_type: str, storage_type: str = None) -> str:
+        """Store generated content (e.g. a photo rendition), returns its file_path"""
+        backend = self.backend(storage_type)
+        backend.write_bytes(stored_filename, data, mime_type)
+        return backend.public_path(stored_filename)
+
+    def open_file(self, stored_filename: str, storage_type: str = None) -> BinaryIO:
+        """Open a stored original for reading"""
+        return self.backend(storage_type).open(stored_filename)
 
     def delete_file(self, file_path: str, storage_type: str = None) -> bool:
         """Delete a file from storage"""
-        storage_type = storage_type or self.storage_type
-        
+        # Both local paths and bucket URLs end with the stored filename
+        stored_filename = file_path.rsplit('/', 1)[-1]
         try:
-            if storage_type == 'local':
-                # Extract filename from path and delete local file
-                filename = os.path.basename(file_path)
-                local_path = os.path.join(self.upload_folder, filename)
-                if os.path.exists(local_path):
-                    os.remove(local_path)
-                return True
-                
-            elif storage_type == 'aws_s3':
-                # Extract S3 key from URL and delete from S3
-                s3_key = file_path.split('.amazonaws.com/')[-1]
-                self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
-                return True
-                
+            errors = self.backend(storage_type).delete_many([stored_filename])
         except Exception as e:
-            print(f"Error deleting file: {str(e)}")
+            errors = {stored_filename: str(e)}
+        if errors:
+            print(f"Error deleting file: {errors[stored_filename]}")
             return False
-        
-        return False
+        return True
+
+    def delete_many(self, stored_filenames: List[str], storage_type: str = None) -> dict:
+        """
+        Delete many stored files, S3 in DeleteObjects batches of up to 1000 keys
+        Returns: {stored_filename: error} for files that could not be deleted
+        """
+        try:
+            backend = self.backend(storage_type)
+        except ValueError as e:
+            return {filename: str(e) for filename in stored_filenames}
+        return backend.delete_many(stored_filenames)
+
+    def list_files(self, storage_type: str = None) -> Iterator[Tuple[str, datetime]]:
+        """Yield (stored_filename, last_modified UTC) of every stored file"""
+        return self.backend(storage_type).list()
 
     def get_file_url(self, file_path: str, storage_type: str = None) -> str:
-        """Get the public URL for a file"""
-        storage_type = storage_type or self.storage_type
-        
-        if storage_type == 'local':
-            # For local files, return the relative URL path
-            return file_path
-        elif storage_type == 'aws_s3':
-            # For S3 files, return the full URL
-            return file_path
-        
+        """Get the public URL for a file (file_path is already public for every backend)"""
         return file_path
 
 
 # Global storage service instance
 # Can be configured via environment variables
 storage_service = StorageService(
-    storage_type=os.getenv('STORAGE_TYPE', 'local')
-) 
\ No newline at end of file
+    storage_type=os.getenv('STORAGE_TYPE', 'local'),
+    max_file_size=int(os.getenv('MAX_PHOTO_SIZE', str(10 * 1024 * 1024))),
+    upload_workers=int(os.getenv('UPLOAD_WORKERS', '4'))
+)
+ 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Photo file maintenance: process the deletion outbox or scan for orphaned files
+
+Usage:
+    python sweep_photos.py                      # drain the file_deletions outbox once
+    python sweep_photos.py --orphans --dry-run  # list files no photo refers to
+    python sweep_photos.py --orphans [--min-age-hours 24] [--storage-type aws_s3]
+
+The app runs the outbox sweep in the background (FILE_SWEEPER_ENABLED); this
+script is for cron jobs and one-off cleanups.
+"""
+
+import argparse
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Add the backend directory to the path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app import app
+from services.file_sweeper import file_sweeper
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orphans', action='store_true', help='reconcile stored files against the photos table')
+    parser.add_argument('--dry-run', action='store_true', help='only list orphaned files')
+    parser.add_argument('--min-age-hours', type=float, default=24, help='ignore files newer than this')
+    parser.add_argument('--storage-type', choices=('local', 'aws_s3'), help='defaults to STORAGE_TYPE')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.orphans:
+            orphans = file_sweeper.scan_orphans(args.storage_type, timedelta(hours=args.min_age_hours),
+                                                dry_run=args.dry_run)
+            for name in orphans:
+                print(name)
+            action = "Found" if args.dry_run else "Deleted"
+            print(f"✅ {action} {len(orphans)} orphaned files")
+        else:
+            stats = file_sweeper.sweep_all()
+            print(f"✅ Released {stats['released']}, shared {stats['shared']}, "
+                  f"deferred {stats['deferred']}, failed {stats['failed']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Run the test suite against every supported database
+
+Usage:
+    python test_matrix.py [pytest args...]
+
+Databases:
+    sqlite      a throwaway SQLite file (always)
+    postgresql  TEST_POSTGRES_URL when set, otherwise a throwaway local
+                server started with the `pgserver` package
+                (pip install pgserver) or initdb/pg_ctl found on PATH;
+                skipped when none is available or psycopg is not installed
+"""
+
+import importlib.util
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+backend_dir = Path(__file__).parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def sqlite_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield f"sqlite:///{os.path.join(tmp, 'test.db')}"
+
+
+@contextmanager
+def postgres_database():
+    """URL of a PostgreSQL database for the run, None when none is available"""
+    if importlib.util.find_spec('psycopg') is None:
+        print("ℹ️  psycopg is not installed (pip install 'psycopg[binary]'), skipping PostgreSQL")
+        yield None
+        return
+
+    if os.getenv('TEST_POSTGRES_URL'):
+        yield os.getenv('TEST_POSTGRES_URL')
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        if importlib.util.find_spec('pgserver') is not None:
+            import pgserver
+            server = pgserver.get_server(data_dir, cleanup_mode='stop')
+            yield server.get_uri().replace('postgresql://', 'postgresql+psycopg://', 1)
+            server.cleanup()
+            return
+
+        if shutil.which('initdb') and shutil.which('pg_ctl'):
+            port = _free_port()
+            subprocess.run(['initdb', '-D', data_dir, '-U', 'postgres', '--auth=trust'],
+                           check=True, stdout=subprocess.DEVNULL)
+            subprocess.run(['pg_ctl', '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                            '-o', f"-p {port} -k {data_dir} -c listen_addresses=''", 'start'],
+                           check=True, stdout=subprocess.DEVNULL)
+            try:
+                yield f"postgresql+psycopg://postgres@/postgres?host={data_dir}&port={port}"
+            finally:
+                subprocess.run(['pg_ctl', '-D', data_dir, '-m', 'fast', 'stop'], stdout=subprocess.DEVNULL)
+            return
+
+    print("ℹ️  No PostgreSQL available (set TEST_POSTGRES_URL or pip install pgserver), skipping")
+    yield None
+
+
+DATABASES = {
+    'sqlite': sqlite_database,
+    'postgresql': postgres_database
+}
+
+
+def main(pytest_args):
+    results = {}
+    for name, database in DATABASES.items():
+        with database() as url:
+            if url is None:
+                results[name] = 'skipped'
+                continue
+            print(f"🚀 Running tests on {name}...")
+            env = dict(os.environ, TEST_DATABASE_URL=url)
+            returncode = subprocess.call([sys.executable, '-m', 'pytest', *pytest_args], cwd=backend_dir, env=env)
+            results[name] = 'passed' if returncode == 0 else f'failed (exit {returncode})'
+
+    print()
+    for name, result in results.items():
+        print(f"{'✅' if result == 'passed' else 'ℹ️ ' if result == 'skipped' else '❌'} {name}: {result}")
+    return 1 if any(result.startswith('failed') for result in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,7 +3,26 @@ import tempfile
 import os
 from unittest.mock import patch, MagicMock
 import pandas as pd
+
+# app.py creates the engine on import, so the test database is chosen first:
+# a throwaway SQLite file, or TEST_DATABASE_URL (see test_matrix.py)
+_test_db_fd, _test_db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{_test_db_path}'
+# Tests start background threads themselves
+os.environ['IMAGE_WORKER_ENABLED'] = 'False'
+os.environ['FILE_SWEEPER_ENABLED'] = 'False'
+
 from app import app, db, init_database
+from auth_middleware import identity_cache
+
+
+def pytest_sessionfinish(session, exitstatus):
+    with app.app_context():
+        db.engine.dispose()
+    os.close(_test_db_fd)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(_test_db_path + suffix):
+            os.unlink(_test_db_path + suffix)
 
 
 @pytest.fixture
@@ -41,6 +60,8 @@ def app_context(test_app):
         db.session.remove()
         db.drop_all()
         db.create_all()
+        # drop_all bypasses ORM events, cached identities would point at deleted users
+        identity_cache.clear()
         yield test_app
         # Clean up after each test
         db.session.remove()
@@ -61,11 +82,16 @@ def sample_csv_data():
 
 
 @pytest.fixture
-def mock_csv_file(sample_csv_data, monkeypatch):
-    """Mock CSV file reading for testing."""
-    def mock_read_csv(filename):
-        if filename == 'final_vehicle_data.csv':
-            return sample_csv_data
-        raise FileNotFoundError()
-    
-    monkeypatch.setattr(pd, 'read_csv', mock_read_csv)
+def catalog_csv(tmp_path):
+    """Write a DataFrame as a catalog CSV and return its path."""
+    def write(frame, name='catalog.csv'):
+        path = tmp_path / name
+        frame.to_csv(path, index=False)
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def mock_csv_file(sample_csv_data, catalog_csv, monkeypatch):
+    """Point init_database() at a CSV with the sample data."""
+    monkeypatch.setitem(app.config, 'CATALOG_CSV', catalog_csv(sample_csv_data))
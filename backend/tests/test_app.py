@@ -42,8 +42,7 @@ def test_database_initialization_missing_csv(app_context):
     """Test 3: Verify graceful handling when CSV file is missing."""
     from app import db, init_database
     
-    with patch('pandas.read_csv') as mock_read_csv:
-        mock_read_csv.side_effect = FileNotFoundError()
+    with patch.dict(app_context.config, {'CATALOG_CSV': 'missing.csv'}):
         
         # Should not raise exception
         init_database()
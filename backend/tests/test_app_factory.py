@@ -0,0 +1,88 @@
+"""
+Tests for the application factory and the startup import budget.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app import create_app
+from database import db
+from services.file_sweeper import file_sweeper
+from services.image_worker import image_worker
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# ~0.6 s locally; pandas/boto3/numpy at import would add ~0.5 s
+IMPORT_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', '1000'))
+DEFERRED_MODULES = ('pandas', 'numpy', 'boto3', 'botocore')
+
+
+def run_python(*args):
+    result = subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return result
+
+
+class TestCreateApp:
+    """Independent applications from one factory."""
+
+    def test_config_overrides_environment(self):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'DISABLE_AUTH': True})
+
+        assert app.config['TESTING'] is True
+        assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
+        assert 'api' in app.blueprints
+
+    def test_apps_use_their_own_database(self, tmp_path):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'other.db'}"})
+        with app.app_context():
+            db.create_all()
+
+        response = app.test_client().get('/api/cars/makes')
+
+        assert response.status_code == 200
+        assert response.get_json() == []
+
+    def test_background_workers_start_with_first_request(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(image_worker, 'start', started.append)
+        monkeypatch.setattr(file_sweeper, 'start', started.append)
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'IMAGE_WORKER_ENABLED': True,
+                          'FILE_SWEEPER_ENABLED': True})
+        assert started == []
+
+        app.test_client().get('/api/nonexistent')
+
+        assert started == [app, app]
+
+    def test_disabled_background_workers_are_not_started(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(image_worker, 'start', started.append)
+        monkeypatch.setattr(file_sweeper, 'start', started.append)
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'IMAGE_WORKER_ENABLED': False,
+                          'FILE_SWEEPER_ENABLED': False})
+
+        app.test_client().get('/api/nonexistent')
+
+        assert started == []
+
+
+class TestStartup:
+    """What a worker pays to import the application."""
+
+    def test_heavy_libraries_are_loaded_lazily(self):
+        result = run_python('-c', 'import json, sys, app; '
+                                  f'print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))')
+
+        assert json.loads(result.stdout) == []
+
+    def test_import_time_within_budget(self):
+        totals = []
+        for _ in range(3):
+            stderr = run_python('-X', 'importtime', '-c', 'import app').stderr
+            line = next(line for line in stderr.splitlines() if line.rstrip().endswith('| app'))
+            totals.append(int(line.split('|')[1]) / 1000)
+
+        # Best of three: the budget is about what gets imported, not a busy machine
+        assert min(totals) <= IMPORT_BUDGET_MS, f"import app took {min(totals):.0f} ms (budget {IMPORT_BUDGET_MS} ms)"
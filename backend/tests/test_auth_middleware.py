@@ -0,0 +1,325 @@
+"""
+Tests for JWKS, verified-token and identity caching in auth_middleware.
+JWT tests use a locally generated RSA key served by a stub JWKS HTTP server.
+"""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt as jose_jwt
+
+from auth_middleware import AuthError, jwks_cache, verified_token_cache, verify_decode_jwt
+
+
+DOMAIN = 'tenant.auth0.test'
+AUDIENCE = 'portal-api'
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode('ascii')
+    jwk = {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'alg': 'RS256',
+           'n': b64url_uint(numbers.n), 'e': b64url_uint(numbers.e)}
+    return pem, jwk
+
+
+def make_token(pem, kid, **claims):
+    payload = {
+        'sub': 'auth0|123',
+        'email': 'jan@example.com',
+        'aud': AUDIENCE,
+        'iss': f'https://{DOMAIN}/',
+        'iat': int(time.time()),
+        'exp': int(time.time()) + 3600,
+    }
+    payload.update(claims)
+    return jose_jwt.encode(payload, pem, algorithm='RS256', headers={'kid': kid})
+
+
+class StubJWKSServer:
+    """Serves {"keys": [...]} and counts requests; can be switched to fail."""
+
+    def __init__(self):
+        self.keys = []
+        self.requests = 0
+        self.failing = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.failing:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = json.dumps({'keys': stub.keys}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/.well-known/jwks.json'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(scope='module')
+def signing_keys():
+    return {kid: make_key(kid) for kid in ('key-1', 'key-2')}
+
+
+@pytest.fixture
+def jwks_server(test_app, signing_keys):
+    server = StubJWKSServer()
+    server.keys = [signing_keys['key-1'][1]]
+    test_app.config['AUTH0_JWKS_URL'] = server.url
+    test_app.config['AUTH0_AUDIENCE'] = AUDIENCE
+    jwks_cache.clear()
+    verified_token_cache.clear()
+    yield server
+    server.stop()
+    test_app.config['AUTH0_JWKS_URL'] = None
+    jwks_cache.clear()
+    verified_token_cache.clear()
+
+
+class TestJWKSCache:
+    """JWKS is fetched once and refreshed on unknown kid."""
+
+    def test_valid_token_is_verified(self, jwks_server, signing_keys):
+        token = make_token(signing_keys['key-1'][0], 'key-1')
+
+        payload = verify_decode_jwt(token, DOMAIN)
+
+        assert payload['email'] == 'jan@example.com'
+        assert jwks_server.requests == 1
+
+    def test_keys_are_reused_across_tokens(self, jwks_server, signing_keys):
+        pem = signing_keys['key-1'][0]
+        verify_decode_jwt(make_token(pem, 'key-1', sub='auth0|1'), DOMAIN)
+        verify_decode_jwt(make_token(pem, 'key-1', sub='auth0|2'), DOMAIN)
+
+        assert jwks_server.requests == 1
+
+    def test_unknown_kid_triggers_refresh(self, jwks_server, signing_keys):
+        verify_decode_jwt(make_token(signing_keys['key-1'][0], 'key-1'), DOMAIN)
+        jwks_cache.min_refresh_interval = 0
+        try:
+            # IdP rotates its signing key
+            jwks_server.keys = [signing_keys['key-1'][1], signing_keys['key-2'][1]]
+            payload = verify_decode_jwt(make_token(signing_keys['key-2'][0], 'key-2'), DOMAIN)
+        finally:
+            jwks_cache.min_refresh_interval = 30
+
+        assert payload['sub'] == 'auth0|123'
+        assert jwks_server.requests == 2
+
+    def test_unknown_kid_refresh_is_rate_limited(self, jwks_server, signing_keys):
+        verify_decode_jwt(make_token(signing_keys['key-1'][0], 'key-1'), DOMAIN)
+
+        for _ in range(3):
+            with pytest.raises(AuthError):
+                verify_decode_jwt(make_token(signing_keys['key-2'][0], 'key-2'), DOMAIN)
+
+        assert jwks_server.requests == 1
+
+    def test_cached_keys_survive_idp_outage(self, jwks_server, signing_keys):
+        pem = signing_keys['key-1'][0]
+        verify_decode_jwt(make_token(pem, 'key-1', sub='auth0|1'), DOMAIN)
+        jwks_server.failing = True
+        jwks_cache.ttl = 0
+        try:
+            payload = verify_decode_jwt(make_token(pem, 'key-1', sub='auth0|2'), DOMAIN)
+        finally:
+            jwks_cache.ttl = 3600
+
+        assert payload['sub'] == 'auth0|2'
+
+
+class TestVerifiedTokenCache:
+    """Already verified tokens skip signature verification until they expire."""
+
+    def test_repeated_token_hits_cache(self, jwks_server, signing_keys, monkeypatch):
+        token = make_token(signing_keys['key-1'][0], 'key-1')
+        verify_decode_jwt(token, DOMAIN)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('token should come from cache')
+
+        monkeypatch.setattr(jose_jwt, 'decode', fail)
+        assert verify_decode_jwt(token, DOMAIN)['email'] == 'jan@example.com'
+
+    def test_entry_is_bounded_by_token_exp(self, jwks_server, signing_keys):
+        exp = int(time.time()) + 2
+        token = make_token(signing_keys['key-1'][0], 'key-1', exp=exp)
+        verify_decode_jwt(token, DOMAIN)
+
+        key = verified_token_cache.make_key(token, AUDIENCE, f'https://{DOMAIN}/')
+        expires_at, _ = verified_token_cache._entries[key]
+        assert expires_at <= exp
+
+    def test_expired_token_is_rejected(self, jwks_server, signing_keys):
+        token = make_token(signing_keys['key-1'][0], 'key-1', exp=int(time.time()) - 10)
+
+        with pytest.raises(AuthError) as excinfo:
+            verify_decode_jwt(token, DOMAIN)
+        assert excinfo.value.error['code'] == 'token_expired'
+
+    def test_wrong_audience_is_rejected(self, jwks_server, signing_keys):
+        token = make_token(signing_keys['key-1'][0], 'key-1', aud='other-api')
+
+        with pytest.raises(AuthError) as excinfo:
+            verify_decode_jwt(token, DOMAIN)
+        assert excinfo.value.error['code'] == 'invalid_claims'
+
+    def test_lru_is_size_bounded(self):
+        cache = type(verified_token_cache)(max_size=2)
+        for i in range(3):
+            cache.put(str(i), {'exp': time.time() + 60})
+
+        assert cache.get('0') is None
+        assert cache.get('2') is not None
+
+
+class TestIdentityCache:
+    """Authenticated requests resolve the user without querying in steady state."""
+
+    @pytest.fixture
+    def count_queries(self, app_context):
+        from sqlalchemy import event
+        from app import db
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def test_identity_is_cached_after_first_lookup(self, count_queries):
+        from auth_middleware import get_or_create_user
+
+        payload = {'sub': 'auth0|42', 'email': 'anna@example.com', 'name': 'Anna Nowak'}
+        first = get_or_create_user(payload)
+        count_queries.clear()
+
+        second = get_or_create_user(payload)
+
+        assert second.id == first.id
+        assert second.email == 'anna@example.com'
+        assert count_queries == []
+
+    def test_update_and_delete_invalidate_identity(self, client, count_queries):
+        from auth_middleware import get_or_create_user, identity_cache
+
+        payload = {'sub': 'auth0|42', 'email': 'anna@example.com', 'name': 'Anna Nowak'}
+        user = get_or_create_user(payload)
+
+        client.put(f'/api/users/{user.id}', data=json.dumps({'first_name': 'Ania'}),
+                   content_type='application/json')
+        assert identity_cache.get('sub:auth0|42') is None
+        assert get_or_create_user(payload).first_name == 'Ania'
+
+        client.delete(f'/api/users/{user.id}')
+        assert identity_cache.get('sub:auth0|42') is None
+
+    def test_dev_test_user_is_cached(self, client, count_queries):
+        from auth_middleware import get_test_user
+
+        user = get_test_user()
+        count_queries.clear()
+
+        assert get_test_user().id == user.id
+        assert count_queries == []
+
+
+class TestUserProvisioning:
+    """Auth0 users are keyed by subject and provisioned with a single upsert."""
+
+    def test_first_login_stores_subject(self, app_context):
+        from auth_middleware import get_or_create_user
+        from models import Users
+
+        identity = get_or_create_user({'sub': 'auth0|7', 'email': 'piotr@example.com', 'name': 'Piotr W'})
+
+        user = Users.query.get(identity.id)
+        assert user.auth_subject == 'auth0|7'
+        assert (user.first_name, user.last_name) == ('Piotr', 'W')
+
+    def test_existing_email_account_is_linked(self, app_context):
+        from app import db
+        from auth_middleware import get_or_create_user
+        from models import Users
+
+        existing = Users(first_name='Jan', last_name='K', email='jan@example.com', password_hash='auth0_user')
+        db.session.add(existing)
+        db.session.commit()
+
+        identity = get_or_create_user({'sub': 'auth0|1', 'email': 'jan@example.com'})
+
+        assert identity.id == existing.id
+        db.session.expire_all()
+        assert Users.query.get(existing.id).auth_subject == 'auth0|1'
+        assert Users.query.count() == 1
+
+    def test_subject_lookup_survives_email_change(self, app_context):
+        from auth_middleware import get_or_create_user, identity_cache
+
+        first = get_or_create_user({'sub': 'auth0|9', 'email': 'old@example.com'})
+        identity_cache.clear()
+
+        again = get_or_create_user({'sub': 'auth0|9', 'email': 'new@example.com'})
+
+        assert again.id == first.id
+
+    def test_cached_email_does_not_bypass_subject_check(self, app_context):
+        from auth_middleware import AuthError, get_or_create_user
+
+        get_or_create_user({'sub': 'auth0|A', 'email': 'x@example.com'})
+
+        # Another Auth0 account claiming the same email, with the first one still cached
+        with pytest.raises(AuthError) as error:
+            get_or_create_user({'sub': 'auth0|B', 'email': 'x@example.com'})
+        assert error.value.status_code == 409
+
+    def test_concurrent_first_logins_create_one_user(self, test_app, app_context):
+        from concurrent.futures import ThreadPoolExecutor
+        from auth_middleware import provision_user
+        from models import Users
+
+        def login(_):
+            with test_app.app_context():
+                return provision_user('auth0|race', 'race@example.com', 'Race', 'Condition').id
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = set(executor.map(login, range(16)))
+
+        assert len(ids) == 1
+        assert Users.query.filter_by(email='race@example.com').count() == 1
@@ -0,0 +1,253 @@
+"""
+Tests for the vehicle catalog: make/model/variant tables and the streaming loader.
+"""
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Car, CarMake, CarModel, Items, Users
+from services.car_catalog_loader import CarCatalogLoader
+
+HEADER = 'Make,Model,Year,Fuel Type1,Engine displacement,Typ nadwozia\n'
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    def write(*lines, name='catalog.csv'):
+        path = tmp_path / name
+        path.write_text(HEADER + ''.join(line + '\n' for line in lines), encoding='utf-8')
+        return str(path)
+    return write
+
+
+class TestCatalogTables:
+    """Cars join car_makes/car_models and are unique per variant."""
+
+    def test_new_car_is_linked_to_make_and_model(self, app_context):
+        db.session.add_all([Car(make='Toyota', model='Camry', year=2020),
+                            Car(make='Toyota', model='Camry', year=2021),
+                            Car(make='Toyota', model='Corolla', year=2021)])
+        db.session.commit()
+
+        toyota = CarMake.query.filter_by(name='Toyota').one()
+        assert sorted(model.name for model in toyota.models) == ['Camry', 'Corolla']
+        assert {car.catalog_model.name for car in Car.query.filter_by(model='Camry')} == {'Camry'}
+
+    def test_variant_is_stored_once(self, app_context):
+        db.session.add(Car(make='Fiat', model='500e', year=2021, engine_displacement=None))
+        db.session.commit()
+
+        db.session.add(Car(make='Fiat', model='500e ', year=2021, fuel_type=''))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_changing_the_model_moves_the_car(self, app_context):
+        car = Car(make='Skoda', model='Octavia', year=2019)
+        db.session.add(car)
+        db.session.commit()
+
+        car.model = 'Superb'
+        db.session.commit()
+
+        assert car.catalog_model.name == 'Superb'
+        assert CarModel.query.filter_by(name='Octavia').count() == 1
+
+    def test_variant_key_normalizes_values(self):
+        key = Car.variant_key_for({'make': 'Audi', 'model': 'A4', 'year': 2018, 'engine_displacement': 2.0})
+
+        assert key == Car.variant_key_for({'make': ' Audi', 'model': 'A4', 'year': 2018, 'engine_displacement': 2,
+                                           'fuel_type': None})
+        assert key != Car.variant_key_for({'make': 'Audi', 'model': 'A4', 'year': 2018, 'engine_displacement': 1.8})
+
+    def test_pickers_read_catalog_tables(self, client, app_context):
+        db.session.add_all([Car(make='Toyota', model='Camry', year=2020),
+                            Car(make='Toyota', model='Camry', year=2021, fuel_type='Hybryda'),
+                            Car(make='Audi', model='A4', year=2018)])
+        db.session.commit()
+
+        assert client.get('/api/cars/makes').get_json() == ['Audi', 'Toyota']
+        assert client.get('/api/cars/models?make=Toyota').get_json() == ['Camry']
+
+    def test_listing_with_padded_names_reuses_the_variant(self, client, app_context):
+        # The TESTING user is the first user in the database
+        db.session.add(Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x'))
+        car = Car(make='Toyota', model='Camry', year=2020)
+        db.session.add(car)
+        db.session.commit()
+
+        response = client.post('/api/items', json={'make': ' Toyota', 'model': 'Camry ', 'year': 2020, 'price': 50000,
+                                                   'car_mileage': 1000, 'color': 'Red', 'description': 'Opis'})
+
+        assert response.status_code == 201
+        assert Items.query.one().car_id == car.id
+
+    def test_concurrent_listings_of_a_new_variant_share_it(self, test_app, client, app_context):
+        from concurrent.futures import ThreadPoolExecutor
+
+        db.session.add(Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x'))
+        db.session.commit()
+        listing = {'make': 'Skoda', 'model': 'Octavia', 'year': 2019, 'price': 40000,
+                   'car_mileage': 1000, 'color': 'Red', 'description': 'Opis'}
+
+        def create(_):
+            return test_app.test_client().post('/api/items', json=listing).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(create, range(16)))
+
+        assert statuses == [201] * 16
+        assert Car.query.count() == 1
+        assert {item.car_id for item in Items.query.all()} == {Car.query.one().id}
+
+
+class TestParseRow:
+    """CSV rows to cars values."""
+
+    def test_converts_types_and_blanks(self):
+        record = CarCatalogLoader.parse_row({'Make': 'Fiat', 'Model': '500e', 'Year': '2021.0',
+                                             'Fuel Type1': '', 'Engine displacement': ' ',
+                                             'Typ nadwozia': 'Hatchback'})
+
+        assert record == {'make': 'Fiat', 'model': '500e', 'year': 2021, 'fuel_type': None,
+                          'engine_displacement': None, 'car_size_class': 'Hatchback'}
+
+    @pytest.mark.parametrize('row', [
+        {'Make': '', 'Model': 'X5', 'Year': '2019'},
+        {'Make': 'BMW', 'Model': 'X5', 'Year': 'unknown'},
+        {'Make': 'BMW', 'Model': 'X5', 'Year': '2019', 'Engine displacement': '3,0'},
+    ])
+    def test_rejects_rows_that_cannot_be_cars(self, row):
+        assert CarCatalogLoader.parse_row(row) is None
+
+
+class TestLoad:
+    """Loading into the cars table."""
+
+    def test_loads_in_batches(self, app_context, write_csv):
+        path = write_csv(*(f'Toyota,Model {i},2020,Benzyna,1.8,Sedan' for i in range(7)))
+        batches = []
+
+        stats = CarCatalogLoader(batch_size=3).load(path, progress=batches.append)
+
+        assert stats['status'] == 'loaded'
+        assert stats['loaded'] == 7
+        assert batches == [3, 6, 7]
+        assert Car.query.count() == 7
+
+    def test_collapses_duplicate_rows(self, app_context, write_csv):
+        camry = 'Toyota,Camry,2020,Benzyna,2.5,Sedan'
+        path = write_csv(camry, camry, 'Toyota,Camry,2020,Benzyna,,Sedan', 'Toyota,Corolla,2020,Benzyna,1.8,Sedan',
+                         camry, 'BMW,X5,2019,Diesel,3.0,SUV', camry)
+
+        stats = CarCatalogLoader(batch_size=2).load(path)
+
+        assert (stats['read'], stats['loaded'], stats['duplicates']) == (7, 4, 3)
+        assert Car.query.filter_by(model='Camry').count() == 2
+        assert CarMake.query.count() == 2
+        assert CarModel.query.count() == 3
+        assert Car.query.filter(Car.model_id.is_(None)).count() == 0
+
+    def test_counts_rejected_rows(self, app_context, write_csv):
+        path = write_csv('Toyota,Camry,2020,Benzyna,2.5,Sedan', ',Nameless,2020,,,', 'BMW,X5,,Diesel,3.0,SUV')
+
+        stats = CarCatalogLoader().load(path)
+
+        assert (stats['loaded'], stats['rejected']) == (1, 2)
+
+    def test_is_idempotent(self, app_context, write_csv):
+        path = write_csv('Toyota,Camry,2020,Benzyna,2.5,Sedan')
+        loader = CarCatalogLoader()
+
+        loader.load(path)
+        stats = loader.load(path)
+
+        assert stats['status'] == 'skipped'
+        assert Car.query.count() == 1
+
+    def test_rebuilds_indexes(self, app_context, write_csv):
+        CarCatalogLoader().load(write_csv('Toyota,Camry,2020,Benzyna,2.5,Sedan'))
+
+        with db.engine.connect() as conn:
+            # A query reloads a pooled SQLite connection's schema, PRAGMA index_list alone does not
+            conn.execute(db.select(Car.id).limit(1))
+            indexes = {index['name'] for index in inspect(conn).get_indexes('cars')}
+        assert {'ix_cars_model_id_year', 'uq_cars_variant_key'} <= indexes
+
+    def test_failed_load_leaves_table_empty(self, app_context, write_csv, monkeypatch):
+        path = write_csv(*(f'Toyota,Model {i},2020,Benzyna,1.8,Sedan' for i in range(4)))
+
+        def fail(loaded):
+            raise RuntimeError('interrupted')
+
+        with pytest.raises(RuntimeError):
+            CarCatalogLoader(batch_size=2).load(path, progress=fail)
+
+        assert Car.query.count() == 0
+        assert CarCatalogLoader().load(path)['loaded'] == 4
+
+    def test_missing_file(self, app_context):
+        with pytest.raises(FileNotFoundError):
+            CarCatalogLoader().load('missing.csv')
+
+
+class TestRefresh:
+    """Applying a new catalog version to a filled database."""
+
+    CAMRY = 'Toyota,Camry,2020,Benzyna,2.5,Sedan'
+    CIVIC = 'Honda,Civic,2019,Benzyna,1.5,Hatchback'
+
+    def list_car(self, car):
+        user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Items(user_id=user.id, car_id=car.id, price=50000, description='Opis'))
+        db.session.commit()
+
+    def test_adds_only_new_variants(self, app_context, write_csv):
+        loader = CarCatalogLoader()
+        loader.load(write_csv(self.CAMRY, self.CIVIC))
+        camry_id = Car.query.filter_by(model='Camry').one().id
+
+        stats = loader.refresh(write_csv(self.CAMRY, self.CIVIC, self.CIVIC, 'Toyota,Camry,2020,Hybryda,2.5,Sedan',
+                                         name='new.csv'))
+
+        assert (stats['read'], stats['added'], stats['unchanged'], stats['duplicates']) == (4, 1, 2, 1)
+        assert stats['pruned'] == 0
+        assert Car.query.count() == 3
+        assert Car.query.filter_by(model='Camry', fuel_type='Benzyna').one().id == camry_id
+
+    def test_refresh_of_same_file_changes_nothing(self, app_context, write_csv):
+        path = write_csv(self.CAMRY, self.CIVIC)
+        loader = CarCatalogLoader()
+        loader.load(path)
+
+        stats = loader.refresh(path)
+
+        assert (stats['added'], stats['unchanged']) == (0, 2)
+
+    def test_prune_keeps_variants_with_listings(self, app_context, write_csv):
+        loader = CarCatalogLoader(batch_size=1)
+        loader.load(write_csv(self.CAMRY, self.CIVIC, 'Fiat,Punto,2010,Benzyna,1.2,Hatchback'))
+        self.list_car(Car.query.filter_by(model='Punto').one())
+
+        stats = loader.refresh(write_csv(self.CAMRY, name='new.csv'), prune=True)
+
+        assert stats['pruned'] == 1
+        assert sorted(car.model for car in Car.query.all()) == ['Camry', 'Punto']
+        assert sorted(make.name for make in CarMake.query.all()) == ['Fiat', 'Toyota']
+        assert CarModel.query.filter_by(name='Civic').count() == 0
+
+    def test_without_prune_nothing_is_deleted(self, app_context, write_csv):
+        loader = CarCatalogLoader()
+        loader.load(write_csv(self.CAMRY, self.CIVIC))
+
+        loader.refresh(write_csv(self.CAMRY, name='new.csv'))
+
+        assert Car.query.count() == 2
+
+    def test_missing_file(self, app_context):
+        with pytest.raises(FileNotFoundError):
+            CarCatalogLoader().refresh('missing.csv')
@@ -41,8 +41,7 @@ class TestAppFunctionality:
 
     def test_database_initialization_missing_csv(self, app_context):
         """Test 3: Verify graceful handling when CSV file is missing."""
-        with patch('pandas.read_csv') as mock_read_csv:
-            mock_read_csv.side_effect = FileNotFoundError()
+        with patch.dict(app.config, {'CATALOG_CSV': 'missing.csv'}):
             
             # Should not raise exception
             init_database()
@@ -0,0 +1,147 @@
+"""
+Tests for the LLM completion cache and experiment execution.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+from app import db
+from models import Experiment, ExperimentRun, CachedCompletion
+from services.completion_cache import CompletionCache, completion_cache
+from services.gap_fill_client import gap_fill_client
+
+
+def fake_fill(model, text_with_gaps, parameters):
+    return True, {
+        'filled_text': text_with_gaps.replace('[GAP:1]', 'srebrny'),
+        'gaps': [{'index': 1, 'choice': 'srebrny'}],
+        'generation_time': 1.5
+    }, None
+
+
+class TestCompletionCache:
+    """Test cache keys, enablement rules and eviction."""
+
+    def test_key_depends_only_on_relevant_parameters(self):
+        base = CompletionCache.make_key('bielik-11b-gguf', {'temperature': 0, 'max_tokens': 200}, 'Auto [GAP:1]')
+        same = CompletionCache.make_key('bielik-11b-gguf', {'max_tokens': 200, 'temperature': 0, 'gap_notation': 'auto'}, 'Auto [GAP:1]')
+        other = CompletionCache.make_key('llama-3.1-8b', {'temperature': 0, 'max_tokens': 200}, 'Auto [GAP:1]')
+
+        assert base == same
+        assert base != other
+
+    def test_enabled_for_zero_temperature_or_explicit_flag(self):
+        assert CompletionCache.is_enabled_for({'temperature': 0})
+        assert CompletionCache.is_enabled_for({'temperature': 0.7, 'cache_enabled': True})
+        assert not CompletionCache.is_enabled_for({'temperature': 0.3})
+        assert not CompletionCache.is_enabled_for({'temperature': 0, 'cache_enabled': False})
+
+    def test_get_after_put_counts_hits(self, app_context):
+        cache = CompletionCache()
+        assert cache.get('m', {'temperature': 0}, 'prompt') is None
+
+        cache.put('m', {'temperature': 0}, 'prompt', {'filled_text': 'x', 'gaps': []})
+        db.session.commit()
+
+        assert cache.get('m', {'temperature': 0}, 'prompt') == {'filled_text': 'x', 'gaps': []}
+        assert CachedCompletion.query.one().hit_count == 1
+
+    def test_eviction_keeps_total_size_bounded(self, app_context):
+        cache = CompletionCache(max_bytes=300)
+        for i in range(10):
+            cache.put('m', {'temperature': 0}, f'prompt {i}', {'filled_text': 'x' * 50})
+            db.session.commit()
+
+        assert cache.stats()['sizeBytes'] <= 300
+        assert CachedCompletion.query.filter_by(prompt='prompt 9').first() is not None
+        assert CachedCompletion.query.filter_by(prompt='prompt 0').first() is None
+
+    def test_eviction_spans_several_batches(self, app_context):
+        cache = CompletionCache(evict_batch=2)
+        for i in range(10):
+            cache.put('m', {'temperature': 0}, f'prompt {i}', {'filled_text': 'x' * 50})
+        db.session.commit()
+
+        cache.max_bytes = 300
+        evicted = cache.evict()
+
+        assert evicted > cache.evict_batch
+        assert CachedCompletion.query.count() == 10 - evicted
+        assert cache.stats()['sizeBytes'] <= 300
+        assert CachedCompletion.query.filter_by(prompt='prompt 9').first() is not None
+
+    def test_put_of_existing_key_updates_the_entry(self, app_context):
+        cache = CompletionCache()
+        cache.put('m', {'temperature': 0}, 'prompt', {'filled_text': 'old'})
+        db.session.commit()
+        cache.get('m', {'temperature': 0}, 'prompt')
+        db.session.commit()
+
+        # Another run stored the same prompt meanwhile: no IntegrityError
+        cache.put('m', {'temperature': 0}, 'prompt', {'filled_text': 'new'})
+        db.session.commit()
+
+        entry = CachedCompletion.query.one()
+        assert entry.response == {'filled_text': 'new'}
+        assert entry.hit_count == 1
+
+
+class TestExperimentExecution:
+    """Test POST /api/experiments/<id>/run with the completion cache."""
+
+    def create_experiment(self, parameters):
+        experiment = Experiment(name='Cache test', models=['bielik-1.5b-gguf', 'llama-3.1-8b'],
+                                parameters=parameters, test_ads=[1])
+        db.session.add(experiment)
+        db.session.commit()
+        return experiment.id
+
+    def test_repeated_run_is_served_from_cache(self, client, app_context, monkeypatch):
+        fill = MagicMock(side_effect=fake_fill)
+        monkeypatch.setattr(gap_fill_client, 'fill_gaps', fill)
+        experiment_id = self.create_experiment({'temperature': 0, 'max_tokens': 200})
+        items = [{'id': 'item-1', 'text_with_gaps': 'Sprzedam [GAP:1] BMW'}]
+
+        first = client.post(f'/api/experiments/{experiment_id}/run', data=json.dumps({'items': items}),
+                            content_type='application/json')
+        second = client.post(f'/api/experiments/{experiment_id}/run', data=json.dumps({'items': items}),
+                             content_type='application/json')
+
+        assert first.status_code == 200
+        assert first.get_json()['cacheHits'] == 0
+        assert second.get_json()['cacheHits'] == 2
+        assert fill.call_count == 2
+        assert ExperimentRun.query.filter_by(experiment_id=experiment_id).count() == 4
+
+        results = client.get(f'/api/experiments/{experiment_id}/results').get_json()
+        assert results['cacheHits'] == 2
+
+    def test_non_deterministic_run_bypasses_cache(self, client, app_context, monkeypatch):
+        fill = MagicMock(side_effect=fake_fill)
+        monkeypatch.setattr(gap_fill_client, 'fill_gaps', fill)
+        experiment_id = self.create_experiment({'temperature': 0.7})
+        items = [{'id': 'item-1', 'text_with_gaps': 'Sprzedam [GAP:1] BMW'}]
+
+        for _ in range(2):
+            client.post(f'/api/experiments/{experiment_id}/run', data=json.dumps({'items': items}),
+                        content_type='application/json')
+
+        assert fill.call_count == 4
+        assert CachedCompletion.query.count() == 0
+
+    def test_free_form_ids_pair_by_text(self, client, app_context, monkeypatch):
+        monkeypatch.setattr(gap_fill_client, 'fill_gaps', MagicMock(side_effect=fake_fill))
+        experiment_id = self.create_experiment({'temperature': 0.7})
+        audi, bmw = 'Sprzedam [GAP:1] Audi', 'Sprzedam [GAP:1] BMW'
+
+        for items in ([{'id': 'item-1', 'text_with_gaps': audi}],
+                      [{'id': 'item-2', 'text_with_gaps': bmw}, {'id': 'item-3', 'text_with_gaps': audi}]):
+            client.post(f'/api/experiments/{experiment_id}/run', data=json.dumps({'items': items}),
+                        content_type='application/json')
+
+        ad_ids = {}
+        for run in ExperimentRun.query.filter_by(experiment_id=experiment_id):
+            ad_ids.setdefault(run.original_text, set()).add(run.ad_id)
+        assert len(ad_ids[audi]) == 1 and len(ad_ids[bmw]) == 1
+        assert ad_ids[audi] != ad_ids[bmw]
+        assert ad_ids[audi] == {CompletionCache.text_id(audi)}
@@ -0,0 +1,124 @@
+"""
+Tests for database URL/pool settings and SQLite pragma profiles in database.py.
+"""
+
+import threading
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import db, init_database
+from database import configure_sqlite, database_url, engine_options
+from models import Car
+
+
+@pytest.fixture
+def engine_for(tmp_path):
+    engines = []
+
+    def make(profile):
+        engine = create_engine(f"sqlite:///{tmp_path / f'{profile}.db'}")
+        configure_sqlite(engine, profile)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+class TestSQLiteProfiles:
+    """Pragmas are applied to every pooled connection."""
+
+    def test_production_profile(self, engine_for):
+        engine = engine_for('production')
+
+        assert pragma(engine, 'journal_mode') == 'wal'
+        assert pragma(engine, 'synchronous') == 1  # NORMAL
+        assert pragma(engine, 'busy_timeout') == 5000
+        assert pragma(engine, 'cache_size') == -64 * 1024
+        assert pragma(engine, 'mmap_size') == 256 * 1024 * 1024
+
+    def test_default_profile_keeps_sqlite_defaults(self, engine_for):
+        engine = engine_for('default')
+
+        assert pragma(engine, 'journal_mode') == 'delete'
+        assert pragma(engine, 'synchronous') == 2  # FULL
+
+    def test_unknown_profile_is_rejected(self, engine_for):
+        with pytest.raises(ValueError):
+            engine_for('fast')
+
+    def test_readers_are_not_blocked_by_open_write_transaction(self, engine_for):
+        engine = engine_for('production')
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE cars (id INTEGER PRIMARY KEY, make TEXT)"))
+            conn.execute(text("INSERT INTO cars (make) VALUES ('Toyota')"))
+
+        counts = []
+        with engine.begin() as writer:
+            writer.execute(text("INSERT INTO cars (make) VALUES ('BMW')"))
+            reader = threading.Thread(target=lambda: counts.append(
+                engine.connect().execute(text("SELECT COUNT(*) FROM cars")).scalar()))
+            reader.start()
+            reader.join(timeout=2)
+
+        # The reader sees the last committed snapshot instead of waiting for the writer
+        assert counts == [1]
+
+
+def test_app_engine_uses_production_profile(app_context):
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('SQLite only')
+    assert db.session.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+
+
+class TestEngineConfiguration:
+    """The URL and pool come from the environment."""
+
+    def test_database_url_defaults_to_sqlite(self, monkeypatch):
+        monkeypatch.delenv('DATABASE_URL', raising=False)
+
+        assert database_url() == 'sqlite:///vehicles.db'
+
+    def test_heroku_postgres_url_is_normalised(self, monkeypatch):
+        monkeypatch.setenv('DATABASE_URL', 'postgres://user:secret@db:5432/portal')
+
+        assert database_url() == 'postgresql://user:secret@db:5432/portal'
+
+    def test_pool_settings_from_environment(self, monkeypatch):
+        monkeypatch.setenv('DB_POOL_SIZE', '20')
+        monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+        monkeypatch.setenv('DB_POOL_RECYCLE', '300')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'False')
+
+        options = engine_options('postgresql+psycopg://db/portal')
+
+        assert options == {'pool_size': 20, 'max_overflow': 0, 'pool_timeout': 30,
+                           'pool_recycle': 300, 'pool_pre_ping': False}
+
+    def test_sqlite_pools(self):
+        assert 'pool_pre_ping' not in engine_options('sqlite:///vehicles.db')
+        assert engine_options('sqlite://') == {}
+        assert engine_options('sqlite:///:memory:') == {}
+
+
+def test_csv_load_maps_missing_values_to_null(app_context, catalog_csv, monkeypatch):
+    monkeypatch.setitem(app_context.config, 'CATALOG_CSV', catalog_csv(pd.DataFrame({
+        'Make': ['Toyota', 'Fiat'], 'Model': ['Camry', '500e'], 'Year': [2020, 2021],
+        'Fuel Type1': ['Benzyna', None], 'Engine displacement': [2.5, float('nan')],
+        'Typ nadwozia': ['Sedan', 'Hatchback']
+    })))
+
+    init_database()
+
+    fiat = Car.query.filter_by(make='Fiat').one()
+    assert fiat.engine_displacement is None
+    assert fiat.fuel_type is None
+    assert Car.query.count() == 2
@@ -0,0 +1,145 @@
+"""
+Tests for presigned direct-to-S3 uploads, against moto's in-process S3.
+"""
+
+import base64
+import hashlib
+import io
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from moto import mock_aws
+from PIL import Image
+
+from app import db
+from models import ImageTask, Items, Photo, Users
+from services.image_worker import image_worker
+from services.storage_backends import S3Backend
+from services.storage_service import storage_service
+
+BUCKET = 'photos-bucket'
+
+
+def jpeg_bytes(color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        # The backend's own client: presigned URLs depend on its signature version
+        backend = S3Backend(BUCKET)
+        backend.client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(storage_service, 'storage_type', 'aws_s3')
+        monkeypatch.setitem(storage_service._backends, 'aws_s3', backend)
+        yield backend.client
+
+
+@pytest.fixture
+def item(app_context):
+    # The TESTING user is the first user in the database
+    user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    item = Items(user_id=user.id, price=20000, description='Opis')
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def presign(client, data, **overrides):
+    body = {'filename': 'car.jpg', 'contentType': 'image/jpeg', 'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(), **overrides}
+    return client.post('/api/photos/presign', data=json.dumps(body), content_type='application/json')
+
+
+def upload_to_s3(upload, data):
+    # What the browser does with the presigned PUT
+    return requests.request(upload['method'], upload['url'], data=data, headers=upload['headers'])
+
+
+def complete(client, item_id, stored_filename):
+    return client.post(f'/api/items/{item_id}/photos/complete', data=json.dumps({
+        'storedFilename': stored_filename, 'filename': 'car.jpg'
+    }), content_type='application/json')
+
+
+class TestDirectUpload:
+    """Presign, upload straight to the bucket, then complete."""
+
+    def test_full_flow_creates_photo(self, client, s3, item):
+        data = jpeg_bytes()
+
+        signed = json.loads(presign(client, data).data)
+        assert signed['uploadRequired']
+        assert upload_to_s3(signed['upload'], data).status_code in (200, 204)
+
+        response = complete(client, item.id, signed['file']['stored_filename'])
+
+        assert response.status_code == 201
+        photo = json.loads(response.data)['photo']
+        assert photo['storageType'] == 'aws_s3'
+        assert photo['fileSize'] == len(data)
+        assert photo['isMain']
+        assert photo['processingStatus'] == 'pending'
+
+        image_worker.run_pending()
+        db.session.expire_all()
+        assert Photo.query.one().processing_status == 'ready'
+
+    def test_existing_content_needs_no_upload(self, client, s3, item):
+        data = jpeg_bytes()
+        upload_to_s3(json.loads(presign(client, data).data)['upload'], data)
+
+        signed = json.loads(presign(client, data).data)
+
+        assert not signed['uploadRequired']
+        assert 'upload' not in signed
+
+    def test_complete_without_upload_is_404(self, client, s3, item):
+        signed = json.loads(presign(client, jpeg_bytes()).data)
+
+        assert complete(client, item.id, signed['file']['stored_filename']).status_code == 404
+
+    def test_upload_is_bound_to_the_claimed_checksum(self, client, s3, item):
+        data = jpeg_bytes()
+
+        upload = json.loads(presign(client, data).data)['upload']
+
+        signed_headers = parse_qs(urlparse(upload['url']).query)['X-Amz-SignedHeaders'][0].split(';')
+        assert {'x-amz-checksum-sha256', 'content-length', 'content-type'} <= set(signed_headers)
+        assert upload['headers']['x-amz-checksum-sha256'] == base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+    def test_checksum_mismatch_is_caught_by_worker(self, client, s3, item):
+        # S3 answers BadDigest to such a PUT, moto accepts it: the worker is the backstop
+        claimed, actual = jpeg_bytes((1, 1, 1)), jpeg_bytes((250, 250, 250))
+        signed = json.loads(presign(client, claimed).data)
+        upload_to_s3(signed['upload'], actual)
+        stored_filename = signed['file']['stored_filename']
+
+        assert complete(client, item.id, stored_filename).status_code == 201
+        image_worker.run_pending()
+
+        db.session.expire_all()
+        assert ImageTask.query.one().status == 'failed'
+        assert Photo.query.one().processing_status == 'failed'
+        assert storage_service.stat_object(stored_filename) is None
+
+    def test_presign_validation(self, client, s3, item):
+        data = jpeg_bytes()
+
+        assert presign(client, data, sha256='abc').status_code == 400
+        assert presign(client, data, filename='car.exe').status_code == 400
+        assert presign(client, data, size=storage_service.max_file_size + 1).status_code == 413
+
+
+def test_presign_requires_s3_storage(client, app_context):
+    response = presign(client, b'data')
+
+    assert response.status_code == 400
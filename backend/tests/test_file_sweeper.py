@@ -0,0 +1,173 @@
+"""
+Tests for outbox-based photo file deletion and the orphan scan.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import db
+from models import FileDeletion, ImageTask, Items, Photo, Users
+from services.file_sweeper import FileSweeper, file_sweeper
+from services.storage_backends import S3Backend
+from services.storage_service import StorageService, storage_service
+
+SHA = 'a' * 64
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+    return tmp_path
+
+
+def create_item():
+    # The TESTING user is the first user in the database
+    user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    item = Items(user_id=user.id, price=1000, description='Opis')
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def add_photos(item, stored_filename, count=1):
+    photos = [Photo(item_id=item.id, filename='a.jpg', stored_filename=stored_filename,
+                    file_path=f'/uploads/photos/{stored_filename}') for _ in range(count)]
+    db.session.add_all(photos)
+    db.session.commit()
+    return [photo.id for photo in photos]
+
+
+def store(folder, stored_filename):
+    for name in FileSweeper.stored_files(stored_filename)[:3]:
+        (folder / name).write_bytes(b'data')
+
+
+class TestOutboxSweep:
+    """Deletes are recorded in the outbox and files released by the sweeper."""
+
+    @pytest.fixture
+    def shared_file(self, folder, app_context):
+        store(folder, 'abc.jpg')
+        photo_ids = add_photos(create_item(), 'abc.jpg', count=2)
+        db.session.add(ImageTask(stored_filename='abc.jpg', status='done',
+                                 last_uploaded_at=datetime.utcnow() - timedelta(days=1)))
+        db.session.commit()
+        return photo_ids
+
+    def test_delete_only_writes_outbox(self, client, folder, shared_file):
+        assert client.delete(f'/api/photos/{shared_file[0]}').status_code == 200
+
+        assert FileDeletion.query.one().stored_filename == 'abc.jpg'
+        assert (folder / 'abc.jpg').exists()
+
+    def test_file_removed_with_last_reference(self, client, folder, shared_file):
+        client.delete(f'/api/photos/{shared_file[0]}')
+        assert file_sweeper.sweep_all()['shared'] == 1
+        assert (folder / 'abc.jpg').exists()
+
+        client.delete(f'/api/photos/{shared_file[1]}')
+        assert file_sweeper.sweep_all()['released'] == 1
+
+        assert list(folder.iterdir()) == []
+        assert FileDeletion.query.count() == 0
+        assert ImageTask.query.count() == 0
+
+    def test_recent_upload_defers_deletion(self, client, folder, shared_file):
+        ImageTask.query.update({'last_uploaded_at': datetime.utcnow()})
+        db.session.commit()
+
+        for photo_id in shared_file:
+            client.delete(f'/api/photos/{photo_id}')
+        stats = file_sweeper.sweep_all()
+
+        assert stats['deferred'] == 2
+        assert (folder / 'abc.jpg').exists()
+        assert FileDeletion.query.count() == 2
+
+    def test_item_cascade_queues_files(self, client, folder, app_context):
+        store(folder, 'abc.jpg')
+        item = create_item()
+        add_photos(item, 'abc.jpg')
+
+        db.session.delete(item)
+        db.session.commit()
+        file_sweeper.sweep_all()
+
+        assert list(folder.iterdir()) == []
+
+    def test_failed_deletes_are_retried(self, app_context):
+        storage = MagicMock()
+        storage.delete_many.return_value = {'abc.jpg': 'Access denied'}
+        sweeper = FileSweeper(storage=storage, max_attempts=2)
+        db.session.add(FileDeletion(stored_filename='abc.jpg', storage_type='local'))
+        db.session.commit()
+
+        sweeper.sweep()
+        assert FileDeletion.query.one().attempts == 1
+        assert FileDeletion.query.one().error == 'Access denied'
+
+        sweeper.sweep()
+        assert FileDeletion.query.count() == 0
+
+
+def test_outbox_entries_cannot_leave_the_uploads_folder(folder, app_context):
+    victim = folder.parent / 'victim.db'
+    victim.write_bytes(b'data')
+    db.session.add(FileDeletion(stored_filename='../victim.db'))
+    db.session.commit()
+
+    file_sweeper.sweep_all()
+
+    assert victim.exists()
+    with pytest.raises(ValueError):
+        storage_service.stat_object('../victim.db')
+
+
+def test_s3_deletes_are_batched():
+    client = MagicMock()
+    client.delete_objects.return_value = {
+        'Errors': [{'Key': 'photos/file5.jpg', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]
+    }
+    service = StorageService('aws_s3', backends=[S3Backend('photos-bucket', client=client)])
+
+    errors = service.delete_many([f'file{i}.jpg' for i in range(2500)])
+
+    batches = [call.kwargs['Delete']['Objects'] for call in client.delete_objects.call_args_list]
+    assert [len(batch) for batch in batches] == [1000, 1000, 500]
+    assert batches[0][0] == {'Key': 'photos/file0.jpg'}
+    assert errors['file5.jpg'] == 'Access Denied'
+
+
+class TestOrphanScan:
+    """Stored files are reconciled against the photos table."""
+
+    @pytest.fixture
+    def files(self, folder, app_context):
+        store(folder, f'{SHA}.jpg')
+        add_photos(create_item(), f'{SHA}.jpg')
+        store(folder, 'orphan.jpg')
+        (folder / '.abc.part').write_bytes(b'partial')
+        (folder / 'fresh_orphan.jpg').write_bytes(b'data')
+        old = time.time() - 2 * 24 * 3600
+        for path in folder.iterdir():
+            if path.name != 'fresh_orphan.jpg':
+                os.utime(path, (old, old))
+        return folder
+
+    def test_dry_run_lists_orphans(self, files):
+        orphans = file_sweeper.scan_orphans('local', dry_run=True)
+
+        assert sorted(orphans) == sorted(['.abc.part'] + FileSweeper.stored_files('orphan.jpg')[:3])
+        assert (files / 'orphan.jpg').exists()
+
+    def test_scan_deletes_orphans_only(self, files):
+        file_sweeper.scan_orphans('local')
+
+        remaining = sorted(path.name for path in files.iterdir())
+        assert remaining == sorted(FileSweeper.stored_files(f'{SHA}.jpg')[:3] + ['fresh_orphan.jpg'])
@@ -0,0 +1,94 @@
+"""
+Tests for the multipart gallery upload endpoint.
+"""
+
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from app import db
+from models import ImageTask, Items, Photo, Users
+from services.storage_service import storage_service
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def item(tmp_path, monkeypatch, app_context):
+    monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+    # The TESTING user is the first user in the database
+    user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    item = Items(user_id=user.id, price=20000, description='Opis')
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def post_gallery(client, item_id, files, **form):
+    data = {'files': files, **form}
+    return client.post(f'/api/items/{item_id}/photos/upload', data=data, content_type='multipart/form-data')
+
+
+class TestGalleryUpload:
+    """Many files stored and attached in a single request."""
+
+    def test_uploads_and_attaches_all_files(self, client, item, tmp_path):
+        files = [(jpeg((i * 40, 0, 0)), f'car{i}.jpg') for i in range(4)]
+
+        response = post_gallery(client, item.id, files, main_index='2')
+
+        assert response.status_code == 201
+        photos = json.loads(response.data)['photos']
+        assert [p['filename'] for p in photos] == ['car0.jpg', 'car1.jpg', 'car2.jpg', 'car3.jpg']
+        assert [p['displayOrder'] for p in photos] == [0, 1, 2, 3]
+        assert [p['isMain'] for p in photos] == [False, False, True, False]
+        assert all(p['processingStatus'] == 'pending' for p in photos)
+        assert len(list(tmp_path.iterdir())) == 4
+        assert ImageTask.query.count() == 4
+
+    def test_duplicate_files_share_storage_and_task(self, client, item, tmp_path):
+        response = post_gallery(client, item.id, [(jpeg((1, 2, 3)), 'a.jpg'), (jpeg((1, 2, 3)), 'b.jpg')])
+
+        assert response.status_code == 201
+        assert len(list(tmp_path.iterdir())) == 1
+        assert ImageTask.query.count() == 1
+        assert Photo.query.count() == 2
+
+    def test_appends_to_existing_gallery(self, client, item):
+        post_gallery(client, item.id, [(jpeg((10, 10, 10)), 'first.jpg')])
+
+        response = post_gallery(client, item.id, [(jpeg((20, 20, 20)), 'second.jpg')])
+
+        photo = json.loads(response.data)['photos'][0]
+        assert photo['displayOrder'] == 1
+        assert not photo['isMain']
+
+    def test_invalid_file_rejects_whole_request(self, client, item, tmp_path):
+        files = [(jpeg((5, 5, 5)), 'good.jpg'), (io.BytesIO(b'not an image'), 'bad.jpg')]
+
+        response = post_gallery(client, item.id, files)
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['files'][0]['filename'] == 'bad.jpg'
+        assert Photo.query.count() == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_other_users_item_is_forbidden(self, client, item):
+        owner = Users(first_name='Anna', last_name='Nowak', email='anna@example.com', password_hash='x')
+        db.session.add(owner)
+        db.session.commit()
+        item.user_id = owner.id
+        db.session.commit()
+
+        response = post_gallery(client, item.id, [(jpeg((1, 1, 1)), 'a.jpg')])
+
+        assert response.status_code == 403
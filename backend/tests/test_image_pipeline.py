@@ -0,0 +1,112 @@
+"""
+Tests for photo rendition generation.
+"""
+
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from models import ImageTask
+from services.image_pipeline import ImagePipeline
+from services.image_worker import image_worker
+from services.storage_service import StorageService, storage_service
+
+EXIF_ORIENTATION = 0x0112
+
+
+def image_bytes(size=(2400, 1200), mode='RGB', fmt='JPEG', orientation=None):
+    image = Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30))
+    buffer = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        image.save(buffer, fmt, exif=exif)
+    else:
+        image.save(buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    storage = StorageService('local')
+    storage.upload_folder = str(tmp_path)
+    return ImagePipeline(storage=storage)
+
+
+def open_rendition(tmp_path, file_path):
+    return Image.open(tmp_path / os.path.basename(file_path))
+
+
+class TestImagePipeline:
+    """Sizes, formats, orientation and metadata of renditions."""
+
+    def test_generates_every_size_and_format(self, pipeline, tmp_path):
+        renditions = pipeline.generate(image_bytes(), 'photo.jpg')
+
+        assert set(renditions) == {'thumb', 'card', 'full'}
+        assert (renditions['full']['width'], renditions['full']['height']) == (1920, 960)
+        assert (renditions['card']['width'], renditions['card']['height']) == (800, 400)
+        assert (renditions['thumb']['width'], renditions['thumb']['height']) == (320, 160)
+        assert open_rendition(tmp_path, renditions['thumb']['webp']).format == 'WEBP'
+        assert open_rendition(tmp_path, renditions['thumb']['jpeg']).format == 'JPEG'
+        assert renditions['thumb']['webp'] == '/uploads/photos/photo_thumb.webp'
+
+    def test_small_images_are_not_upscaled(self, pipeline):
+        renditions = pipeline.generate(image_bytes(size=(500, 300)), 'small.jpg')
+
+        assert (renditions['full']['width'], renditions['full']['height']) == (500, 300)
+        assert (renditions['thumb']['width'], renditions['thumb']['height']) == (320, 192)
+
+    def test_exif_orientation_applied_and_stripped(self, pipeline, tmp_path):
+        # Orientation 6: stored landscape, displayed rotated 90 degrees
+        renditions = pipeline.generate(image_bytes(size=(1000, 500), orientation=6), 'rotated.jpg')
+
+        assert (renditions['full']['width'], renditions['full']['height']) == (500, 1000)
+        rendition = open_rendition(tmp_path, renditions['full']['jpeg'])
+        assert EXIF_ORIENTATION not in rendition.getexif()
+
+    def test_transparent_png_flattened_for_jpeg(self, pipeline, tmp_path):
+        renditions = pipeline.generate(image_bytes(size=(400, 400), mode='RGBA', fmt='PNG'), 'logo.png')
+
+        assert open_rendition(tmp_path, renditions['card']['jpeg']).mode == 'RGB'
+        assert open_rendition(tmp_path, renditions['card']['webp']).mode == 'RGBA'
+
+    def test_delete_removes_files(self, pipeline, tmp_path):
+        renditions = pipeline.generate(image_bytes(size=(400, 400)), 'gone.jpg')
+
+        pipeline.delete(renditions)
+
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestUploadRenditions:
+    """The upload endpoint stores the original and queues its renditions."""
+
+    @pytest.fixture(autouse=True)
+    def upload_folder(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+
+    def test_upload_queues_renditions(self, client, app_context):
+        response = client.post('/api/photos/upload', data={'file': (image_bytes(), 'car.jpg')},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        file_info = json.loads(response.data)['file']
+        assert file_info['processing_status'] == 'pending'
+
+        image_worker.run_pending()
+
+        task = ImageTask.query.filter_by(stored_filename=file_info['stored_filename']).one()
+        assert task.status == 'done'
+        assert task.renditions['thumb']['width'] == 320
+
+    def test_undecodable_upload_is_rejected(self, client, app_context, tmp_path):
+        response = client.post('/api/photos/upload', data={'file': (io.BytesIO(b'not an image'), 'car.jpg')},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 400
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,171 @@
+"""
+Tests for the background image processing worker.
+"""
+
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+
+from app import db
+from models import ImageTask, Items, Photo, Users
+from services.image_pipeline import ImagePipeline
+from services.image_worker import ImageWorker
+from services.storage_service import StorageService, storage_service
+
+
+def store_original(storage, stored_filename, size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(buffer, 'JPEG')
+    storage.store_bytes(buffer.getvalue(), stored_filename, 'image/jpeg', 'local')
+
+
+def create_item():
+    user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    item = Items(user_id=user.id, price=20000, description='Opis')
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def add_photo(item, stored_filename, processing_status='pending'):
+    photo = Photo(item_id=item.id, filename='car.jpg', stored_filename=stored_filename,
+                  file_path=f'/uploads/photos/{stored_filename}', processing_status=processing_status)
+    db.session.add(photo)
+    db.session.commit()
+    return photo
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = StorageService('local')
+    storage.upload_folder = str(tmp_path)
+    return storage
+
+
+@pytest.fixture
+def worker(storage):
+    return ImageWorker(pipeline=ImagePipeline(storage=storage), storage=storage, max_attempts=2)
+
+
+class TestImageWorker:
+    """Task lifecycle in the persistent queue."""
+
+    def test_pending_photo_becomes_ready(self, app_context, storage, worker):
+        store_original(storage, 'a.jpg')
+        task = worker.enqueue('a.jpg', 'local')
+        photo = add_photo(create_item(), 'a.jpg')
+
+        assert worker.run_pending() == 1
+
+        db.session.refresh(photo)
+        db.session.refresh(task)
+        assert task.status == 'done'
+        assert task.attempts == 1
+        assert photo.processing_status == 'ready'
+        assert photo.to_json()['renditions']['thumb']['width'] == 320
+
+    def test_duplicate_upload_reuses_task(self, app_context, worker):
+        first = worker.enqueue('a.jpg', 'local')
+        first.status = 'failed'
+        db.session.commit()
+
+        second = worker.enqueue('a.jpg', 'local')
+
+        assert second.id == first.id
+        assert second.status == 'pending'
+        assert ImageTask.query.count() == 1
+
+    def test_claim_is_exclusive(self, app_context, worker):
+        task = worker.enqueue('a.jpg', 'local')
+
+        assert worker._claim(task.id)
+        assert not worker._claim(task.id)
+
+    def test_failures_are_retried_then_marked_failed(self, app_context, worker):
+        task = worker.enqueue('missing.jpg', 'local')
+        photo = add_photo(create_item(), 'missing.jpg')
+
+        worker.run_pending()
+        db.session.refresh(task)
+        assert task.status == 'pending'
+        assert task.error
+
+        worker.run_pending()
+        db.session.refresh(task)
+        db.session.refresh(photo)
+        assert task.status == 'failed'
+        assert task.attempts == 2
+        assert photo.processing_status == 'failed'
+
+    def test_stale_claim_is_retried(self, app_context, storage, worker):
+        store_original(storage, 'a.jpg')
+        task = worker.enqueue('a.jpg', 'local')
+        task.status = 'running'
+        task.locked_at = datetime.utcnow() - timedelta(seconds=worker.lease_seconds + 1)
+        db.session.commit()
+
+        assert worker.run_pending() == 1
+        db.session.refresh(task)
+        assert task.status == 'done'
+
+    def test_reconcile_fills_photos_created_after_task_finished(self, app_context, worker):
+        task = worker.enqueue('a.jpg', 'local')
+        task.status = 'done'
+        task.renditions = {'thumb': {'width': 320, 'height': 200}}
+        db.session.commit()
+        photo = add_photo(create_item(), 'a.jpg')
+
+        worker.reconcile()
+
+        db.session.refresh(photo)
+        assert photo.processing_status == 'ready'
+        assert photo.renditions['thumb']['width'] == 320
+
+    def test_background_thread_processes_queue(self, app_context, storage, worker):
+        store_original(storage, 'a.jpg')
+        worker.poll_interval = 0.05
+        worker.start(app_context)
+        try:
+            task_id = worker.enqueue('a.jpg', 'local').id
+            deadline = time.time() + 10
+            status = None
+            while time.time() < deadline:
+                db.session.remove()
+                status = db.session.get(ImageTask, task_id).status
+                if status == 'done':
+                    break
+                time.sleep(0.05)
+        finally:
+            worker.stop(timeout=10)
+
+        assert status == 'done'
+
+
+def test_item_photos_take_finished_renditions(client, app_context, tmp_path, monkeypatch):
+    """Photos created after their task finished are ready immediately."""
+    monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+    done, queued = 'd' * 64 + '.jpg', 'e' * 64 + '.jpg'
+    for stored_filename in (done, queued):
+        store_original(storage_service, stored_filename)
+    # The TESTING user is the first user in the database
+    item = create_item()
+    db.session.add(ImageTask(stored_filename=done, status='done',
+                             renditions={'thumb': {'width': 320, 'height': 200}}))
+    db.session.add(ImageTask(stored_filename=queued))
+    db.session.commit()
+
+    response = client.post(f'/api/items/{item.id}/photos', data=json.dumps({'photos': [
+        {'filename': 'a.jpg', 'stored_filename': done},
+        {'filename': 'b.jpg', 'stored_filename': queued}
+    ]}), content_type='application/json')
+
+    assert response.status_code == 201
+    photos = json.loads(response.data)['photos']
+    assert [p['processingStatus'] for p in photos] == ['ready', 'pending']
+    assert photos[0]['renditions']['thumb']['width'] == 320
@@ -27,7 +27,7 @@ class TestApplicationWorkflow:
         makes = db.session.query(Car.make).distinct().all()
         assert isinstance(makes, list)
         
-    def test_database_initialization_with_csv_integration(self, app_context):
+    def test_database_initialization_with_csv_integration(self, app_context, catalog_csv):
         """Test complete database initialization workflow with CSV data."""
         # Create sample CSV data
         sample_data = pd.DataFrame({
@@ -39,7 +39,7 @@ class TestApplicationWorkflow:
             'Typ nadwozia': ['Sedan', 'SUV', 'Hatchback']
         })
         
-        with patch('pandas.read_csv', return_value=sample_data):
+        with patch.dict(app.config, {'CATALOG_CSV': catalog_csv(sample_data)}):
             # Clear existing data
             db.session.query(Car).delete()
             db.session.commit()
@@ -188,7 +188,7 @@ class TestApplicationConfiguration:
 class TestDataIntegrity:
     """Integration tests for data integrity across the application."""
     
-    def test_csv_to_database_data_integrity(self, app_context):
+    def test_csv_to_database_data_integrity(self, app_context, catalog_csv):
         """Test data integrity from CSV loading to database storage."""
         sample_data = pd.DataFrame({
             'Make': ['Toyota', 'BMW'],
@@ -199,7 +199,7 @@ class TestDataIntegrity:
             'Typ nadwozia': ['Sedan', 'SUV']
         })
         
-        with patch('pandas.read_csv', return_value=sample_data):
+        with patch.dict(app.config, {'CATALOG_CSV': catalog_csv(sample_data)}):
             # Clear and reload data
             db.session.query(Car).delete()
             db.session.commit()
@@ -319,7 +319,7 @@ class TestApplicationRobustness:
         user_count = db.session.query(Users).count()
         assert user_count >= 10
         
-    def test_csv_loading_idempotency(self, app_context):
+    def test_csv_loading_idempotency(self, app_context, catalog_csv):
         """Test that CSV loading is idempotent (can be run multiple times safely)."""
         sample_data = pd.DataFrame({
             'Make': ['Toyota'],
@@ -330,7 +330,7 @@ class TestApplicationRobustness:
             'Typ nadwozia': ['Sedan']
         })
         
-        with patch('pandas.read_csv', return_value=sample_data):
+        with patch.dict(app.config, {'CATALOG_CSV': catalog_csv(sample_data)}):
             # First initialization
             init_database()
             first_count = db.session.query(Car).count()
@@ -342,14 +342,12 @@ class TestApplicationRobustness:
             # Count should be the same
             assert first_count == second_count
             
-    @patch('pandas.read_csv')
-    def test_graceful_degradation_on_csv_error(self, mock_read_csv, app_context, capsys):
+    def test_graceful_degradation_on_csv_error(self, app_context, capsys):
         """Test that application continues to function even if CSV loading fails."""
-        # Mock CSV read failure
-        mock_read_csv.side_effect = FileNotFoundError("CSV file not found")
-        
-        # Initialize database (should handle error gracefully)
-        init_database()
+        # Point the loader at a file that does not exist
+        with patch.dict(app.config, {'CATALOG_CSV': 'missing.csv'}):
+            # Initialize database (should handle error gracefully)
+            init_database()
         
         # Verify error was logged
         captured = capsys.readouterr()
@@ -0,0 +1,89 @@
+"""
+Tests for the cached model list lookup (services/model_catalog.py).
+"""
+
+import time
+from unittest.mock import MagicMock
+
+from services.model_catalog import ModelCatalog, FALLBACK_MODELS
+
+
+def make_response(status_code=200, payload=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    return response
+
+
+class TestModelCatalog:
+    """Test TTL caching, stale-while-revalidate and circuit breaking."""
+
+    def test_models_are_cached_within_ttl(self):
+        catalog = ModelCatalog('http://bielik.test', ttl=60)
+        catalog.session.get = MagicMock(return_value=make_response(payload=[{'name': 'bielik-11b-gguf'}]))
+
+        assert catalog.get_models() == [{'name': 'bielik-11b-gguf'}]
+        assert catalog.get_models() == [{'name': 'bielik-11b-gguf'}]
+        assert catalog.session.get.call_count == 1
+
+    def test_wrapped_model_list_is_unwrapped(self):
+        catalog = ModelCatalog('http://bielik.test')
+        catalog.session.get = MagicMock(return_value=make_response(payload={'models': [{'name': 'a'}, 'b']}))
+
+        assert catalog.get_models() == [{'name': 'a'}, {'name': 'b'}]
+
+    def test_stale_list_is_served_while_refreshing(self):
+        catalog = ModelCatalog('http://bielik.test', ttl=0)
+        catalog.session.get = MagicMock(side_effect=[
+            make_response(payload=['old']),
+            make_response(payload=['new']),
+        ])
+
+        assert catalog.get_models() == [{'name': 'old'}]
+        # Stale entry is returned immediately, refresh happens in background
+        assert catalog.get_models() == [{'name': 'old'}]
+
+        deadline = time.time() + 2
+        while catalog.session.get.call_count < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        while catalog._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+        assert catalog.get_models()[0]['name'] == 'new'
+
+    def test_fallback_when_upstream_down(self):
+        catalog = ModelCatalog('http://bielik.test')
+        catalog.session.get = MagicMock(side_effect=ConnectionError('down'))
+
+        assert catalog.get_models() == [{'name': m} for m in FALLBACK_MODELS]
+
+    def test_circuit_breaker_skips_upstream_when_open(self):
+        catalog = ModelCatalog('http://bielik.test', failure_threshold=2, reset_timeout=60)
+        catalog.session.get = MagicMock(return_value=make_response(status_code=503))
+
+        catalog.get_models()
+        catalog.get_models()
+        assert catalog.breaker.is_open
+
+        catalog.get_models()
+        assert catalog.session.get.call_count == 2
+
+    def test_last_known_list_served_when_circuit_open(self):
+        catalog = ModelCatalog('http://bielik.test', ttl=0, failure_threshold=1, reset_timeout=60)
+        catalog.session.get = MagicMock(return_value=make_response(payload=['bielik-1.5b-gguf']))
+        assert catalog.get_models() == [{'name': 'bielik-1.5b-gguf'}]
+
+        catalog.session.get = MagicMock(side_effect=ConnectionError('down'))
+        catalog._fetch()
+        assert catalog.breaker.is_open
+        assert catalog.get_models() == [{'name': 'bielik-1.5b-gguf'}]
+
+
+def test_models_endpoint_uses_catalog(client, monkeypatch):
+    """The /api/models endpoint returns whatever the catalog serves."""
+    from services.model_catalog import model_catalog
+    monkeypatch.setattr(model_catalog, 'get_models', lambda: [{'name': 'cached-model'}])
+
+    response = client.get('/api/models')
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'name': 'cached-model'}]
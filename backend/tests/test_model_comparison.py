@@ -0,0 +1,121 @@
+"""
+Tests for the statistical model comparison (model_comparison.py).
+"""
+
+import json
+import time
+
+import numpy as np
+import pytest
+
+from app import db
+from models import Experiment, ExperimentRun
+import routes
+from model_comparison import ModelComparison
+
+
+class TestModelComparison:
+    """Test pairing, bootstrap intervals, permutation tests and effect sizes."""
+
+    def test_runs_are_matched_on_shared_ad_ids(self):
+        per_model = ModelComparison.per_ad_means(
+            ['a', 'a', 'a', 'b', 'b'],
+            [1, 1, 2, 2, 3],
+            [0.2, 0.4, 0.5, 0.6, 0.9]
+        )
+        scores_a, scores_b = ModelComparison.match(per_model['a'], per_model['b'])
+
+        assert per_model['a'][1].tolist() == pytest.approx([0.3, 0.5])
+        assert scores_a.tolist() == [0.5]
+        assert scores_b.tolist() == [0.6]
+
+    def test_clear_difference_is_significant(self):
+        rng = np.random.default_rng(0)
+        scores_b = rng.random(200)
+        scores_a = scores_b + 0.1 + rng.normal(0, 0.05, 200)
+
+        result = ModelComparison(iterations=2000, seed=1).compare_pair(scores_a, scores_b)
+
+        assert result['significant']
+        assert result['p_value'] < 0.01
+        assert result['ci_low'] < result['mean_difference'] < result['ci_high']
+        assert result['ci_low'] > 0
+        assert result['cohens_dz'] > 1
+
+    def test_identical_models_are_not_significant(self):
+        rng = np.random.default_rng(0)
+        scores = rng.random(200)
+        noise = rng.normal(0, 0.05, 200)
+
+        result = ModelComparison(iterations=2000, seed=1).compare_pair(scores + noise, scores - noise[::-1])
+
+        assert result['ci_low'] < 0 < result['ci_high']
+        assert not result['significant']
+
+    def test_compare_all_returns_every_pair(self):
+        names = ['a'] * 3 + ['b'] * 3 + ['c'] * 3
+        ads = [1, 2, 3] * 3
+        values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+        comparisons = ModelComparison(iterations=200, seed=1).compare_all(names, ads, values)
+
+        assert [(c['model_a'], c['model_b']) for c in comparisons] == [('a', 'b'), ('a', 'c'), ('b', 'c')]
+        assert all(c['matched_ads'] == 3 for c in comparisons)
+
+    @pytest.mark.slow
+    def test_large_experiment_finishes_quickly(self):
+        rng = np.random.default_rng(0)
+        scores_a = rng.random(50000)
+        scores_b = scores_a + rng.normal(0, 0.1, 50000)
+
+        start = time.perf_counter()
+        ModelComparison(iterations=10000, seed=1).compare_pair(scores_a, scores_b)
+
+        assert time.perf_counter() - start < 30
+
+
+def test_compare_endpoint(client, app_context):
+    """GET /api/experiments/<id>/compare compares experiment models pairwise."""
+    experiment = Experiment(name='Compare', models=['bielik-1.5b-gguf', 'llama-3.1-8b'], test_ads=[1, 2, 3])
+    db.session.add(experiment)
+    db.session.commit()
+    for ad_id in range(1, 11):
+        for model_name, score in (('bielik-1.5b-gguf', 0.8), ('llama-3.1-8b', 0.5)):
+            db.session.add(ExperimentRun(experiment_id=experiment.id, model_name=model_name, ad_id=ad_id,
+                                         original_text='[GAP:1]', overall_score=score + ad_id / 100))
+    db.session.commit()
+
+    response = client.get(f'/api/experiments/{experiment.id}/compare?iterations=500&seed=1')
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['comparisons']) == 1
+    assert data['comparisons'][0]['mean_difference'] == pytest.approx(0.3)
+    assert data['comparisons'][0]['significant']
+
+    assert client.get(f'/api/experiments/{experiment.id}/compare?metric=bogus').status_code == 400
+
+
+def test_compare_endpoint_bounds_its_work(client, app_context, monkeypatch):
+    """Too many pairs or resamples are refused before any resampling."""
+    models = ['a', 'b', 'c', 'd']
+    experiment = Experiment(name='Compare', models=models, test_ads=[1])
+    db.session.add(experiment)
+    db.session.commit()
+    db.session.add_all([ExperimentRun(experiment_id=experiment.id, model_name=model_name, ad_id=ad_id,
+                                      original_text='[GAP:1]', overall_score=ad_id / 100)
+                        for ad_id in range(1, 11) for model_name in models])
+    db.session.commit()
+    url = f'/api/experiments/{experiment.id}/compare?iterations=1000'
+
+    monkeypatch.setattr(routes, 'COMPARE_MAX_PAIRS', 3)
+    assert client.get(url).status_code == 400
+    selected = client.get(f'{url}&models=a,b,c')
+    assert selected.status_code == 200
+    assert len(selected.get_json()['comparisons']) == 3
+
+    # 3 pairs x 10 ads x 1000 iterations
+    monkeypatch.setattr(routes, 'COMPARE_MAX_RESAMPLES', 20000)
+    response = client.get(f'{url}&models=a,b,c')
+    assert response.status_code == 400
+    assert 'at most 666 iterations' in response.get_json()['error']
@@ -0,0 +1,70 @@
+"""
+Tests for the bounded password hashing pool.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from services.password_hasher import PasswordHasher, PasswordHasherBusy, password_hasher
+
+
+class TestPasswordHasher:
+    """Hashes run on the pool and excess load is shed."""
+
+    def test_hash_and_verify(self):
+        hasher = PasswordHasher(max_workers=1, max_pending=1)
+        password_hash = hasher.hash('tajne-haslo')
+
+        assert hasher.verify(password_hash, 'tajne-haslo')
+        assert not hasher.verify(password_hash, 'inne-haslo')
+        hasher.shutdown()
+
+    def test_queue_limit_sheds_load(self):
+        hasher = PasswordHasher(max_workers=1, max_pending=1)
+        release = threading.Event()
+        started = threading.Barrier(3)
+
+        def blocked(_):
+            release.wait(5)
+            return 'done'
+
+        def occupy():
+            started.wait()
+            hasher._run(blocked, None)
+
+        # Fill the worker and the single pending slot
+        workers = [threading.Thread(target=occupy) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        started.wait()
+        deadline = time.time() + 5
+        while hasher._slots._value > 0 and time.time() < deadline:
+            time.sleep(0.001)
+
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('overflow')
+
+        release.set()
+        for worker in workers:
+            worker.join()
+        # Slots are returned once jobs finish
+        assert hasher.verify(hasher.hash('ok'), 'ok')
+        hasher.shutdown()
+
+
+def test_signup_returns_503_when_hasher_busy(client, app_context, monkeypatch):
+    """POST /api/users sheds load with 503 and Retry-After."""
+    def busy(password):
+        raise PasswordHasherBusy('Password hashing queue is full')
+
+    monkeypatch.setattr(password_hasher, 'hash', busy)
+
+    response = client.post('/api/users', data=json.dumps({
+        'first_name': 'Jan', 'last_name': 'Kowalski', 'email': 'jan@example.com', 'password': 'x'
+    }), content_type='application/json')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
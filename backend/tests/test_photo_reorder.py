@@ -0,0 +1,180 @@
+"""
+Tests for the set-based photo reorder.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Items, Photo, Users
+from services.storage_service import storage_service
+
+
+def create_gallery(count):
+    # The TESTING user is the first user in the database
+    user = Users(first_name='Jan', last_name='Kowalski', email='jan@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    item = Items(user_id=user.id, price=1000, description='Opis')
+    db.session.add(item)
+    db.session.commit()
+    photos = [Photo(item_id=item.id, filename=f'{i}.jpg', stored_filename=f'{i}.jpg',
+                    file_path=f'/uploads/photos/{i}.jpg', display_order=i, is_main=(i == 0))
+              for i in range(count)]
+    db.session.add_all(photos)
+    db.session.commit()
+    return item, [photo.id for photo in photos]
+
+
+def reorder(client, item_id, photos):
+    return client.put(f'/api/items/{item_id}/photos/reorder', data=json.dumps({'photos': photos}),
+                      content_type='application/json')
+
+
+def gallery(item_id):
+    db.session.expire_all()
+    photos = Photo.query.filter_by(item_id=item_id).order_by(Photo.display_order).all()
+    return [(photo.id, photo.is_main) for photo in photos]
+
+
+class TestPhotoReorder:
+    """Reorder and main photo change in constant queries."""
+
+    def test_reverse_order_and_move_main(self, client, app_context):
+        item, ids = create_gallery(4)
+        payload = [{'id': photo_id, 'display_order': 3 - i, 'is_main': photo_id == ids[3]}
+                   for i, photo_id in enumerate(ids)]
+
+        assert reorder(client, item.id, payload).status_code == 200
+
+        assert gallery(item.id) == [(ids[3], True), (ids[2], False), (ids[1], False), (ids[0], False)]
+
+    def test_main_unchanged_when_not_given(self, client, app_context):
+        item, ids = create_gallery(2)
+
+        reorder(client, item.id, [{'id': ids[0], 'display_order': 1}, {'id': ids[1], 'display_order': 0}])
+
+        assert gallery(item.id) == [(ids[1], False), (ids[0], True)]
+
+    def test_query_count_independent_of_gallery_size(self, client, app_context, test_app):
+        def count_statements(size):
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+            item, ids = create_gallery(size)
+            payload = [{'id': photo_id, 'display_order': size - i, 'is_main': i == 1} for i, photo_id in enumerate(ids)]
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                assert reorder(client, item.id, payload).status_code == 200
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            return len([s for s in statements if 'photos' in s])
+
+        assert count_statements(3) == count_statements(30) == 2
+
+    def test_rejects_two_main_photos(self, client, app_context):
+        item, ids = create_gallery(2)
+
+        response = reorder(client, item.id, [{'id': ids[0], 'is_main': True}, {'id': ids[1], 'is_main': True}])
+
+        assert response.status_code == 400
+
+    def test_main_photo_of_other_item_is_rejected(self, client, app_context):
+        item, ids = create_gallery(2)
+        other = Items(user_id=item.user_id, price=1, description='Inne')
+        db.session.add(other)
+        db.session.commit()
+        foreign = Photo(item_id=other.id, filename='x.jpg', stored_filename='x.jpg', file_path='/x.jpg')
+        db.session.add(foreign)
+        db.session.commit()
+
+        response = reorder(client, item.id, [{'id': foreign.id, 'display_order': 0, 'is_main': True}])
+
+        assert response.status_code == 400
+        assert gallery(item.id)[0] == (ids[0], True)
+
+
+class TestAttachPhotos:
+    """Batch attach (POST /api/items/<id>/photos) keeps a single main photo."""
+
+    @pytest.fixture(autouse=True)
+    def folder(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+        return tmp_path
+
+    def post(self, client, item_id, photos):
+        return client.post(f'/api/items/{item_id}/photos', data=json.dumps({'photos': photos}),
+                           content_type='application/json')
+
+    def attach(self, client, item_id, *mains):
+        photos = []
+        for i, is_main in enumerate(mains):
+            stored_filename = f'{i:064x}.jpg'
+            storage_service.store_bytes(b'jpeg', stored_filename, 'image/jpeg', 'local')
+            photos.append({'filename': f'new{i}.jpg', 'stored_filename': stored_filename, 'is_main': is_main})
+        return self.post(client, item_id, photos)
+
+    def test_two_photos_marked_main(self, client, app_context):
+        item, _ = create_gallery(0)
+
+        response = self.attach(client, item.id, False, True, True)
+
+        assert response.status_code == 201
+        assert [is_main for _, is_main in gallery(item.id)] == [False, True, False]
+
+    def test_existing_main_is_kept(self, client, app_context):
+        item, ids = create_gallery(1)
+
+        response = self.attach(client, item.id, True, False)
+
+        assert response.status_code == 201
+        assert [row for row in gallery(item.id) if row[1]] == [(ids[0], True)]
+
+    def test_paths_outside_uploads_are_rejected(self, client, app_context, folder):
+        item, _ = create_gallery(0)
+        victim = folder.parent / 'victim.db'
+        victim.write_bytes(b'data')
+
+        response = self.post(client, item.id, [{'filename': 'a.jpg', 'stored_filename': '../victim.db'}])
+
+        assert response.status_code == 400
+        assert Photo.query.count() == 0
+        assert victim.exists()
+
+    def test_unknown_file_is_rejected(self, client, app_context):
+        item, _ = create_gallery(0)
+
+        response = self.post(client, item.id, [{'filename': 'a.jpg', 'stored_filename': 'b' * 64 + '.jpg'}])
+
+        assert response.status_code == 404
+
+    def test_paths_and_renditions_come_from_storage(self, client, app_context):
+        item, _ = create_gallery(0)
+        stored_filename = 'c' * 64 + '.jpg'
+        storage_service.store_bytes(b'jpeg', stored_filename, 'image/jpeg', 'local')
+
+        response = self.post(client, item.id, [{
+            'filename': 'a.jpg', 'stored_filename': stored_filename, 'file_path': '/etc/passwd',
+            'file_size': 1, 'renditions': {'thumb': {'jpeg': 'https://evil.example/x.jpg'}}
+        }])
+
+        assert response.status_code == 201
+        photo = Photo.query.one()
+        assert photo.file_path == f'/uploads/photos/{stored_filename}'
+        assert photo.file_size == 4
+        assert photo.renditions is None
+        assert photo.processing_status == 'pending'
+
+
+def test_unique_index_prevents_second_main(app_context):
+    item, ids = create_gallery(2)
+
+    db.session.get(Photo, ids[1]).is_main = True
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
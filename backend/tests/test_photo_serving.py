@@ -0,0 +1,71 @@
+"""
+Tests for serving locally stored photos.
+"""
+
+import hashlib
+
+import pytest
+
+from services.storage_service import storage_service
+
+CONTENT = bytes(range(256)) * 8
+CONTENT_NAME = hashlib.sha256(CONTENT).hexdigest() + '.jpg'
+
+
+@pytest.fixture
+def photos_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_service, 'upload_folder', str(tmp_path))
+    (tmp_path / CONTENT_NAME).write_bytes(CONTENT)
+    (tmp_path / '20240101_120000_abcd1234.jpg').write_bytes(CONTENT)
+    return tmp_path
+
+
+class TestPhotoServing:
+    """Cache headers, conditional requests and ranges."""
+
+    def test_content_addressed_file_is_immutable(self, client, photos_folder):
+        response = client.get(f'/uploads/photos/{CONTENT_NAME}')
+
+        assert response.status_code == 200
+        assert response.data == CONTENT
+        assert response.headers['Content-Type'] == 'image/jpeg'
+        cache_control = response.headers['Cache-Control']
+        assert 'immutable' in cache_control
+        assert 'max-age=31536000' in cache_control
+        assert 'public' in cache_control
+
+    def test_legacy_name_gets_shorter_cache(self, client, photos_folder):
+        response = client.get('/uploads/photos/20240101_120000_abcd1234.jpg')
+
+        assert 'immutable' not in response.headers['Cache-Control']
+        assert 'max-age=86400' in response.headers['Cache-Control']
+
+    def test_etag_revalidation_returns_304(self, client, photos_folder):
+        etag = client.get(f'/uploads/photos/{CONTENT_NAME}').headers['ETag']
+
+        response = client.get(f'/uploads/photos/{CONTENT_NAME}', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_range_request(self, client, photos_folder):
+        response = client.get(f'/uploads/photos/{CONTENT_NAME}', headers={'Range': 'bytes=10-19'})
+
+        assert response.status_code == 206
+        assert response.data == CONTENT[10:20]
+        assert response.headers['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+
+    def test_missing_and_traversal_paths_are_404(self, client, photos_folder):
+        assert client.get('/uploads/photos/missing.jpg').status_code == 404
+        assert client.get('/uploads/photos/../conftest.py').status_code == 404
+
+    def test_x_accel_redirect_mode(self, client, test_app, photos_folder, monkeypatch):
+        monkeypatch.setitem(test_app.config, 'PHOTO_SENDFILE_MODE', 'x-accel')
+
+        response = client.get(f'/uploads/photos/{CONTENT_NAME}')
+
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/photos/{CONTENT_NAME}'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert client.get('/uploads/photos/missing.jpg').status_code == 404
@@ -0,0 +1,119 @@
+"""
+Tests for the live experiment progress stream (Server-Sent Events).
+"""
+
+import json
+
+from app import db
+from models import Experiment, ExperimentRun
+from services.progress_stream import ProgressBroker, ExperimentProgress, progress_broker
+
+
+def read_event(iterator):
+    """Return the data of the next non keep-alive event"""
+    for chunk in iterator:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('event:'):
+            return json.loads(chunk.split('data: ', 1)[1])
+
+
+class TestProgressBroker:
+    """Test incremental aggregation and fan-out."""
+
+    def test_running_averages(self):
+        progress = ExperimentProgress(1)
+        progress.add_run({'model_name': 'a', 'status': 'success', 'overall_score': 0.5})
+        progress.add_run({'model_name': 'a', 'status': 'success', 'overall_score': 0.7})
+        progress.add_run({'model_name': 'a', 'status': 'error'})
+
+        snapshot = progress.snapshot()
+        assert snapshot['totalRuns'] == 3
+        assert snapshot['failedRuns'] == 1
+        assert snapshot['modelStats']['a']['avg_overall_score'] == 0.6
+
+    def test_state_loaded_once_and_fanned_out(self):
+        broker = ProgressBroker()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return ExperimentProgress(7)
+
+        first = broker.subscribe(7, load)
+        second = broker.subscribe(7, load)
+        first.get_nowait()
+        second.get_nowait()
+
+        broker.publish_run(7, {'model_name': 'a', 'status': 'success', 'overall_score': 1.0})
+
+        assert len(loads) == 1
+        assert first.get_nowait()['totalRuns'] == 1
+        assert second.get_nowait()['totalRuns'] == 1
+
+    def test_slow_subscriber_keeps_latest_state(self):
+        broker = ProgressBroker(queue_size=2)
+        subscriber = broker.subscribe(1, lambda: ExperimentProgress(1))
+        for _ in range(5):
+            broker.publish_run(1, {'model_name': 'a', 'status': 'success'})
+
+        events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+        assert events[-1]['totalRuns'] == 5
+
+    def test_runs_already_seeded_are_not_counted_twice(self):
+        broker = ProgressBroker()
+
+        def load():
+            progress = ExperimentProgress(1)
+            progress.add_run({'id': 5, 'model_name': 'a', 'status': 'success', 'overall_score': 0.2})
+            return progress
+
+        subscriber = broker.subscribe(1, load)
+        subscriber.get_nowait()
+
+        # Committed before the viewer connected, published after
+        broker.publish_run(1, {'id': 5, 'model_name': 'a', 'status': 'success', 'overall_score': 0.2})
+        assert subscriber.empty()
+
+        broker.publish_run(1, {'id': 6, 'model_name': 'a', 'status': 'success', 'overall_score': 0.6})
+        snapshot = subscriber.get_nowait()
+        assert snapshot['totalRuns'] == 2
+        assert snapshot['modelStats']['a']['avg_overall_score'] == 0.4
+
+    def test_state_dropped_after_last_unsubscribe(self):
+        broker = ProgressBroker()
+        subscriber = broker.subscribe(1, lambda: ExperimentProgress(1))
+        broker.unsubscribe(1, subscriber)
+
+        # No viewers, publishing is a no-op
+        broker.publish_run(1, {'model_name': 'a'})
+        assert broker.subscriber_count(1) == 0
+
+
+def test_stream_endpoint_pushes_ingested_runs(client, app_context):
+    """A viewer gets the current snapshot and then each new run."""
+    experiment = Experiment(name='Stream', models=['bielik-1.5b-gguf'], test_ads=[1])
+    db.session.add(experiment)
+    db.session.commit()
+    db.session.add(ExperimentRun(experiment_id=experiment.id, model_name='bielik-1.5b-gguf', ad_id=1,
+                                 original_text='[GAP:1]', overall_score=0.4))
+    db.session.commit()
+
+    response = client.get(f'/api/experiments/{experiment.id}/stream')
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+
+    snapshot = read_event(events)
+    assert snapshot['totalRuns'] == 1
+    assert snapshot['modelStats']['bielik-1.5b-gguf']['avg_overall_score'] == 0.4
+
+    client.post(f'/api/experiments/{experiment.id}/runs', data=json.dumps({
+        'model_name': 'bielik-1.5b-gguf', 'ad_id': 2, 'original_text': '[GAP:1]',
+        'filled_text': 'srebrny', 'gap_fills': {}, 'overall_score': 0.8, 'status': 'success'
+    }), content_type='application/json')
+
+    update = read_event(events)
+    assert update['totalRuns'] == 2
+    assert update['modelStats']['bielik-1.5b-gguf']['avg_overall_score'] == 0.6
+
+    response.close()
+    assert progress_broker.subscriber_count(experiment.id) == 0
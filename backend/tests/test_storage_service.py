@@ -0,0 +1,218 @@
+"""
+Tests for streaming, content-addressed uploads in StorageService.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+from moto import mock_aws
+from werkzeug.datastructures import FileStorage
+
+from services.storage_backends import S3Backend
+from services.storage_service import StorageService, FILE_TOO_LARGE
+
+BUCKET = 'photos-bucket'
+MB = 1024 * 1024
+
+
+def make_file(data, filename='photo.jpg', mimetype='image/jpeg'):
+    return FileStorage(stream=io.BytesIO(data), filename=filename, content_type=mimetype)
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    service = StorageService('local', max_file_size=1024 * 1024)
+    service.upload_folder = str(tmp_path)
+    return service
+
+
+class TestLocalUpload:
+    """Chunked copy to disk with size and checksum in one pass."""
+
+    def test_size_and_checksum_computed_while_copying(self, local_storage, tmp_path):
+        data = os.urandom(300 * 1024)
+
+        success, info, error = local_storage.upload_file(make_file(data))
+
+        assert success, error
+        assert info['file_size'] == len(data)
+        assert info['checksum'] == hashlib.sha256(data).hexdigest()
+        assert (tmp_path / info['stored_filename']).read_bytes() == data
+
+    def test_stream_is_read_once(self, local_storage, tmp_path):
+        class ForwardOnly(io.BytesIO):
+            def seek(self, *args):
+                raise AssertionError('upload stream should not be rewound')
+
+        data = os.urandom(300 * 1024)
+        success, info, error = local_storage.upload_file(
+            FileStorage(stream=ForwardOnly(data), filename='photo.jpg', content_type='image/jpeg'))
+
+        assert success, error
+        assert [p.name for p in tmp_path.iterdir()] == [info['stored_filename']]
+        assert (tmp_path / info['stored_filename']).read_bytes() == data
+
+    def test_oversized_file_is_rejected_without_leftovers(self, local_storage, tmp_path):
+        success, info, error = local_storage.upload_file(make_file(b'x' * (1024 * 1024 + 1)))
+
+        assert not success
+        assert error == FILE_TOO_LARGE
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestS3Upload:
+    """Uploads go through the pooled client; multipart above the transfer threshold."""
+
+    @pytest.fixture
+    def s3_storage(self, monkeypatch):
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        with mock_aws():
+            backend = S3Backend(BUCKET, max_pool_connections=4, multipart_threshold=MB * 5,
+                                multipart_chunksize=MB * 5)
+            backend.client.create_bucket(Bucket=BUCKET)
+            yield StorageService('aws_s3', max_file_size=MB * 12, backends=[backend])
+
+    def head(self, storage, info):
+        return storage.backend().client.head_object(Bucket=BUCKET, Key=f"photos/{info['stored_filename']}")
+
+    def test_small_file_uses_single_put(self, s3_storage):
+        success, info, error = s3_storage.upload_file(make_file(b'abc'))
+
+        assert success, error
+        assert info['file_size'] == 3
+        assert info['file_path'] == f"https://{BUCKET}.s3.amazonaws.com/photos/{info['stored_filename']}"
+        head = self.head(s3_storage, info)
+        assert '-' not in head['ETag']
+        assert head['CacheControl'] == 'public, max-age=31536000, immutable'
+
+    def test_large_file_uses_multipart(self, s3_storage):
+        data = os.urandom(MB * 11)
+
+        success, info, error = s3_storage.upload_file(make_file(data))
+
+        assert success, error
+        # Multipart ETags end with the number of parts
+        assert self.head(s3_storage, info)['ETag'].strip('"').endswith('-3')
+        assert s3_storage.open_file(info['stored_filename']).read() == data
+        assert info['checksum'] == hashlib.sha256(data).hexdigest()
+
+    def test_oversized_file_is_rejected_before_upload(self, s3_storage):
+        success, info, error = s3_storage.upload_file(make_file(b'x' * (MB * 12 + 1)))
+
+        assert not success
+        assert error == FILE_TOO_LARGE
+        assert list(s3_storage.list_files()) == []
+
+    def test_existing_content_is_not_uploaded_again(self, s3_storage):
+        s3_storage.upload_file(make_file(b'abc'))
+
+        success, info, error = s3_storage.upload_file(make_file(b'abc'))
+
+        assert success, error
+        assert info['deduplicated']
+        assert info['stored_filename'] == hashlib.sha256(b'abc').hexdigest() + '.jpg'
+        # The second copy was only staged, then dropped
+        assert s3_storage.metrics()['aws_s3']['promote']['calls'] == 1
+        assert [name for name, _ in s3_storage.list_files()] == [info['stored_filename']]
+
+    def test_client_is_tuned_and_shared(self, s3_storage):
+        backend = s3_storage.backend()
+        clients = set()
+        threads = [threading.Thread(target=lambda: clients.add(id(backend.client))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(clients) == 1
+        config = backend.client.meta.config
+        assert config.max_pool_connections == 4
+        # botocore normalises max_attempts (retries) to total attempts
+        assert config.retries == {'mode': 'standard', 'total_max_attempts': 6}
+
+
+class TestBackends:
+    """Backends are chosen per storage_type and report metrics."""
+
+    def test_memory_backend_round_trip(self):
+        storage = StorageService('memory')
+
+        success, info, error = storage.upload_file(make_file(b'abc'))
+
+        assert success, error
+        assert info['storage_type'] == 'memory'
+        assert storage.open_file(info['stored_filename']).read() == b'abc'
+        assert storage.delete_file(info['file_path'])
+        assert list(storage.list_files()) == []
+
+    def test_files_stay_readable_from_their_own_backend(self, tmp_path):
+        storage = StorageService('memory')
+        storage.upload_folder = str(tmp_path)
+        storage.store_bytes(b'old', 'old.jpg', 'image/jpeg', 'local')
+
+        assert storage.open_file('old.jpg', 'local').read() == b'old'
+        assert storage.stat_object('old.jpg') is None
+
+    def test_unknown_storage_type_is_reported(self):
+        storage = StorageService('ftp')
+
+        success, info, error = storage.upload_file(make_file(b'abc'))
+
+        assert not success
+        assert 'Unsupported storage type: ftp' in error
+        assert storage.delete_many(['a.jpg']) == {'a.jpg': 'Unsupported storage type: ftp'}
+
+    def test_metrics_count_calls_bytes_and_errors(self):
+        storage = StorageService('memory')
+        storage.upload_file(make_file(b'x' * 1000))
+        with pytest.raises(FileNotFoundError):
+            storage.open_file('missing.jpg')
+
+        metrics = storage.metrics()['memory']
+
+        assert metrics['write']['calls'] == 1
+        assert metrics['write']['bytes'] == 1000
+        assert metrics['stat']['calls'] == 1
+        assert metrics['read'] == {**metrics['read'], 'calls': 1, 'errors': 1, 'bytes': 0}
+        assert metrics['write']['avgMs'] >= 0
+
+
+class TestContentAddressing:
+    """Files are stored under their SHA-256, duplicates share one file."""
+
+    def test_duplicate_upload_reuses_file(self, local_storage, tmp_path):
+        data = os.urandom(1000)
+
+        _, first, _ = local_storage.upload_file(make_file(data, filename='a.JPG'))
+        _, second, _ = local_storage.upload_file(make_file(data, filename='relisted.jpg'))
+
+        assert first['stored_filename'] == hashlib.sha256(data).hexdigest() + '.jpg'
+        assert second['stored_filename'] == first['stored_filename']
+        assert not first['deduplicated']
+        assert second['deduplicated']
+        assert [p.name for p in tmp_path.iterdir()] == [first['stored_filename']]
+
+
+def test_storage_metrics_endpoint(client):
+    response = client.get('/api/storage/metrics')
+
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), dict)
+
+
+def test_request_over_max_content_length_returns_413(client, test_app):
+    """Werkzeug rejects the body before it is parsed."""
+    original = test_app.config['MAX_CONTENT_LENGTH']
+    test_app.config['MAX_CONTENT_LENGTH'] = 1024
+    try:
+        response = client.post('/api/photos/upload', data={'file': (io.BytesIO(b'x' * 4096), 'photo.jpg')},
+                               content_type='multipart/form-data')
+    finally:
+        test_app.config['MAX_CONTENT_LENGTH'] = original
+
+    assert response.status_code == 413
+
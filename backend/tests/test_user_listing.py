@@ -0,0 +1,88 @@
+"""
+Tests for the paginated GET /api/users listing.
+"""
+
+import base64
+import json
+
+from app import db
+from models import Users
+
+
+def create_users(count, domain='example.com'):
+    users = [Users(first_name=f'User{i}', last_name='Test', email=f'user{i:03d}@{domain}', password_hash='x')
+             for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+class TestUserListing:
+    """Cursor pagination, email prefix search and field projection."""
+
+    def test_cursor_walks_all_pages(self, client, app_context):
+        create_users(7)
+
+        seen = []
+        url = '/api/users?limit=3'
+        pages = 0
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            seen.extend(user['id'] for user in json.loads(response.data))
+            cursor = response.headers.get('X-Next-Cursor')
+            url = f'/api/users?limit=3&cursor={cursor}' if cursor else None
+            pages += 1
+
+        assert pages == 3
+        assert seen == sorted(seen)
+        assert len(set(seen)) == 7
+
+    def test_link_header_points_to_next_page(self, client, app_context):
+        create_users(3)
+
+        response = client.get('/api/users?limit=2&fields=id')
+
+        assert 'rel="next"' in response.headers['Link']
+        assert 'cursor=' in response.headers['Link']
+        assert 'fields=id' in response.headers['Link']
+
+    def test_email_prefix_search(self, client, app_context):
+        create_users(3, domain='example.com')
+        db.session.add(Users(first_name='Anna', last_name='Nowak', email='anna@example.com', password_hash='x'))
+        db.session.commit()
+
+        response = client.get('/api/users?email=user00')
+
+        emails = [user['email'] for user in json.loads(response.data)]
+        assert emails == ['user000@example.com', 'user001@example.com', 'user002@example.com']
+
+    def test_email_search_paginates_in_email_order(self, client, app_context):
+        create_users(5)
+
+        first = client.get('/api/users?email=user&limit=2')
+        second = client.get(f'/api/users?email=user&limit=2&cursor={first.headers["X-Next-Cursor"]}')
+
+        emails = [u['email'] for u in json.loads(first.data) + json.loads(second.data)]
+        assert emails == [f'user{i:03d}@example.com' for i in range(4)]
+
+    def test_field_projection(self, client, app_context):
+        create_users(1)
+
+        data = json.loads(client.get('/api/users?fields=id,email').data)
+
+        assert set(data[0]) == {'id', 'email'}
+
+    def test_invalid_parameters(self, client, app_context):
+        assert client.get('/api/users?fields=password_hash').status_code == 400
+        assert client.get('/api/users?limit=0').status_code == 400
+        assert client.get('/api/users?cursor=not-a-cursor').status_code == 400
+
+    def test_cursor_of_wrong_type(self, client, app_context):
+        create_users(3)
+
+        for params, key in (('', {'id': 1}), ('', [1, 2]), ('', True), ('email=user&', 5)):
+            cursor = base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+            response = client.get(f'/api/users?{params}cursor={cursor}')
+            assert response.status_code == 400
+            assert response.get_json() == {'error': 'Invalid cursor'}
@@ -104,6 +104,23 @@ export async function getExperimentResults(experimentId) {
   return await response.json();
 }
 
+/**
+ * Subscribe to live experiment progress (Server-Sent Events)
+ * Calls onProgress with {totalRuns, completedRuns, failedRuns, status, modelStats}
+ * Returns a function that closes the stream
+ */
+export function subscribeToExperimentProgress(experimentId, onProgress) {
+  const source = new EventSource(
+    `${API_ENDPOINT}/experiments/${experimentId}/stream`
+  );
+
+  source.addEventListener("progress", (event) => {
+    onProgress(JSON.parse(event.data));
+  });
+
+  return () => source.close();
+}
+
 /**
  * Export experiment results as CSV
  */